@@ -0,0 +1,993 @@
+# ----------------------------------------------------
+# CAPA DE ALMACENAMIENTO
+# ----------------------------------------------------
+# La app habla siempre con un objeto "almacenamiento" que sabe leer y
+# escribir los datos de UN usuario. Hay tres implementaciones:
+#
+#   - AlmacenamientoJSON:   los archivos usuarios.json / transacciones.json /
+#                           inversiones.json de siempre.
+#   - AlmacenamientoSQLite: una base SQLite con índices por usuario, para que
+#                           cada request toque sólo las filas del usuario.
+#   - AlmacenamientoFragmentado: los mismos archivos JSON, pero repartidos en
+#                           directorios por hash del email (archivos chicos,
+#                           escrituras de usuarios distintos en paralelo).
+#
+# Se elige con la variable de entorno FINANZAS_ALMACENAMIENTO (json | sqlite | fragmentado).
+import copy
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from datetime import date, timedelta
+
+from categorias import categoria_de, categorizar
+from registros import Transaccion, compactar_transacciones, instante_de
+
+try:
+    import fcntl
+except ImportError:  # Windows: sólo se bloquea dentro del mismo proceso
+    fcntl = None
+
+USUARIOS = "usuarios"
+INVERSIONES = "inversiones"
+RESUMENES = "resumenes"
+CARTERAS = "carteras"
+VALUACIONES = "valuaciones"
+TRANSACCIONES = "transacciones"
+# Ingresos/gastos/inversiones por día, mes y año de cada usuario (ver resumenes.py)
+ACUMULADOS = "acumulados"
+
+# Colecciones de "un documento por usuario" (email -> dict)
+COLECCIONES = (USUARIOS, INVERSIONES, RESUMENES, CARTERAS, VALUACIONES)
+# Colecciones que se escriben agregando líneas a un journal (.jsonl)
+CON_JOURNAL = (TRANSACCIONES, ACUMULADOS)
+
+
+def parte_de(email, partes):
+    """En qué parte (0..partes-1) cae el usuario. crc32 y no hash(): tiene
+    que dar lo mismo en todos los procesos."""
+    return zlib.crc32(email.lower().encode('utf-8')) % partes
+
+
+def sumar_acumulados(previos, nuevos):
+    """previos + nuevos ({periodo: {clave: {campo: importe}}}) sin modificar `previos`:
+    copia sólo los periodos y claves que cambian."""
+    resultado = dict(previos or {})
+    for periodo, claves in nuevos.items():
+        destino = resultado[periodo] = dict(resultado.get(periodo, {}))
+        for clave, importes in claves.items():
+            bucket = dict(destino.get(clave, {}))
+            for campo, importe in importes.items():
+                bucket[campo] = round(bucket.get(campo, 0) + importe, 2)
+            destino[clave] = bucket
+    return resultado
+
+
+def cargar_json(ruta, object_hook=None):
+    """Lee un JSON {email: datos}. Si el archivo no existe devuelve {}.
+
+    Si el archivo está roto NO devuelve {}: eso haría que la próxima escritura
+    borre a todos los usuarios. Se deja pasar el ValueError.
+    """
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            data = json.load(f, object_hook=object_hook)
+    except FileNotFoundError:
+        return {}
+    return {k.lower(): v for k, v in data.items()}
+
+def guardar_json(ruta, data, default=None):
+    """Escribe en un archivo temporal y lo renombra: nunca queda un JSON a medias."""
+    directorio = os.path.dirname(ruta) or '.'
+    fd, temporal = tempfile.mkstemp(prefix='.' + os.path.basename(ruta) + '.', dir=directorio)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4, ensure_ascii=False, default=default)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.remove(temporal)
+        raise
+
+
+# ----------------------------------------------------
+# BLOQUEOS
+# ----------------------------------------------------
+class BloqueoArchivo:
+    """Lock de hilo + flock sobre un archivo, para excluir también a otros procesos."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def bloquear(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.ruta, 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class BloqueosPorUsuario:
+    """Reparte los usuarios en `franjas` locks fijos (lock striping).
+
+    Dos usuarios distintos casi nunca comparten franja, así que sus pagos
+    corren en paralelo; dos requests del MISMO usuario siempre se esperan.
+    """
+
+    def __init__(self, directorio, franjas=64):
+        os.makedirs(directorio, exist_ok=True)
+        self.franjas = [
+            BloqueoArchivo(os.path.join(directorio, f'{n}.lock')) for n in range(franjas)
+        ]
+
+    def bloquear(self, email):
+        return self.franjas[self._franja(email)].bloquear()
+
+    @contextmanager
+    def bloquear_muchos(self, emails):
+        """Bloquea a todos los `emails` a la vez: cada franja una sola vez y siempre
+        en el mismo orden, para que dos lotes no se esperen entre sí para siempre."""
+        with ExitStack() as pila:
+            for n in sorted({self._franja(email) for email in emails}):
+                pila.enter_context(self.franjas[n].bloquear())
+            yield
+
+    def _franja(self, email):
+        # crc32 y no hash(): tiene que dar lo mismo en todos los procesos
+        return zlib.crc32(email.lower().encode('utf-8')) % len(self.franjas)
+
+
+# ----------------------------------------------------
+# BACKEND JSON (archivos completos)
+# ----------------------------------------------------
+class AlmacenamientoJSON:
+    """Guarda cada colección en un único archivo JSON, como la versión original.
+
+    Las transacciones nuevas no reescriben transacciones.json: se agregan como
+    una línea en transacciones.jsonl (journal) y cada `limite_journal` líneas
+    se compacta todo en el JSON principal. Los acumulados por periodo de los
+    resúmenes usan el mismo esquema (acumulados.jsonl / acumulados.json): cada
+    escritura agrega una línea con lo que suma a cada día, mes y año.
+
+    Cada colección leída queda en memoria junto con su "firma" (generación de
+    escrituras propias + mtime/tamaño de los archivos). Mientras la firma no
+    cambie no se vuelve a parsear; si otro proceso escribe, cambia el mtime y
+    se relee.
+
+    Las escrituras son atómicas (temporal + rename) y cada reescritura de una
+    colección se hace bajo un lock de archivo, para no pisar a otro worker.
+    """
+
+    def __init__(self, directorio='.', limite_journal=1000, historiales_ordenados=256):
+        self.directorio = directorio
+        self.limite_journal = limite_journal
+        self.historiales_ordenados = historiales_ordenados
+        self._lineas_journal = {}
+        self._cache = {}
+        self._generaciones = {}
+        self._ordenadas = OrderedDict()
+        self._lock_ordenadas = threading.Lock()
+        self.bloqueos = BloqueosPorUsuario(os.path.join(directorio, '.bloqueos'))
+        self._bloqueos_coleccion = {
+            coleccion: BloqueoArchivo(os.path.join(directorio, '.bloqueos', coleccion + '.lock'))
+            for coleccion in COLECCIONES + CON_JOURNAL
+        }
+
+    def bloquear(self, email):
+        """Sección crítica de un usuario: leer saldo, validar y escribir sin carreras."""
+        return self.bloqueos.bloquear(email)
+
+    def bloquear_muchos(self, emails):
+        """Como bloquear(), para varios usuarios a la vez (escrituras por lotes)."""
+        return self.bloqueos.bloquear_muchos(emails)
+
+    def _ruta(self, coleccion):
+        return os.path.join(self.directorio, coleccion + '.json')
+
+    def _ruta_journal(self, coleccion=TRANSACCIONES):
+        return os.path.join(self.directorio, coleccion + '.jsonl')
+
+    # --- cache ---
+    def _firma(self, coleccion):
+        rutas = [self._ruta(coleccion)]
+        if coleccion in CON_JOURNAL:
+            rutas.append(self._ruta_journal(coleccion))
+
+        firma = [self._generaciones.get(coleccion, 0)]
+        for ruta in rutas:
+            try:
+                st = os.stat(ruta)
+                firma.append((st.st_mtime_ns, st.st_size, st.st_ino))
+            except FileNotFoundError:
+                firma.append(None)
+        return tuple(firma)
+
+    def _invalidar(self, coleccion):
+        self._generaciones[coleccion] = self._generaciones.get(coleccion, 0) + 1
+        self._cache.pop(coleccion, None)
+
+    def cargar(self, coleccion):
+        """Devuelve la colección completa {email: datos}. No modificar: es la copia en cache."""
+        firma = self._firma(coleccion)
+        entrada = self._cache.get(coleccion)
+        if entrada is not None and entrada[0] == firma:
+            return entrada[1]
+
+        if coleccion == TRANSACCIONES:
+            # Cada transacción queda en memoria como registros.Transaccion (mucho más chica que un dict)
+            data = cargar_json(self._ruta(coleccion), object_hook=compactar_transacciones)
+            nuevas = {}
+            for registro in self._leer_journal(TRANSACCIONES, compactar_transacciones):
+                nuevas.setdefault(registro["email"], []).append(registro["transaccion"])
+            for email, lista in nuevas.items():
+                lista.reverse()
+                data[email] = lista + data.get(email, [])
+        elif coleccion == ACUMULADOS:
+            data = cargar_json(self._ruta(coleccion))
+            for registro in self._leer_journal(ACUMULADOS):
+                email = registro["email"]
+                previos = None if registro.get("reemplazar") else data.get(email)
+                data[email] = sumar_acumulados(previos, registro["acumulados"])
+        else:
+            data = cargar_json(self._ruta(coleccion))
+
+        self._cache[coleccion] = (firma, data)
+        return data
+
+    def guardar_todo(self, coleccion, data):
+        guardar_json(self._ruta(coleccion), data)
+        self._invalidar(coleccion)
+        self._cache[coleccion] = (self._firma(coleccion), data)
+
+    # --- documentos por usuario ---
+    def obtener(self, coleccion, email):
+        return copy.deepcopy(self.cargar(coleccion).get(email.lower()))
+
+    def guardar(self, coleccion, email, datos):
+        with self._bloqueos_coleccion[coleccion].bloquear():
+            data = dict(self.cargar(coleccion))
+            data[email.lower()] = copy.deepcopy(datos)
+            self.guardar_todo(coleccion, data)
+
+    def guardar_muchos(self, coleccion, pares):
+        """Como guardar() para muchos (email, datos), reescribiendo el archivo una sola vez."""
+        with self._bloqueos_coleccion[coleccion].bloquear():
+            data = dict(self.cargar(coleccion))
+            data.update((email.lower(), copy.deepcopy(datos)) for email, datos in pares)
+            self.guardar_todo(coleccion, data)
+
+    def iterar(self, coleccion):
+        """Recorre (email, datos) de toda la colección."""
+        yield from self.cargar(coleccion).items()
+
+    def iterar_parte(self, coleccion, parte, partes):
+        """Como iterar(), pero sólo la parte `parte` de `partes` porciones disjuntas
+        (entre todas, la colección completa). Para repartir un recorrido entre procesos."""
+        for email, datos in self.cargar(coleccion).items():
+            if parte_de(email, partes) == parte:
+                yield email, datos
+
+    # --- transacciones ---
+    def transacciones(self, email):
+        """Transacciones del usuario, de la más nueva a la más vieja."""
+        return [t.a_dict() for t in self.cargar(TRANSACCIONES).get(email.lower(), [])]
+
+    def cantidad_transacciones(self, email):
+        return len(self.cargar(TRANSACCIONES).get(email.lower(), []))
+
+    def transacciones_desde(self, email, desde):
+        """Las transacciones agregadas después de las primeras `desde`, en el orden en que se agregaron."""
+        historial = self.cargar(TRANSACCIONES).get(email.lower(), [])
+        return [t.a_dict() for t in reversed(historial[:max(len(historial) - desde, 0)])]
+
+    def agregar_transaccion(self, email, transaccion):
+        self.agregar_transacciones(email, [transaccion])
+
+    def agregar_transacciones(self, email, lista):
+        """Agrega un bloque de transacciones (más nueva primero) arriba del historial."""
+        email = email.lower()
+        lista = [dict(t, categoria=categoria_de(t)) for t in lista]
+
+        def aplicar(data):
+            data[email] = [Transaccion.desde_dict(t) for t in lista] + data.get(email, [])
+
+        # Se escriben de la más vieja a la más nueva: al releer, cada una va arriba
+        self._agregar_al_journal(TRANSACCIONES, [{"email": email, "transaccion": t} for t in reversed(lista)],
+                                 aplicar)
+
+    def iterar_transacciones(self):
+        """Recorre (email, transacciones) de todos los usuarios."""
+        yield from self.cargar(TRANSACCIONES).items()
+
+    def transacciones_pagina(self, email, limite=50, cursor=None, **filtros):
+        """Una página del historial filtrado. Devuelve (transacciones, siguiente_cursor)."""
+        fecha_cursor, saltar = leer_cursor(cursor)
+        instante_cursor = instante_de(fecha_cursor) if fecha_cursor is not None else None
+        filtro = _filtro_transacciones(**filtros)
+        ordenadas = self._historial_ordenado(email)
+
+        # Búsqueda binaria hasta el cursor: una página recorre sólo sus filas (y las que filtra)
+        inicio = _primera_hasta(ordenadas, instante_cursor) if instante_cursor is not None else 0
+
+        pagina = []
+        for i in range(inicio, len(ordenadas)):
+            t = ordenadas[i]
+            if not filtro(t):
+                continue
+            if saltar and t.instante == instante_cursor:
+                saltar -= 1
+                continue
+            pagina.append(t.a_dict())
+            if len(pagina) > limite:
+                break
+
+        return armar_pagina(pagina, limite, cursor)
+
+    def iterar_historial(self, email, lote=500, **filtros):
+        """Todo el historial filtrado, en el orden de transacciones_pagina(). Ordena una
+        sola vez (paginar acá reordenaría y recorrería el historial en cada página)."""
+        filtro = _filtro_transacciones(**filtros)
+        for t in self._historial_ordenado(email):
+            if filtro(t):
+                yield t.a_dict()
+
+    def _historial_ordenado(self, email):
+        """Las transacciones del usuario de la más nueva a la más vieja. Se ordenan una vez y
+        se guardan (para `historiales_ordenados` usuarios) mientras su lista en la cache sea
+        la misma: cada escritura del usuario, o una relectura de la colección, la reemplaza."""
+        email = email.lower()
+        lista = self.cargar(TRANSACCIONES).get(email, [])
+        with self._lock_ordenadas:
+            guardada = self._ordenadas.get(email)
+            if guardada is not None and guardada[0] is lista:
+                self._ordenadas.move_to_end(email)
+                return guardada[1]
+
+        # sorted() es estable: a igual fecha queda primero la que se agregó último
+        ordenadas = sorted(lista, key=lambda t: t.instante, reverse=True)
+        with self._lock_ordenadas:
+            self._ordenadas[email] = (lista, ordenadas)
+            self._ordenadas.move_to_end(email)
+            while len(self._ordenadas) > self.historiales_ordenados:
+                self._ordenadas.popitem(last=False)
+        return ordenadas
+
+    # --- acumulados por periodo ---
+    def acumulados(self, email, periodo, desde, hasta):
+        """{clave: bucket} del periodo ('dia', 'mes' o 'año') con desde <= clave <= hasta."""
+        claves = self.cargar(ACUMULADOS).get(email.lower(), {}).get(periodo, {})
+        return {clave: dict(bucket) for clave, bucket in claves.items() if desde <= clave <= hasta}
+
+    def sumar_acumulados(self, email, acumulados):
+        """Suma {periodo: {clave: bucket}} a los del usuario: una línea en el journal."""
+        self._escribir_acumulados(email, acumulados, reemplazar=False)
+
+    def reemplazar_acumulados(self, email, acumulados):
+        """Deja sólo `acumulados` para el usuario (al reconstruir su resumen)."""
+        self._escribir_acumulados(email, acumulados, reemplazar=True)
+
+    def _escribir_acumulados(self, email, acumulados, reemplazar):
+        email = email.lower()
+        registro = {"email": email, "acumulados": acumulados}
+        if reemplazar:
+            registro["reemplazar"] = True
+        elif not any(acumulados.values()):
+            return
+
+        def aplicar(data):
+            data[email] = sumar_acumulados(None if reemplazar else data.get(email), acumulados)
+
+        self._agregar_al_journal(ACUMULADOS, [registro], aplicar)
+
+    def iterar_acumulados(self):
+        """Recorre (email, {periodo: {clave: bucket}}) de todos los usuarios."""
+        yield from self.cargar(ACUMULADOS).items()
+
+    # --- journal ---
+    def _agregar_al_journal(self, coleccion, registros, aplicar):
+        """Agrega cada registro como una línea del journal de `coleccion`. Si la cache
+        estaba al día, `aplicar(data)` le suma los registros en vez de releer todo."""
+        lineas = ''.join(
+            json.dumps(registro, ensure_ascii=False, separators=(',', ':')) + '\n'
+            for registro in registros
+        )
+        if not lineas:
+            return
+
+        with self._bloqueos_coleccion[coleccion].bloquear():
+            previas = self._contar_lineas_journal(coleccion)
+            firma_previa = self._firma(coleccion)
+            entrada = self._cache.get(coleccion)
+            with open(self._ruta_journal(coleccion), 'a+b') as f:
+                # Si quedó una línea cortada, se cierra para no pegarle la nueva
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        lineas = '\n' + lineas
+                f.write(lineas.encode('utf-8'))
+                # En disco antes que el saldo que las cuenta (ver libro.py), que también se sincroniza
+                f.flush()
+                os.fsync(f.fileno())
+            self._lineas_journal[coleccion] = previas + len(registros)
+
+            self._invalidar(coleccion)
+            if entrada is not None and entrada[0] == firma_previa:
+                data = dict(entrada[1])
+                aplicar(data)
+                self._cache[coleccion] = (self._firma(coleccion), data)
+
+            if self._lineas_journal[coleccion] >= self.limite_journal:
+                self._compactar(coleccion)
+
+    def _leer_journal(self, coleccion, object_hook=None):
+        """Devuelve los registros del journal en el orden en que se agregaron."""
+        try:
+            with open(self._ruta_journal(coleccion), 'r', encoding='utf-8') as f:
+                for linea in f:
+                    try:
+                        registro = json.loads(linea, object_hook=object_hook)
+                    except (ValueError, KeyError):
+                        # Línea cortada por una caída a mitad de escritura
+                        continue
+                    yield registro
+        except FileNotFoundError:
+            return
+
+    def _contar_lineas_journal(self, coleccion):
+        if coleccion not in self._lineas_journal:
+            try:
+                with open(self._ruta_journal(coleccion), 'rb') as f:
+                    self._lineas_journal[coleccion] = sum(1 for _ in f)
+            except FileNotFoundError:
+                self._lineas_journal[coleccion] = 0
+        return self._lineas_journal[coleccion]
+
+    def compactar(self):
+        """Vuelca los journals en transacciones.json y acumulados.json y los vacía."""
+        for coleccion in CON_JOURNAL:
+            with self._bloqueos_coleccion[coleccion].bloquear():
+                self._compactar(coleccion)
+
+    def _compactar(self, coleccion=TRANSACCIONES):
+        data = self.cargar(coleccion)
+        guardar_json(self._ruta(coleccion), data, default=Transaccion.a_dict)
+        try:
+            os.remove(self._ruta_journal(coleccion))
+        except FileNotFoundError:
+            pass
+        self._lineas_journal[coleccion] = 0
+        self._invalidar(coleccion)
+        self._cache[coleccion] = (self._firma(coleccion), data)
+
+
+# ----------------------------------------------------
+# BACKEND SQLITE (indexado por usuario)
+# ----------------------------------------------------
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS documentos (
+    coleccion TEXT NOT NULL,
+    email     TEXT NOT NULL,
+    datos     TEXT NOT NULL,
+    PRIMARY KEY (coleccion, email)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS transacciones (
+    id          INTEGER PRIMARY KEY,
+    email       TEXT NOT NULL,
+    fecha       TEXT NOT NULL,
+    descripcion TEXT,
+    monto       REAL NOT NULL,
+    tipo        TEXT NOT NULL,
+    categoria   TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_transacciones_email_fecha
+    ON transacciones (email, fecha);
+
+CREATE INDEX IF NOT EXISTS idx_transacciones_email_tipo_fecha
+    ON transacciones (email, tipo, fecha);
+
+CREATE TABLE IF NOT EXISTS acumulados (
+    email       TEXT NOT NULL,
+    periodo     TEXT NOT NULL,
+    clave       TEXT NOT NULL,
+    ingresos    REAL NOT NULL DEFAULT 0,
+    gastos      REAL NOT NULL DEFAULT 0,
+    inversiones REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (email, periodo, clave)
+) WITHOUT ROWID;
+"""
+
+CAMPOS_ACUMULADOS = ("ingresos", "gastos", "inversiones")
+
+
+class AlmacenamientoSQLite:
+    """Guarda todo en una base SQLite; cada consulta usa el índice por email."""
+
+    def __init__(self, ruta='finanzas.db'):
+        self.ruta = ruta
+        self._local = threading.local()
+        self.bloqueos = BloqueosPorUsuario(ruta + '.bloqueos')
+        with self._conexion() as conn:
+            conn.executescript(ESQUEMA_SQLITE)
+            _agregar_columna_categoria(conn)
+
+    def bloquear(self, email):
+        """Sección crítica de un usuario: leer saldo, validar y escribir sin carreras."""
+        return self.bloqueos.bloquear(email)
+
+    def bloquear_muchos(self, emails):
+        """Como bloquear(), para varios usuarios a la vez (escrituras por lotes)."""
+        return self.bloqueos.bloquear_muchos(emails)
+
+    def _conexion(self):
+        """Una conexión por hilo (sqlite3 no comparte conexiones entre hilos)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.ruta, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.create_function("parte_de", 2, parte_de, deterministic=True)
+            self._local.conn = conn
+        return conn
+
+    # --- documentos por usuario ---
+    def obtener(self, coleccion, email):
+        fila = self._conexion().execute(
+            "SELECT datos FROM documentos WHERE coleccion = ? AND email = ?",
+            (coleccion, email.lower())
+        ).fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def guardar(self, coleccion, email, datos):
+        with self._conexion() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO documentos (coleccion, email, datos) VALUES (?, ?, ?)",
+                (coleccion, email.lower(), json.dumps(datos, ensure_ascii=False))
+            )
+
+    def guardar_muchos(self, coleccion, pares):
+        with self._conexion() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO documentos (coleccion, email, datos) VALUES (?, ?, ?)",
+                ((coleccion, email.lower(), json.dumps(datos, ensure_ascii=False)) for email, datos in pares)
+            )
+
+    def iterar(self, coleccion):
+        cursor = self._conexion().execute(
+            "SELECT email, datos FROM documentos WHERE coleccion = ? ORDER BY email",
+            (coleccion,)
+        )
+        for email, datos in cursor:
+            yield email, json.loads(datos)
+
+    def iterar_parte(self, coleccion, parte, partes, por_lectura=1000):
+        # El filtro corre en SQLite: sólo se decodifica el JSON de la parte pedida.
+        # Se lee de a páginas (por email) para no dejar abierta una lectura
+        # mientras quien recorre escribe: en WAL, esa escritura fallaría con
+        # "database is locked" si otro proceso escribió en el medio.
+        ultimo = ""
+        while True:
+            filas = self._conexion().execute(
+                "SELECT email, datos FROM documentos WHERE coleccion = ? AND email > ? "
+                "AND parte_de(email, ?) = ? ORDER BY email LIMIT ?",
+                (coleccion, ultimo, partes, parte, por_lectura)
+            ).fetchall()
+            for email, datos in filas:
+                yield email, json.loads(datos)
+            if len(filas) < por_lectura:
+                return
+            ultimo = filas[-1][0]
+
+    # --- transacciones ---
+    def transacciones(self, email):
+        cursor = self._conexion().execute(
+            "SELECT fecha, descripcion, monto, tipo, categoria FROM transacciones "
+            "WHERE email = ? ORDER BY fecha DESC, id DESC",
+            (email.lower(),)
+        )
+        return [_fila_a_transaccion(fila) for fila in cursor]
+
+    def cantidad_transacciones(self, email):
+        return self._conexion().execute(
+            "SELECT COUNT(*) FROM transacciones WHERE email = ?", (email.lower(),)).fetchone()[0]
+
+    def transacciones_desde(self, email, desde):
+        cursor = self._conexion().execute(
+            "SELECT fecha, descripcion, monto, tipo, categoria FROM transacciones "
+            "WHERE email = ? ORDER BY id LIMIT -1 OFFSET ?",
+            (email.lower(), desde)
+        )
+        return [_fila_a_transaccion(fila) for fila in cursor]
+
+    def agregar_transaccion(self, email, transaccion):
+        self.agregar_transacciones(email, [transaccion])
+
+    def agregar_transacciones(self, email, lista):
+        # Se insertan de la más vieja a la más nueva para que el id respete el orden
+        email = email.lower()
+        filas = [
+            (email, t["fecha"], t.get("descripcion"), t["monto"], t["tipo"], categoria_de(t))
+            for t in reversed(list(lista))
+        ]
+        with self._conexion() as conn:
+            conn.executemany(
+                "INSERT INTO transacciones (email, fecha, descripcion, monto, tipo, categoria) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                filas
+            )
+
+    def iterar_transacciones(self):
+        emails = [fila[0] for fila in self._conexion().execute(
+            "SELECT DISTINCT email FROM transacciones ORDER BY email")]
+        for email in emails:
+            yield email, self.transacciones(email)
+
+    def transacciones_pagina(self, email, limite=50, cursor=None,
+                             tipo=None, desde=None, hasta=None, texto=None, categoria=None):
+        """Una página del historial filtrado. Devuelve (transacciones, siguiente_cursor)."""
+        fecha_cursor, saltar = leer_cursor(cursor)
+        condiciones = ["email = ?"]
+        parametros = [email.lower()]
+
+        if fecha_cursor is not None:
+            condiciones.append("fecha <= ?")
+            parametros.append(fecha_cursor)
+        if tipo:
+            condiciones.append("tipo = ?")
+            parametros.append(tipo)
+        if categoria:
+            condiciones.append("categoria = ?")
+            parametros.append(categoria)
+        if desde:
+            condiciones.append("fecha >= ?")
+            parametros.append(desde)
+        if hasta:
+            condiciones.append("fecha < ?")
+            parametros.append(_dia_siguiente(hasta))
+        if texto:
+            condiciones.append("descripcion LIKE ? ESCAPE '\\'")
+            parametros.append('%' + _escapar_like(texto) + '%')
+
+        # Las filas con fecha == cursor que ya se mostraron son las primeras: se saltean
+        cursor_sql = self._conexion().execute(
+            "SELECT fecha, descripcion, monto, tipo, categoria FROM transacciones "
+            f"WHERE {' AND '.join(condiciones)} "
+            "ORDER BY fecha DESC, id DESC LIMIT ? OFFSET ?",
+            parametros + [limite + 1, saltar]
+        )
+        pagina = [_fila_a_transaccion(fila) for fila in cursor_sql]
+        return armar_pagina(pagina, limite, cursor)
+
+    def iterar_historial(self, email, lote=500, **filtros):
+        # De a `lote` filas por el índice, con el cursor de /movimientos: cada página es
+        # una consulta corta y el recorrido puede seguir desde otro hilo (asgi.py)
+        cursor = None
+        while True:
+            pagina, cursor = self.transacciones_pagina(email, limite=lote, cursor=cursor, **filtros)
+            yield from pagina
+            if cursor is None:
+                return
+
+    # --- acumulados por periodo ---
+    def acumulados(self, email, periodo, desde, hasta):
+        cursor = self._conexion().execute(
+            "SELECT clave, ingresos, gastos, inversiones FROM acumulados "
+            "WHERE email = ? AND periodo = ? AND clave BETWEEN ? AND ?",
+            (email.lower(), periodo, desde, hasta)
+        )
+        return {clave: dict(zip(CAMPOS_ACUMULADOS, importes)) for clave, *importes in cursor}
+
+    def sumar_acumulados(self, email, acumulados):
+        # Sólo se tocan las filas de los periodos afectados
+        with self._conexion() as conn:
+            conn.executemany(
+                "INSERT INTO acumulados (email, periodo, clave, ingresos, gastos, inversiones) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (email, periodo, clave) DO UPDATE SET "
+                "ingresos = round(ingresos + excluded.ingresos, 2), "
+                "gastos = round(gastos + excluded.gastos, 2), "
+                "inversiones = round(inversiones + excluded.inversiones, 2)",
+                _filas_acumulados(email, acumulados)
+            )
+
+    def reemplazar_acumulados(self, email, acumulados):
+        with self._conexion() as conn:
+            conn.execute("DELETE FROM acumulados WHERE email = ?", (email.lower(),))
+            conn.executemany(
+                "INSERT INTO acumulados (email, periodo, clave, ingresos, gastos, inversiones) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                _filas_acumulados(email, acumulados)
+            )
+
+    def iterar_acumulados(self):
+        emails = [fila[0] for fila in self._conexion().execute(
+            "SELECT DISTINCT email FROM acumulados ORDER BY email")]
+        for email in emails:
+            acumulados = {}
+            for periodo, clave, *importes in self._conexion().execute(
+                    "SELECT periodo, clave, ingresos, gastos, inversiones FROM acumulados WHERE email = ?",
+                    (email,)):
+                acumulados.setdefault(periodo, {})[clave] = dict(zip(CAMPOS_ACUMULADOS, importes))
+            yield email, acumulados
+
+
+def _filas_acumulados(email, acumulados):
+    email = email.lower()
+    return [(email, periodo, clave, *(bucket.get(campo, 0) for campo in CAMPOS_ACUMULADOS))
+            for periodo, claves in acumulados.items() for clave, bucket in claves.items()]
+
+
+def _fila_a_transaccion(fila):
+    fecha, descripcion, monto, tipo, categoria = fila
+    return {"fecha": fecha, "descripcion": descripcion, "monto": monto, "tipo": tipo,
+            "categoria": categoria}
+
+
+def _agregar_columna_categoria(conn):
+    """Bases creadas antes de las categorías: agrega la columna, la completa y la indexa."""
+    columnas = [fila[1] for fila in conn.execute("PRAGMA table_info(transacciones)")]
+    if "categoria" not in columnas:
+        conn.execute("ALTER TABLE transacciones ADD COLUMN categoria TEXT")
+    if conn.execute("SELECT 1 FROM transacciones WHERE categoria IS NULL LIMIT 1").fetchone():
+        conn.create_function("categorizar", 1, categorizar, deterministic=True)
+        conn.execute("UPDATE transacciones SET categoria = categorizar(descripcion) WHERE categoria IS NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transacciones_email_categoria_fecha "
+                 "ON transacciones (email, categoria, fecha)")
+
+
+# ----------------------------------------------------
+# BACKEND FRAGMENTADO (JSON repartido por usuario)
+# ----------------------------------------------------
+class AlmacenamientoFragmentado:
+    """Reparte los usuarios en `fragmentos` directorios (00/, 01/, ... por crc32
+    del email), cada uno con sus propios usuarios.json, transacciones.json, etc.
+
+    Cada fragmento es un AlmacenamientoJSON: una escritura reescribe sólo el
+    archivo de su fragmento, y dos usuarios de fragmentos distintos no
+    comparten ni archivos ni locks. La cantidad de fragmentos queda anotada
+    en fragmentos.json al crear el directorio y no cambia después.
+    """
+
+    def __init__(self, directorio='datos', fragmentos=64, limite_journal=1000):
+        self.directorio = directorio
+        self.limite_journal = limite_journal
+        os.makedirs(directorio, exist_ok=True)
+
+        ruta_config = os.path.join(directorio, 'fragmentos.json')
+        config = cargar_json(ruta_config)
+        if not config:
+            config = {"fragmentos": fragmentos}
+            guardar_json(ruta_config, config)
+        self.cantidad = config["fragmentos"]
+        self._fragmentos = [None] * self.cantidad
+        self._lock = threading.Lock()
+
+    def _ruta_fragmento(self, n):
+        return os.path.join(self.directorio, f'{n:02x}')
+
+    def _abrir(self, n):
+        fragmento = self._fragmentos[n]
+        if fragmento is None:
+            with self._lock:
+                fragmento = self._fragmentos[n]
+                if fragmento is None:
+                    os.makedirs(self._ruta_fragmento(n), exist_ok=True)
+                    fragmento = AlmacenamientoJSON(self._ruta_fragmento(n), self.limite_journal)
+                    self._fragmentos[n] = fragmento
+        return fragmento
+
+    def numero(self, email):
+        return parte_de(email, self.cantidad)
+
+    def fragmento(self, email):
+        return self._abrir(self.numero(email))
+
+    def _existentes(self):
+        """Los fragmentos que tienen datos (los demás ni se crean)."""
+        for n in range(self.cantidad):
+            if self._fragmentos[n] is not None or os.path.isdir(self._ruta_fragmento(n)):
+                yield self._abrir(n)
+
+    def bloquear(self, email):
+        return self.fragmento(email).bloquear(email)
+
+    @contextmanager
+    def bloquear_muchos(self, emails):
+        por_fragmento = {}
+        for email in emails:
+            por_fragmento.setdefault(self.numero(email), []).append(email)
+        # Fragmento por fragmento, en orden: el mismo orden global en todos los procesos
+        with ExitStack() as pila:
+            for n in sorted(por_fragmento):
+                pila.enter_context(self._abrir(n).bloquear_muchos(por_fragmento[n]))
+            yield
+
+    # --- documentos por usuario ---
+    def obtener(self, coleccion, email):
+        return self.fragmento(email).obtener(coleccion, email)
+
+    def guardar(self, coleccion, email, datos):
+        self.fragmento(email).guardar(coleccion, email, datos)
+
+    def guardar_muchos(self, coleccion, pares):
+        por_fragmento = {}
+        for email, datos in pares:
+            por_fragmento.setdefault(self.numero(email), []).append((email, datos))
+        for n, lista in por_fragmento.items():
+            self._abrir(n).guardar_muchos(coleccion, lista)
+
+    def iterar(self, coleccion):
+        for fragmento in self._existentes():
+            yield from fragmento.iterar(coleccion)
+
+    def iterar_parte(self, coleccion, parte, partes):
+        # Fragmentos enteros: cada proceso lee sólo los archivos de los suyos
+        for n in range(parte, self.cantidad, partes):
+            if self._fragmentos[n] is not None or os.path.isdir(self._ruta_fragmento(n)):
+                yield from self._abrir(n).iterar(coleccion)
+
+    # --- transacciones ---
+    def transacciones(self, email):
+        return self.fragmento(email).transacciones(email)
+
+    def cantidad_transacciones(self, email):
+        return self.fragmento(email).cantidad_transacciones(email)
+
+    def transacciones_desde(self, email, desde):
+        return self.fragmento(email).transacciones_desde(email, desde)
+
+    def agregar_transaccion(self, email, transaccion):
+        self.fragmento(email).agregar_transacciones(email, [transaccion])
+
+    def agregar_transacciones(self, email, lista):
+        self.fragmento(email).agregar_transacciones(email, lista)
+
+    def iterar_transacciones(self):
+        for fragmento in self._existentes():
+            yield from fragmento.iterar_transacciones()
+
+    def transacciones_pagina(self, email, limite=50, cursor=None, **filtros):
+        return self.fragmento(email).transacciones_pagina(email, limite, cursor, **filtros)
+
+    def iterar_historial(self, email, lote=500, **filtros):
+        return self.fragmento(email).iterar_historial(email, lote, **filtros)
+
+    # --- acumulados por periodo ---
+    def acumulados(self, email, periodo, desde, hasta):
+        return self.fragmento(email).acumulados(email, periodo, desde, hasta)
+
+    def sumar_acumulados(self, email, acumulados):
+        self.fragmento(email).sumar_acumulados(email, acumulados)
+
+    def reemplazar_acumulados(self, email, acumulados):
+        self.fragmento(email).reemplazar_acumulados(email, acumulados)
+
+    def iterar_acumulados(self):
+        for fragmento in self._existentes():
+            yield from fragmento.iterar_acumulados()
+
+    def compactar(self):
+        for fragmento in self._existentes():
+            fragmento.compactar()
+
+
+# ----------------------------------------------------
+# PAGINACIÓN POR CURSOR
+# ----------------------------------------------------
+# El cursor es "fecha|n": seguir desde esa fecha hacia atrás, salteando las n
+# transacciones con exactamente esa fecha que ya se mostraron. Así no hace
+# falta OFFSET sobre todo el historial y los empates no se pierden.
+
+def leer_cursor(cursor):
+    if not cursor:
+        return None, 0
+    fecha, _, saltar = cursor.rpartition('|')
+    if not fecha:
+        return cursor, 0
+    return fecha, int(saltar or 0)
+
+
+def armar_pagina(filas, limite, cursor):
+    """Recibe hasta limite+1 filas; devuelve (página, cursor para la siguiente o None)."""
+    if len(filas) <= limite:
+        return filas, None
+
+    pagina = filas[:limite]
+    ultima = pagina[-1]["fecha"]
+    repetidas = sum(1 for t in pagina if t["fecha"] == ultima)
+
+    fecha_cursor, saltar = leer_cursor(cursor)
+    if ultima == fecha_cursor:
+        repetidas += saltar
+
+    return pagina, f"{ultima}|{repetidas}"
+
+
+def _primera_hasta(ordenadas, instante):
+    """Posición de la primera transacción con instante <= `instante` en una lista ordenada
+    de la más nueva a la más vieja (búsqueda binaria)."""
+    bajo, alto = 0, len(ordenadas)
+    while bajo < alto:
+        medio = (bajo + alto) // 2
+        if ordenadas[medio].instante > instante:
+            bajo = medio + 1
+        else:
+            alto = medio
+    return bajo
+
+
+def _filtro_transacciones(tipo=None, desde=None, hasta=None, texto=None, categoria=None):
+    hasta = _dia_siguiente(hasta) if hasta else None
+    texto = texto.lower() if texto else None
+
+    def filtro(t):
+        if tipo and t["tipo"] != tipo:
+            return False
+        if categoria and categoria_de(t) != categoria:
+            return False
+        if desde and t["fecha"] < desde:
+            return False
+        if hasta and t["fecha"] >= hasta:
+            return False
+        if texto and texto not in (t.get("descripcion") or "").lower():
+            return False
+        return True
+
+    return filtro
+
+
+def _dia_siguiente(dia):
+    """'2025-01-31' -> '2025-02-01' (para que 'hasta' incluya todo ese día)."""
+    return (date.fromisoformat(dia[:10]) + timedelta(days=1)).isoformat()
+
+
+def _escapar_like(texto):
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+# ----------------------------------------------------
+# SELECCIÓN Y MIGRACIÓN
+# ----------------------------------------------------
+def crear_almacenamiento(tipo=None, destino=None):
+    """Crea el backend configurado (por defecto, los archivos JSON del directorio actual)."""
+    tipo = tipo or os.environ.get('FINANZAS_ALMACENAMIENTO', 'json')
+
+    if tipo == 'json':
+        return AlmacenamientoJSON(destino or os.environ.get('FINANZAS_DATOS', '.'))
+    if tipo == 'sqlite':
+        return AlmacenamientoSQLite(destino or os.environ.get('FINANZAS_DB', 'finanzas.db'))
+    if tipo == 'fragmentado':
+        return AlmacenamientoFragmentado(destino or os.environ.get('FINANZAS_DATOS', 'datos'))
+
+    raise ValueError(f"Tipo de almacenamiento desconocido: {tipo}")
+
+
+def migrar(origen, destino):
+    """Copia todos los datos de un backend a otro. Devuelve cuántos usuarios copió."""
+    emails = set()
+    for coleccion in COLECCIONES:
+        # Una escritura por colección (o por fragmento), no una por usuario
+        documentos = list(origen.iterar(coleccion))
+        destino.guardar_muchos(coleccion, documentos)
+        emails.update(email for email, _ in documentos)
+
+    for email, lista in origen.iterar_transacciones():
+        destino.agregar_transacciones(email, lista)
+        emails.add(email)
+
+    for email, acumulados in origen.iterar_acumulados():
+        destino.reemplazar_acumulados(email, acumulados)
+
+    return len(emails)
@@ -0,0 +1,121 @@
+# ----------------------------------------------------
+# ANALÍTICA EN COLUMNAS (versión rápida de utilidades_avanzadas)
+# ----------------------------------------------------
+# Las funciones de app.py (procesar_transacciones_numeros, matriz_historial,
+# ...) recorren listas de diccionarios con filter/map/reduce. Acá las mismas
+# cuentas se hacen sobre columnas: un arreglo con todos los montos y listas
+# con descripciones y tipos. Con NumPy instalado las operaciones sobre montos
+# son vectorizadas; sin NumPy se usa array('d') y comprensiones de listas.
+#
+# Los resultados son IGUALES a los de app.py (ver benchmarks/bench_analitica.py).
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+IMPUESTO = 1.10
+
+
+class ColumnasTransacciones:
+    """Transacciones de un usuario guardadas por columnas."""
+
+    __slots__ = ("montos", "descripciones", "tipos")
+
+    def __init__(self, montos, descripciones, tipos):
+        self.montos = montos
+        self.descripciones = descripciones
+        self.tipos = tipos
+
+    @classmethod
+    def desde_transacciones(cls, transacciones):
+        montos = [t.get('monto', 0) for t in transacciones]
+        return cls(
+            np.array(montos, dtype=float) if np is not None else array('d', montos),
+            [t.get('descripcion', '') for t in transacciones],
+            [t.get('tipo') for t in transacciones]
+        )
+
+    @classmethod
+    def desde_montos(cls, montos):
+        montos = list(montos)
+        return cls(
+            np.array(montos, dtype=float) if np is not None else array('d', montos),
+            [''] * len(montos),
+            [None] * len(montos)
+        )
+
+    def __len__(self):
+        return len(self.montos)
+
+
+# -----------------------
+# MONTOS (filter + map + reduce)
+# -----------------------
+def procesar_montos(columnas):
+    """Igual que procesar_transacciones_numeros: (positivos, con_impuesto, total)."""
+    if np is None:
+        positivos = [x for x in columnas.montos if x > 0]
+        con_impuesto = [round(x * IMPUESTO, 2) for x in positivos]
+        total = 0
+        for x in con_impuesto:
+            total += x
+        return positivos, con_impuesto, total
+
+    positivos = columnas.montos[columnas.montos > 0]
+    con_impuesto = _redondear_2(positivos * IMPUESTO)
+    # cumsum suma de izquierda a derecha, igual que reduce (np.sum agrupa de a pares)
+    total = float(np.cumsum(con_impuesto)[-1]) if len(con_impuesto) else 0
+    return positivos.tolist(), con_impuesto.tolist(), total
+
+
+def _redondear_2(valores):
+    """round(x, 2) vectorizado con el mismo resultado que el round() de Python.
+
+    np.round multiplica por 100 y redondea, y eso puede diferir de round() en
+    valores que quedan justo a mitad de camino. Esos pocos se recalculan con round().
+    """
+    redondeados = np.round(valores, 2)
+    escalados = valores * 100
+    dudosos = np.flatnonzero(np.abs(escalados - np.floor(escalados) - 0.5) < 1e-6)
+    for i in dudosos:
+        redondeados[i] = round(float(valores[i]), 2)
+    return redondeados
+
+
+def resumen_columnar(transacciones):
+    """Igual que resumen_transacciones_dicts, pero pasando por columnas."""
+    return procesar_montos(ColumnasTransacciones.desde_transacciones(transacciones))
+
+
+# -----------------------
+# SETS Y MATRICES
+# -----------------------
+def categorias_columnar(columnas):
+    """Igual que categorias_unicas: primera palabra de cada descripción, en minúscula."""
+    categorias = set()
+    for desc in set(columnas.descripciones):
+        palabras = (desc or '').split(None, 1)
+        if palabras:
+            categorias.add(palabras[0].lower())
+    return categorias
+
+
+def matriz_columnar(columnas):
+    """Igual que matriz_historial: [[descripcion, monto], ...]."""
+    montos = columnas.montos.tolist()
+    return [[desc, monto] for desc, monto in zip(columnas.descripciones, montos)]
+
+
+def ejemplo_todo_columnar(transacciones):
+    """Las mismas cuentas que ejemplo_todo (sin escribir el log), armando las columnas una sola vez."""
+    columnas = ColumnasTransacciones.desde_transacciones(transacciones)
+    positivos, con_impuesto, total = procesar_montos(columnas)
+    return {
+        'positivos': positivos,
+        'con_impuesto': con_impuesto,
+        'total': total,
+        'categorias': categorias_columnar(columnas),
+        'matriz': matriz_columnar(columnas)
+    }
@@ -1,62 +1,176 @@
 # ----------------------------------------------------
 # APLICACIÓN FLASK
 # ----------------------------------------------------
-import json
-from flask import Flask, render_template, request, redirect, url_for, session
-from datetime import datetime
+import hmac
+import io
+import time
+import uuid
+import click
+from flask import Flask, Response, abort, g, jsonify, render_template, request, redirect, url_for, session
+from flask import before_render_template, template_rendered
+from datetime import date, datetime
 
 # ============================================================
 # IMPORTS AGREGADOS DE utilidades_avanzadas.py
 # ============================================================
-import re
 from functools import reduce
 import os
 
+from almacenamiento import crear_almacenamiento, migrar, USUARIOS, INVERSIONES, RESUMENES, CARTERAS, VALUACIONES
+from resumenes import (PERIODOS, acumulados_vacios, aplicar_transaccion, rango_reporte, ranking_categorias,
+                       reconstruir_resumen, reporte, resumen_al_dia)
+from cartera import CON_TASA, TablaPrecios, agregar_posicion, desde_totales, revaluar, valuacion
+from categorias import categorizar
+from exportacion import FORMATOS, exportar, iterar_historial
+from idempotencia import ClaveReutilizada, crear_idempotencia, huella_de_archivo
+from importacion import importar, leer_registros
+from libro import al_dia, asentado, conciliar
+from proyecciones import proyectar_inversiones
+from revaluacion import revaluar_todo
+from auditoria import RegistroAuditoria
+from metricas import Metricas, AlmacenamientoInstrumentado
+from seguridad import CacheCredenciales, hashear, necesita_rehash
+from sesiones import crear_sesiones, perfil_de
+from validaciones import MENSAJES, validar_descripcion, validar_email, validar_password
+
 app = Flask(__name__)
 app.secret_key = "mi_clave_secreta"
 
 
 # ----------------------------------------------------
-# BASE DE DATOS (JSON SEGURO)
+# BASE DE DATOS (ver almacenamiento.py)
 # ----------------------------------------------------
+almacen = crear_almacenamiento()
 
-def cargar_usuarios():
-    try:
-        with open('usuarios.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return {k.lower(): v for k, v in data.items()}
-    except:
-        return {}
+# Log de auditoría (JSON lines, escrito en segundo plano)
+auditoria = RegistroAuditoria(os.environ.get(
+    'FINANZAS_AUDITORIA', os.path.join(os.path.dirname(__file__), 'auditoria.jsonl')))
 
-def guardar_usuarios(data):
-    with open('usuarios.json', 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+# Logins correctos recientes (evita recalcular el hash de la contraseña, ver seguridad.py)
+credenciales = CacheCredenciales()
 
+# Resultados de las escrituras ya hechas, por clave de idempotencia (ver idempotencia.py).
+# Con FINANZAS_IDEMPOTENCIA=sqlite se comparten entre workers: las huellas usan la secret_key
+idempotencia = crear_idempotencia(secreto=app.secret_key.encode("utf-8"))
 
-def cargar_transacciones():
-    try:
-        with open('transacciones.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return {k.lower(): v for k, v in data.items()}
-    except:
-        return {}
+# Precios y tasas para valuar las carteras (ver cartera.py)
+precios = TablaPrecios(os.environ.get(
+    'FINANZAS_PRECIOS', os.path.join(os.path.dirname(__file__), 'precios.json')))
 
-def guardar_transacciones(data):
-    with open('transacciones.json', 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+# Perfil y saldo de los usuarios logueados (evita releer usuarios.json en cada ruta, ver sesiones.py)
+sesiones = crear_sesiones()
 
+# Métricas por ruta y por fase (opcional: FINANZAS_METRICAS=1, se ven en /metrics)
+metricas = Metricas() if os.environ.get('FINANZAS_METRICAS') == '1' else None
+if metricas is not None:
+    almacen = AlmacenamientoInstrumentado(almacen, metricas)
+
+
+@app.before_request
+def iniciar_medicion():
+    if metricas is not None:
+        g.inicio_request = time.perf_counter()
+
+
+@app.after_request
+def terminar_medicion(response):
+    if metricas is not None and "inicio_request" in g:
+        metricas.observar_request(request.endpoint or "desconocida", request.method,
+                                  time.perf_counter() - g.inicio_request)
+    return response
+
+
+def iniciar_render(sender, template, context, **extra):
+    if metricas is not None:
+        g.inicio_render = time.perf_counter()
+
+
+def terminar_render(sender, template, context, **extra):
+    if metricas is not None and "inicio_render" in g:
+        metricas.observar_fase("render", time.perf_counter() - g.pop("inicio_render"))
+
+
+before_render_template.connect(iniciar_render, app)
+template_rendered.connect(terminar_render, app)
+
+
+def registrar_transaccion(email, transaccion):
+    """Guarda la transacción y actualiza el resumen del usuario (llamar dentro de almacen.bloquear)."""
+    registrar_transacciones(email, [transaccion])
+
+
+def registrar_transacciones(email, lista, resumenes=None):
+    """Igual que registrar_transaccion pero para un lote (más nueva primero): una sola escritura.
+
+    Con `resumenes` (una lista) el resumen actualizado no se guarda: se agrega ahí como
+    (email, resumen) para guardarlo junto con otros (importación, ver importacion.py).
+    """
+    resumen = almacen.obtener(RESUMENES, email)
+    if not resumen_al_dia(resumen):
+        # Se guarda abajo, ya con el lote sumado
+        resumen = rearmar_resumen(email, almacen.transacciones(email))
+
+    # La categoría se decide una sola vez, al escribir (ver categorias.py)
+    for transaccion in lista:
+        if not transaccion.get("categoria"):
+            transaccion["categoria"] = categorizar(transaccion.get("descripcion"))
+
+    # Sólo se suman los buckets del día, mes y año de cada transacción
+    acumulados = acumulados_vacios()
+    almacen.agregar_transacciones(email, lista)
+    for transaccion in reversed(lista):
+        aplicar_transaccion(resumen, transaccion, acumulados)
+    almacen.sumar_acumulados(email, acumulados)
+    if resumenes is None:
+        almacen.guardar(RESUMENES, email, resumen)
+    else:
+        resumenes.append((email, resumen))
+
+
+def obtener_resumen(email):
+    """Resumen del usuario; si no existe o es de una versión vieja se arma una vez desde el historial."""
+    resumen = almacen.obtener(RESUMENES, email)
+    if not resumen_al_dia(resumen):
+        with almacen.bloquear(email):
+            resumen = rearmar_resumen(email, almacen.transacciones(email))
+            almacen.guardar(RESUMENES, email, resumen)
+    return resumen
 
-def cargar_inversiones():
-    try:
-        with open('inversiones.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return {k.lower(): v for k, v in data.items()}
-    except:
-        return {}
 
-def guardar_inversiones(data):
-    with open('inversiones.json', 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+def rearmar_resumen(email, transacciones):
+    """Recalcula el resumen desde el historial y reemplaza los acumulados del usuario.
+    Devuelve el resumen, que queda para guardar (llamar dentro de almacen.bloquear)."""
+    resumen, acumulados = reconstruir_resumen(transacciones)
+    almacen.reemplazar_acumulados(email, acumulados)
+    return resumen
+
+
+def obtener_reporte(email, periodo="mes", ultimos=12, hasta=None):
+    """Filas de resumenes.reporte(), leyendo sólo los acumulados de los periodos pedidos."""
+    obtener_resumen(email)
+    desde, ultimo = rango_reporte(periodo, ultimos, hasta)
+    return reporte(almacen.acumulados(email, periodo, desde, ultimo), periodo, ultimos, hasta)
+
+
+def obtener_cartera(email):
+    """Cartera del usuario; si sólo tiene los totales viejos de inversiones.json se arma una vez desde ellos."""
+    cartera = almacen.obtener(CARTERAS, email)
+    if cartera is None:
+        with almacen.bloquear(email):
+            cartera = almacen.obtener(CARTERAS, email)
+            if cartera is None:
+                cartera = desde_totales(totales_inversiones(email), precios)
+                revaluar(cartera, precios)
+                almacen.guardar(CARTERAS, email, cartera)
+    return cartera
+
+
+def cierre_vigente(email, cartera):
+    """La última valuación de `flask --app app revaluar`, si no se agregaron posiciones después."""
+    cierre = almacen.obtener(VALUACIONES, email)
+    if cierre is None or cierre["posiciones"] != len(cartera["posiciones"]):
+        return None
+    return cierre
 
 # ============================================================
 # FUNCIONES AGREGADAS DE utilidades_avanzadas.py
@@ -154,16 +268,211 @@ def ejemplo_todo(transacciones):
 # ============================================================
 # -------------------------------------------
 
-def validar_email(email):
-    """Valida email con regex - FUNCIÓN DE utilidades_avanzadas.py"""
-    patron = r"^[\w\.-]+@[\w\.-]+\.\w{2,}$"
-    return re.match(patron, email) is not None
+# validar_email y validar_password ahora están en validaciones.py, con los
+# patrones precompilados y versiones por lotes (se importan arriba).
+
+
+# ----------------------------------------------------
+# OPERACIONES (sin Flask: las usan las rutas de acá y las de asgi.py)
+# ----------------------------------------------------
+class SaldoInsuficiente(Exception):
+    """La operación supera el saldo. Lleva los datos releídos para volver a mostrar la página."""
+
+    def __init__(self, usuario, totales=None):
+        super().__init__("Saldo insuficiente.")
+        self.usuario = usuario
+        self.totales = totales
+
+
+def perfil_actual(email):
+    """Nombre, saldo, etc. del usuario (sin la contraseña), o None si no existe.
+
+    Sale de las sesiones si está; si no, se lee del almacenamiento y queda guardado.
+    """
+    perfil = sesiones.obtener(email)
+    if perfil is None:
+        usuario = almacen.obtener(USUARIOS, email)
+        if usuario is None:
+            return None
+        perfil = perfil_de(usuario)
+        sesiones.guardar(email, perfil)
+    return perfil
+
+
+def una_vez(ambito, clave, operacion, *args, huella=None):
+    """operacion(*args), salvo que la `clave` ya se haya usado en `ambito` (el email del
+    usuario): entonces devuelve el resultado de esa vez. Sin clave se ejecuta siempre.
+    Los argumentos (contraseñas incluidas) no se guardan: el cache se queda con un HMAC."""
+    if not clave:
+        return operacion(*args)
+    if huella is None:
+        huella = (operacion.__name__,) + args
+    return idempotencia.ejecutar((ambito, clave), huella, lambda: operacion(*args))
+
+
+def autenticar(email, password):
+    """Devuelve None si el login es correcto, o el mensaje de error para mostrar."""
+    if not validar_email(email):
+        return "Ingresá un email válido."
+
+    usuario = almacen.obtener(USUARIOS, email)
+
+    if usuario is None:
+        return "No existe una cuenta con ese correo."
+
+    guardado = usuario["password"]
+    if not credenciales.verificar(email, password, guardado):
+        auditoria.registrar(email, "login_fallido")
+        return "Contraseña incorrecta."
+
+    if necesita_rehash(guardado):
+        # Contraseña vieja (texto plano o pocas iteraciones): se aprovecha que la tenemos
+        nuevo = hashear(password)
+        with almacen.bloquear(email):
+            datos = almacen.obtener(USUARIOS, email)
+            # Si otro request la cambió mientras tanto, no se pisa
+            if datos is not None and datos["password"] == guardado:
+                datos["password"] = nuevo
+                almacen.guardar(USUARIOS, email, datos)
+                credenciales.recordar(email, password, nuevo)
+
+    auditoria.registrar(email, "login")
+    return None
+
+
+def crear_usuario(nombre, email, password):
+    """Da de alta la cuenta. Devuelve None o el mensaje de error."""
+    if not validar_email(email):
+        return MENSAJES["email"]
+
+    if not validar_password(password):
+        return MENSAJES["password"]
+
+    if almacen.obtener(USUARIOS, email) is not None:
+        return "Ese correo ya existe."
+
+    # El hash es lento a propósito: se calcula antes de bloquear, como al cambiar la contraseña
+    hash_password = hashear(password)
+    with almacen.bloquear(email):
+        # Se vuelve a mirar dentro del bloqueo: otro request pudo crearla mientras tanto
+        if almacen.obtener(USUARIOS, email) is not None:
+            return "Ese correo ya existe."
+
+        almacen.guardar(USUARIOS, email, {
+            "nombre": nombre,
+            "password": hash_password,
+            "saldo": 0,
+            "libro": {"asientos": 0}
+        })
+
+    auditoria.registrar(email, "crear_cuenta")
+    return None
 
 
-def validar_password(password):
-    """Valida que la contraseña tenga al menos una mayúscula y un número - FUNCIÓN DE utilidades_avanzadas.py"""
-    patron = r"^(?=.*[A-Z])(?=.*\d).{6,}$"
-    return re.match(patron, password) is not None
+def pagar_gasto(email, descripcion, monto):
+    """Descuenta el pago del saldo y lo registra. Lanza SaldoInsuficiente si no alcanza."""
+    with almacen.bloquear(email):
+        # Se relee dentro del bloqueo: otro request pudo cambiar el saldo
+        usuario = al_dia(almacen, email, almacen.obtener(USUARIOS, email))
+
+        if monto > usuario["saldo"]:
+            raise SaldoInsuficiente(usuario)
+
+        # Primero el asiento y después el saldo con su checkpoint (ver libro.py)
+        registrar_transaccion(email, {
+            "fecha": datetime.now().isoformat(),
+            "descripcion": descripcion,
+            "monto": -monto,
+            "tipo": "gasto"
+        })
+
+        usuario["saldo"] -= monto
+        almacen.guardar(USUARIOS, email, asentado(usuario))
+        sesiones.guardar(email, perfil_de(usuario))
+
+    auditoria.registrar(email, "pagar", monto=monto, descripcion=descripcion)
+
+
+def cargar_ingreso(email, fuente, monto):
+    """Suma el ingreso al saldo y lo registra."""
+    with almacen.bloquear(email):
+        usuario = al_dia(almacen, email, almacen.obtener(USUARIOS, email))
+
+        registrar_transaccion(email, {
+            "fecha": datetime.now().isoformat(),
+            "descripcion": f"Ingreso: {fuente}",
+            "monto": monto,
+            "tipo": "ingreso"
+        })
+
+        usuario["saldo"] += monto
+        almacen.guardar(USUARIOS, email, asentado(usuario))
+        sesiones.guardar(email, perfil_de(usuario))
+
+    auditoria.registrar(email, "ingreso", monto=monto, fuente=fuente)
+
+
+def invertir(email, tipo, monto):
+    """Pasa `monto` del saldo al producto `tipo`. Lanza SaldoInsuficiente si no alcanza."""
+    with almacen.bloquear(email):
+        datos = al_dia(almacen, email, almacen.obtener(USUARIOS, email))
+        totales = totales_inversiones(email)
+
+        if monto > datos["saldo"]:
+            raise SaldoInsuficiente(datos, totales)
+
+        # Los totales viejos se pasan a la cartera antes de sumar la inversión nueva
+        cartera = almacen.obtener(CARTERAS, email) or desde_totales(totales, precios)
+        agregar_posicion(cartera, tipo, monto, precios)
+        revaluar(cartera, precios)
+
+        registrar_transaccion(email, {
+            "fecha": datetime.now().isoformat(),
+            "descripcion": f"Inversión en {tipo}",
+            "monto": -monto,
+            "tipo": "gasto"
+        })
+
+        datos["saldo"] -= monto
+        almacen.guardar(USUARIOS, email, asentado(datos))
+        sesiones.guardar(email, perfil_de(datos))
+
+        totales[tipo] += monto
+        almacen.guardar(INVERSIONES, email, totales)
+        almacen.guardar(CARTERAS, email, cartera)
+
+    auditoria.registrar(email, "invertir", monto=monto, producto=tipo)
+
+
+def cambiar_password(email, nueva):
+    nuevo = hashear(nueva)
+    with almacen.bloquear(email):
+        datos = almacen.obtener(USUARIOS, email)
+        datos["password"] = nuevo
+        almacen.guardar(USUARIOS, email, datos)
+
+    credenciales.olvidar(email)
+    sesiones.olvidar(email)
+    auditoria.registrar(email, "cambiar_contra")
+
+
+
+# ----------------------------------------------------
+# CLAVES DE IDEMPOTENCIA (formularios y header Idempotency-Key)
+# ----------------------------------------------------
+@app.context_processor
+def nueva_clave_idempotencia():
+    # Una clave nueva cada vez que se muestra un formulario: reenviarlo repite la clave
+    return {"clave_idempotencia": uuid.uuid4().hex}
+
+
+def clave_del_pedido():
+    return request.form.get("clave_idempotencia") or request.headers.get("Idempotency-Key")
+
+
+@app.errorhandler(ClaveReutilizada)
+def clave_reutilizada(error):
+    return Response(str(error), status=422)
 
 
 # ----------------------------------------------------
@@ -178,22 +487,10 @@ def login():
 
     email = request.form.get("email", "").strip().lower()
     password = request.form.get("password", "")
-    usuarios = cargar_usuarios()
-
-
-    if not validar_email(email):
-        return render_template("iniciar_sesion.html",
-                               error="Ingresá un email válido.")
-
-
-    if email not in usuarios:
-        return render_template("iniciar_sesion.html",
-                               error="No existe una cuenta con ese correo.")
 
-
-    if usuarios[email]["password"] != password:
-        return render_template("iniciar_sesion.html",
-                               error="Contraseña incorrecta.")
+    error = autenticar(email, password)
+    if error:
+        return render_template("iniciar_sesion.html", error=error)
 
     session["usuario_actual"] = email
     return redirect(url_for("inicio"))
@@ -209,19 +506,19 @@ def inicio():
         return redirect(url_for("login"))
 
     email = session["usuario_actual"]
-    usuarios = cargar_usuarios()
-    usuario = usuarios[email]
+    usuario = perfil_actual(email)
 
-    transacciones = cargar_transacciones().get(email, [])
+    if usuario is None:
+        return redirect(url_for("login"))
 
-    ingresos = sum(t["monto"] for t in transacciones if t["tipo"] == "ingreso")
-    gastos = sum(abs(t["monto"]) for t in transacciones if t["tipo"] == "gasto")
+    resumen = obtener_resumen(email)
 
     return render_template("inicio.html",
                            nombre=usuario["nombre"],
                            saldo=usuario["saldo"],
-                           ingresos=ingresos,
-                           gastos=gastos)
+                           ingresos=resumen["ingresos"],
+                           gastos=resumen["gastos"],
+                           categorias=ranking_categorias(resumen))
 
 
 
@@ -237,30 +534,10 @@ def crear_cuenta():
     email = request.form.get("email").strip().lower()
     password = request.form.get("password")
 
-    usuarios = cargar_usuarios()
-
-
-    if not validar_email(email):
-        return render_template('crear_cuenta.html',
-                               error="El email no tiene un formato válido.")
-
+    error = una_vez(email, clave_del_pedido(), crear_usuario, nombre, email, password)
+    if error:
+        return render_template('crear_cuenta.html', error=error)
 
-    if not validar_password(password):
-        return render_template(
-            'crear_cuenta.html',
-            error="La contraseña debe tener al menos UNA mayúscula y UN carácter especial (!@#$%&*?)."
-        )
-
-    if email in usuarios:
-        return render_template('crear_cuenta.html', error="Ese correo ya existe.")
-
-    usuarios[email] = {
-        "nombre": nombre,
-        "password": password,
-        "saldo": 0
-    }
-
-    guardar_usuarios(usuarios)
     return render_template("iniciar_sesion.html", mensaje="Cuenta creada correctamente.")
 
 
@@ -273,37 +550,29 @@ def pagar():
         return redirect(url_for("login"))
 
     email = session["usuario_actual"]
-    usuarios = cargar_usuarios()
-    usuario = usuarios[email]
+    usuario = perfil_actual(email)
+
+    if usuario is None:
+        return redirect(url_for("login"))
 
     if request.method == "POST":
         descripcion = request.form.get("descripcion")
         monto = float(request.form.get("monto", 0))
 
-#Validar saldo suficiente
+        if not validar_descripcion(descripcion or ""):
+            return render_template("pagar.html", usuario=usuario["nombre"], saldo=usuario["saldo"],
+                                   error=MENSAJES["descripcion"])
 
-        if monto > usuario["saldo"]:
+        try:
+            una_vez(email, clave_del_pedido(), pagar_gasto, email, descripcion, monto)
+        except SaldoInsuficiente as e:
             return render_template(
                 "pagar.html",
-                usuario=usuario["nombre"],
-                saldo=usuario["saldo"],
+                usuario=e.usuario["nombre"],
+                saldo=e.usuario["saldo"],
                 error="No tenés saldo suficiente para realizar este pago."
             )
 
-#validar monto positivo
-
-        usuario["saldo"] -= monto
-        guardar_usuarios(usuarios)
-
-        transacciones = cargar_transacciones()
-        transacciones.setdefault(email, []).insert(0, {
-            "fecha": datetime.now().isoformat(),
-            "descripcion": descripcion,
-            "monto": -monto,
-            "tipo": "gasto"
-        })
-        guardar_transacciones(transacciones)
-
         return redirect(url_for("inicio"))
 
     return render_template("pagar.html", usuario=usuario["nombre"], saldo=usuario["saldo"])
@@ -319,25 +588,16 @@ def ingreso():
         return redirect(url_for("login"))
 
     email = session["usuario_actual"]
-    usuarios = cargar_usuarios()
-    usuario = usuarios[email]
+    usuario = perfil_actual(email)
+
+    if usuario is None:
+        return redirect(url_for("login"))
 
     if request.method == "POST":
         fuente = request.form.get("fuente")
         monto = float(request.form.get("monto", 0))
 
-        usuario["saldo"] += monto
-        guardar_usuarios(usuarios)
-
-        transacciones = cargar_transacciones()
-        transacciones.setdefault(email, []).insert(0, {
-            "fecha": datetime.now().isoformat(),
-            "descripcion": f"Ingreso: {fuente}",
-            "monto": monto,
-            "tipo": "ingreso"
-        })
-        guardar_transacciones(transacciones)
-
+        una_vez(email, clave_del_pedido(), cargar_ingreso, email, fuente, monto)
         return redirect(url_for("inicio"))
 
     return render_template("ingreso.html", nombre=usuario["nombre"], saldo=usuario["saldo"])
@@ -347,6 +607,29 @@ def ingreso():
 # ----------------------------------------------------
 # MOVIMIENTOS 
 # ----------------------------------------------------
+MOVIMIENTOS_POR_PAGINA = 50
+
+def filtros_movimientos(args=None):
+    """Lee los filtros de la URL (?tipo=gasto&desde=2025-01-01&hasta=...&texto=luz&categoria=servicios).
+    Por defecto de request.args; asgi.py pasa los suyos."""
+    if args is None:
+        args = request.args
+    filtros = {
+        "tipo": args.get("tipo", ""),
+        "desde": args.get("desde", ""),
+        "hasta": args.get("hasta", ""),
+        "texto": args.get("texto", "").strip(),
+        "categoria": args.get("categoria", "").strip().lower()
+    }
+    if filtros["tipo"] not in ("ingreso", "gasto"):
+        filtros["tipo"] = ""
+    for clave in ("desde", "hasta"):
+        try:
+            datetime.fromisoformat(filtros[clave])
+        except ValueError:
+            filtros[clave] = ""
+    return {clave: valor for clave, valor in filtros.items() if valor}
+
 @app.route('/movimientos')
 def movimientos():
     if "usuario_actual" not in session:
@@ -354,79 +637,182 @@ def movimientos():
 
     usuario = session["usuario_actual"]
 
-    usuarios = cargar_usuarios()
-    saldo_real = usuarios[usuario]["saldo"]
+    datos = perfil_actual(usuario)
+
+    if datos is None:
+        return redirect(url_for('login'))
 
-    transacciones = cargar_transacciones().get(usuario, [])
+    saldo_real = datos["saldo"]
+
+    filtros = filtros_movimientos()
+
+    try:
+        transacciones, siguiente = almacen.transacciones_pagina(
+            usuario,
+            limite=MOVIMIENTOS_POR_PAGINA,
+            cursor=request.args.get("cursor") or None,
+            **filtros
+        )
+    except ValueError:
+        # Cursor mal escrito en la URL: se vuelve a la primera página
+        transacciones, siguiente = almacen.transacciones_pagina(
+            usuario, limite=MOVIMIENTOS_POR_PAGINA, **filtros)
 
     return render_template(
         "movimientos.html",
         transacciones=transacciones,
-        saldo=saldo_real
+        saldo=saldo_real,
+        filtros=filtros,
+        siguiente=siguiente
+    )
+
+@app.route('/movimientos/exportar')
+def exportar_movimientos():
+    if "usuario_actual" not in session:
+        return redirect(url_for('login'))
+
+    usuario = session["usuario_actual"]
+    formato = request.args.get("formato", "csv")
+
+    if formato not in FORMATOS:
+        return Response("Formato no soportado. Usá csv o ndjson.", status=400)
+
+    contenido = exportar(iterar_historial(almacen, usuario, **filtros_movimientos()), formato)
+
+    return Response(
+        contenido,
+        mimetype=FORMATOS[formato],
+        headers={"Content-Disposition": f"attachment; filename=movimientos.{formato}"}
     )
 
 # ----------------------------------------------------
 # INVERSIONES
 # ----------------------------------------------------
+def totales_inversiones(usuario):
+    return almacen.obtener(INVERSIONES, usuario) or {
+        "Fondos Comunes": 0,
+        "Acciones": 0,
+        "Bonos": 0,
+        "Plazo Fijo": 0
+    }
 
 @app.route('/inversiones', methods=['GET', 'POST'])
 def inversiones():
     usuario = session.get("usuario_actual", "").lower()
 
-    inversiones = cargar_inversiones()
-    usuarios = cargar_usuarios()
+    datos = perfil_actual(usuario) if usuario else None
 
-    if usuario not in inversiones:
-        inversiones[usuario] = {
-            "Fondos Comunes": 0,
-            "Acciones": 0,
-            "Bonos": 0,
-            "Plazo Fijo": 0
-        }
-
-    if usuario not in usuarios:
+    if datos is None:
         return redirect(url_for("login"))
 
     if request.method == "POST":
         monto = float(request.form.get("monto", 0))
         tipo = request.form.get("tipo")
 
-#Validar saldo suficiente
-
-        if monto > usuarios[usuario]["saldo"]:
+        try:
+            una_vez(usuario, clave_del_pedido(), invertir, usuario, tipo, monto)
+        except SaldoInsuficiente as e:
             return render_template(
                 "inversiones.html",
-                totales=inversiones[usuario],
-                saldo=usuarios[usuario]["saldo"],
+                totales=e.totales,
+                saldo=e.usuario["saldo"],
                 error="No tenés saldo suficiente para realizar esta inversión."
             )
 
-#Validacion de saldo positivo
+        return redirect(url_for('inversiones'))
 
-        usuarios[usuario]["saldo"] -= monto
-        guardar_usuarios(usuarios)
+    totales = totales_inversiones(usuario)
+    saldo = datos["saldo"]
+    cartera = obtener_cartera(usuario)
 
-        inversiones[usuario][tipo] += monto
-        guardar_inversiones(inversiones)
+    return render_template("inversiones.html",
+                           totales=totales,
+                           saldo=saldo,
+                           valuacion=valuacion(cartera, precios),
+                           cierre=cierre_vigente(usuario, cartera),
+                           proyeccion=proyectar_inversiones(totales))
 
-        transacciones = cargar_transacciones()
-        transacciones.setdefault(usuario, []).insert(0, {
-            "fecha": datetime.now().isoformat(),
-            "descripcion": f"Inversión en {tipo}",
-            "monto": -monto,
-            "tipo": "gasto"
-        })
-        guardar_transacciones(transacciones)
 
-        return redirect(url_for('inversiones'))
+# ----------------------------------------------------
+# REPORTES POR PERIODO (desde los acumulados por día, mes y año)
+# ----------------------------------------------------
+MAXIMO_PERIODOS = 3660
 
-    totales = inversiones[usuario]
-    saldo = usuarios[usuario]["saldo"]
+def parametros_reporte(args):
+    """(periodo, ultimos, hasta) de la URL; ValueError con el motivo si algo no sirve."""
+    periodo = args.get("periodo", "mes")
+    if periodo not in PERIODOS:
+        raise ValueError("El periodo tiene que ser dia, mes o año.")
+    try:
+        ultimos = int(args.get("ultimos", 12))
+        hasta = date.fromisoformat(args["hasta"]) if args.get("hasta") else None
+    except ValueError:
+        raise ValueError("Parámetros inválidos: ultimos es un número y hasta una fecha AAAA-MM-DD.")
+    if not 1 <= ultimos <= MAXIMO_PERIODOS:
+        raise ValueError(f"ultimos tiene que estar entre 1 y {MAXIMO_PERIODOS}.")
+    return periodo, ultimos, hasta
+
+@app.route('/reportes')
+def reportes():
+    """Ingresos, gastos e inversiones por periodo. Ej: gastos por mes de los
+    últimos 5 años -> /reportes?periodo=mes&ultimos=60"""
+    usuario = session.get("usuario_actual")
+    if not usuario:
+        return jsonify({"error": "Iniciá sesión."}), 401
 
-    return render_template("inversiones.html",
-                           totales=totales,
-                           saldo=saldo)
+    try:
+        periodo, ultimos, hasta = parametros_reporte(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    filas = obtener_reporte(usuario, periodo, ultimos, hasta)
+    return jsonify({"periodo": periodo, "filas": filas})
+
+
+# ----------------------------------------------------
+# IMPORTACIÓN MASIVA (back office)
+# ----------------------------------------------------
+def token_importacion_valido(recibido):
+    """Compara el header con FINANZAS_TOKEN_IMPORTACION en tiempo constante (como seguridad.py)."""
+    token = os.environ.get("FINANZAS_TOKEN_IMPORTACION")
+    return bool(token) and hmac.compare_digest((recibido or "").encode("utf-8"), token.encode("utf-8"))
+
+@app.route('/api/importar', methods=['POST'])
+def api_importar():
+    """Recibe un archivo CSV/NDJSON en el campo "archivo". Requiere el header
+    X-Token-Importacion igual a la variable de entorno FINANZAS_TOKEN_IMPORTACION."""
+    if not token_importacion_valido(request.headers.get("X-Token-Importacion")):
+        return jsonify({"error": "No autorizado."}), 403
+
+    archivo = request.files.get("archivo")
+    formato = request.form.get("formato", "csv")
+    if archivo is None or formato not in ("csv", "ndjson"):
+        return jsonify({"error": "Enviá un archivo csv o ndjson en el campo 'archivo'."}), 400
+
+    def importar_archivo():
+        texto = io.TextIOWrapper(archivo.stream, encoding="utf-8-sig", newline="")
+        resultado = importar(almacen, leer_registros(texto, formato), registrar_transacciones)
+        # La importación cambia saldos de muchos usuarios: se vuelven a leer
+        sesiones.limpiar()
+        auditoria.registrar("api", "importar", importadas=resultado["importadas"],
+                            errores=len(resultado["errores"]))
+        return resultado
+
+    # Un reintento con el mismo Idempotency-Key no vuelve a importar el archivo
+    clave = request.headers.get("Idempotency-Key")
+    huella = (formato, huella_de_archivo(archivo.stream)) if clave else None
+    return jsonify(una_vez("api", clave, importar_archivo, huella=huella))
 
+# ----------------------------------------------------
+# MÉTRICAS (sólo desde la misma máquina)
+# ----------------------------------------------------
+@app.route('/metrics')
+def exponer_metricas():
+    if metricas is None:
+        abort(404)
+    if request.remote_addr not in ("127.0.0.1", "::1"):
+        abort(403)
+    return Response(metricas.exportar(), mimetype="text/plain; version=0.0.4")
 
 # ----------------------------------------------------
 # PERFIL
@@ -438,8 +824,7 @@ def perfil():
     if not usuario:
         return redirect(url_for("login"))
 
-    usuarios = cargar_usuarios()
-    datos = usuarios.get(usuario, {})
+    datos = perfil_actual(usuario) or {}
 
     return render_template("perfil.html", datos=datos, email=usuario)
 
@@ -457,13 +842,12 @@ def olvide_contra():
 @app.route('/procesar_olvide_contra', methods=['POST'])
 def procesar_olvide_contra():
     email = request.form.get('email', '').strip().lower()
-    usuarios = cargar_usuarios()
 
     if not email:
         return render_template('olvide_contra.html',
                                error="Ingresá tu email.")
 
-    if email not in usuarios:
+    if almacen.obtener(USUARIOS, email) is None:
         return render_template('olvide_contra.html',
                                error="Ese correo no existe.")
 
@@ -486,10 +870,7 @@ def cambiar_contra():
 
     nueva = request.form.get("password")
 
-    usuarios = cargar_usuarios()
-    usuarios[usuario]["password"] = nueva
-    guardar_usuarios(usuarios)
-
+    una_vez(usuario, clave_del_pedido(), cambiar_password, usuario, nueva)
     return redirect(url_for("perfil"))
 
 
@@ -503,6 +884,120 @@ def cerrar_sesion():
 
 
 
+# ----------------------------------------------------
+# COMANDOS (flask --app app <comando>)
+# ----------------------------------------------------
+@app.cli.command("migrar")
+@click.argument("tipo")
+@click.argument("destino")
+def comando_migrar(tipo, destino):
+    """Copia los datos actuales a otro backend (ej: flask --app app migrar sqlite finanzas.db, o migrar fragmentado datos)."""
+    cantidad = migrar(almacen, crear_almacenamiento(tipo, destino))
+    click.echo(f"Migrados {cantidad} usuarios a {tipo} ({destino}).")
+
+
+@app.cli.command("reconstruir-resumenes")
+@click.argument("email", required=False)
+def comando_reconstruir_resumenes(email):
+    """Recalcula los resúmenes de todos los usuarios (o de uno) desde el historial."""
+    if email:
+        historiales = [(email.lower(), almacen.transacciones(email))]
+    else:
+        historiales = almacen.iterar_transacciones()
+
+    cantidad = 0
+    for email_usuario, transacciones in historiales:
+        with almacen.bloquear(email_usuario):
+            almacen.guardar(RESUMENES, email_usuario, rearmar_resumen(email_usuario, transacciones))
+        cantidad += 1
+    click.echo(f"Resúmenes reconstruidos: {cantidad}.")
+
+
+@app.cli.command("importar")
+@click.argument("archivo", type=click.Path(exists=True, dir_okay=False))
+@click.option("--formato", type=click.Choice(["csv", "ndjson"]), default=None,
+              help="Por defecto sale de la extensión del archivo.")
+def comando_importar(archivo, formato):
+    """Importa un archivo de transacciones (email,fecha,descripcion,monto,tipo)."""
+    formato = formato or ("ndjson" if archivo.endswith((".ndjson", ".jsonl")) else "csv")
+    inicio_importacion = time.perf_counter()
+
+    with open(archivo, encoding="utf-8-sig", newline="") as f:
+        resultado = importar(almacen, leer_registros(f, formato), registrar_transacciones)
+    # Con FINANZAS_SESIONES=sqlite esto llega a los workers del servidor; en
+    # memoria, cada worker ve los saldos nuevos cuando vence su entrada (ttl)
+    sesiones.limpiar()
+    auditoria.registrar("cli", "importar", archivo=archivo, importadas=resultado["importadas"],
+                        errores=len(resultado["errores"]))
+
+    segundos = time.perf_counter() - inicio_importacion
+    for error in resultado["errores"]:
+        click.echo(f"Línea {error['linea']}: {error['error']}", err=True)
+    click.echo(f"Importadas {resultado['importadas']} transacciones de {resultado['usuarios']} usuarios "
+               f"en {segundos:.2f}s ({len(resultado['errores'])} errores).")
+
+
+@app.cli.command("precios")
+@click.argument("valores", nargs=-1, required=True)
+def comando_precios(valores):
+    """Actualiza la tabla de precios y tasas (ej: flask --app app precios Acciones=1.25 "Plazo Fijo=0.32")."""
+    nuevos, tasas = {}, {}
+    for valor in valores:
+        producto, _, numero = valor.partition("=")
+        try:
+            (tasas if producto in CON_TASA else nuevos)[producto] = float(numero)
+        except ValueError:
+            raise click.BadParameter(f"Se esperaba producto=número: {valor}")
+    try:
+        version = precios.actualizar(nuevos, tasas)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    click.echo(f"Tabla de precios actualizada (versión {version}).")
+
+
+@app.cli.command("revaluar")
+@click.option("--procesos", type=int, default=None, help="Procesos en paralelo (por defecto, uno por CPU).")
+@click.option("--lote", type=int, default=1000, help="Valuaciones por escritura.")
+def comando_revaluar(procesos, lote):
+    """Guarda la valuación de cierre de todas las carteras con la tabla de precios actual."""
+    def avance(cantidad, segundos):
+        click.echo(f"  {cantidad} carteras en {segundos:.1f}s", err=True)
+
+    # Cada proceso abre su propio almacenamiento con la misma configuración (variables de entorno)
+    resultado = revaluar_todo(None, None, precios.ruta, procesos, lote, avance=avance)
+    click.echo(f"Revaluadas {resultado['carteras']} carteras en {resultado['segundos']:.2f}s "
+               f"({resultado['por_segundo']:.0f} carteras/s con {resultado['procesos']} procesos).")
+
+
+@app.cli.command("conciliar")
+def comando_conciliar():
+    """Verifica saldos y totales de inversiones contra el historial (una pasada por todos los usuarios)."""
+    def al_encontrar(diferencia):
+        click.echo(f"{diferencia['email']} {diferencia['cuenta']}: libro {diferencia['libro']}, "
+                   f"guardado {diferencia['guardado']}")
+
+    inicio_conciliacion = time.perf_counter()
+    resultado = conciliar(almacen, al_encontrar)
+    for cuenta, importe in resultado["cuentas"].items():
+        click.echo(f"  {cuenta:<28}{importe:>16.2f}")
+    click.echo(f"{resultado['usuarios']} usuarios, {resultado['asientos']} asientos, "
+               f"{resultado['diferencias']} diferencias "
+               f"({time.perf_counter() - inicio_conciliacion:.2f}s).")
+    if resultado["diferencias"]:
+        raise SystemExit(1)
+
+
+@app.cli.command("compactar")
+def comando_compactar():
+    """Vuelca el journal de transacciones en transacciones.json (backend JSON)."""
+    if not hasattr(almacen, "compactar"):
+        click.echo("El backend actual no usa journal.")
+        return
+    almacen.compactar()
+    click.echo("Journal compactado.")
+
+
+
 # ----------------------------------------------------
 # EJECUCIÓN
 # ----------------------------------------------------
@@ -0,0 +1,442 @@
+# ----------------------------------------------------
+# MODO ASGI (producción)
+# ----------------------------------------------------
+# Las mismas rutas de app.py sobre Quart (la versión async de Flask), para
+# servir con un servidor ASGI:
+#
+#   pip install quart hypercorn
+#   cd app_flask
+#   hypercorn asgi:app --bind 0.0.0.0:8000
+#
+# Un solo worker atiende miles de conexiones abiertas: mientras un request
+# espera al disco, el event loop sigue atendiendo a los demás. Los backends
+# de almacenamiento son síncronos (archivos JSON, sqlite3), así que cada
+# acceso se corre en un pool de hilos acotado (FINANZAS_HILOS_IO, 32 por
+# defecto) con `a_hilo`. La lógica de cada operación (pagar, invertir, ...)
+# es la de app.py: acá sólo cambia cómo se atiende el request.
+#
+# Sesiones, templates y datos son los mismos: se puede pasar de un modo al
+# otro sin que nadie tenga que volver a loguearse.
+import asyncio
+import functools
+import io
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from quart import Quart, Response, jsonify, redirect, render_template, request, session, url_for
+
+import app as nucleo
+from almacenamiento import USUARIOS
+from cartera import valuacion
+from exportacion import FORMATOS, exportar, iterar_historial
+from idempotencia import ClaveReutilizada, huella_de_archivo
+from importacion import importar, leer_registros
+from proyecciones import proyectar_inversiones
+from resumenes import ranking_categorias
+from validaciones import MENSAJES, validar_descripcion
+
+app = Quart(__name__)
+app.secret_key = nucleo.app.secret_key
+
+_hilos = ThreadPoolExecutor(max_workers=int(os.environ.get("FINANZAS_HILOS_IO", "32")),
+                            thread_name_prefix="finanzas-io")
+
+
+async def a_hilo(funcion, *args, **kwargs):
+    """Corre una función bloqueante (almacenamiento, archivos) sin frenar el event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hilos, functools.partial(funcion, *args, **kwargs))
+
+
+async def obtener_usuario(email):
+    # Perfil sin contraseña, desde las sesiones (ver sesiones.py); nucleo.almacen
+    # y nucleo.sesiones se leen en cada llamada (los tests los reemplazan)
+    return await a_hilo(nucleo.perfil_actual, email)
+
+
+async def iterar_en_hilos(iterador):
+    """Recorre un generador bloqueante de a un elemento por hilo (para respuestas en streaming)."""
+    fin = object()
+    while True:
+        elemento = await a_hilo(next, iterador, fin)
+        if elemento is fin:
+            return
+        yield elemento
+
+
+# ----------------------------------------------------
+# CLAVES DE IDEMPOTENCIA (ver app.py)
+# ----------------------------------------------------
+@app.context_processor
+async def nueva_clave_idempotencia():
+    return {"clave_idempotencia": uuid.uuid4().hex}
+
+
+def clave_del_pedido(formulario):
+    return formulario.get("clave_idempotencia") or request.headers.get("Idempotency-Key")
+
+
+@app.errorhandler(ClaveReutilizada)
+async def clave_reutilizada(error):
+    return Response(str(error), status=422)
+
+
+# ----------------------------------------------------
+# LOGIN
+# ----------------------------------------------------
+@app.route('/', methods=['GET', 'POST'])
+async def login():
+    if request.method == 'GET':
+        session.clear()
+        return await render_template('iniciar_sesion.html')
+
+    formulario = await request.form
+    email = formulario.get("email", "").strip().lower()
+    password = formulario.get("password", "")
+
+    error = await a_hilo(nucleo.autenticar, email, password)
+    if error:
+        return await render_template("iniciar_sesion.html", error=error)
+
+    session["usuario_actual"] = email
+    return redirect(url_for("inicio"))
+
+
+# ----------------------------------------------------
+# INICIO
+# ----------------------------------------------------
+@app.route("/inicio")
+async def inicio():
+    if "usuario_actual" not in session:
+        return redirect(url_for("login"))
+
+    email = session["usuario_actual"]
+    usuario = await obtener_usuario(email)
+
+    if usuario is None:
+        return redirect(url_for("login"))
+
+    resumen = await a_hilo(nucleo.obtener_resumen, email)
+
+    return await render_template("inicio.html",
+                                 nombre=usuario["nombre"],
+                                 saldo=usuario["saldo"],
+                                 ingresos=resumen["ingresos"],
+                                 gastos=resumen["gastos"],
+                                 categorias=ranking_categorias(resumen))
+
+
+# ----------------------------------------------------
+# CREAR CUENTA
+# ----------------------------------------------------
+@app.route('/crear_cuenta', methods=['GET', 'POST'])
+async def crear_cuenta():
+    if request.method == 'GET':
+        return await render_template('crear_cuenta.html')
+
+    formulario = await request.form
+    nombre = formulario.get("nombre")
+    email = formulario.get("email", "").strip().lower()
+    password = formulario.get("password", "")
+
+    error = await a_hilo(nucleo.una_vez, email, clave_del_pedido(formulario),
+                         nucleo.crear_usuario, nombre, email, password)
+    if error:
+        return await render_template('crear_cuenta.html', error=error)
+
+    return await render_template("iniciar_sesion.html", mensaje="Cuenta creada correctamente.")
+
+
+# ----------------------------------------------------
+# PAGAR (GASTO)
+# ----------------------------------------------------
+@app.route('/pagar', methods=['GET', 'POST'])
+async def pagar():
+    if "usuario_actual" not in session:
+        return redirect(url_for("login"))
+
+    email = session["usuario_actual"]
+    usuario = await obtener_usuario(email)
+
+    if usuario is None:
+        return redirect(url_for("login"))
+
+    if request.method == "POST":
+        formulario = await request.form
+        descripcion = formulario.get("descripcion")
+        monto = float(formulario.get("monto", 0))
+
+        if not validar_descripcion(descripcion or ""):
+            return await render_template("pagar.html", usuario=usuario["nombre"], saldo=usuario["saldo"],
+                                         error=MENSAJES["descripcion"])
+
+        try:
+            await a_hilo(nucleo.una_vez, email, clave_del_pedido(formulario),
+                         nucleo.pagar_gasto, email, descripcion, monto)
+        except nucleo.SaldoInsuficiente as e:
+            return await render_template(
+                "pagar.html",
+                usuario=e.usuario["nombre"],
+                saldo=e.usuario["saldo"],
+                error="No tenés saldo suficiente para realizar este pago."
+            )
+
+        return redirect(url_for("inicio"))
+
+    return await render_template("pagar.html", usuario=usuario["nombre"], saldo=usuario["saldo"])
+
+
+# ----------------------------------------------------
+# INGRESO
+# ----------------------------------------------------
+@app.route('/ingreso', methods=['GET', 'POST'])
+async def ingreso():
+    if "usuario_actual" not in session:
+        return redirect(url_for("login"))
+
+    email = session["usuario_actual"]
+    usuario = await obtener_usuario(email)
+
+    if usuario is None:
+        return redirect(url_for("login"))
+
+    if request.method == "POST":
+        formulario = await request.form
+        fuente = formulario.get("fuente")
+        monto = float(formulario.get("monto", 0))
+
+        await a_hilo(nucleo.una_vez, email, clave_del_pedido(formulario),
+                     nucleo.cargar_ingreso, email, fuente, monto)
+        return redirect(url_for("inicio"))
+
+    return await render_template("ingreso.html", nombre=usuario["nombre"], saldo=usuario["saldo"])
+
+
+# ----------------------------------------------------
+# MOVIMIENTOS
+# ----------------------------------------------------
+@app.route('/movimientos')
+async def movimientos():
+    if "usuario_actual" not in session:
+        return redirect(url_for('login'))
+
+    usuario = session["usuario_actual"]
+    datos = await obtener_usuario(usuario)
+
+    if datos is None:
+        return redirect(url_for('login'))
+
+    filtros = nucleo.filtros_movimientos(request.args)
+
+    try:
+        transacciones, siguiente = await a_hilo(
+            nucleo.almacen.transacciones_pagina,
+            usuario,
+            limite=nucleo.MOVIMIENTOS_POR_PAGINA,
+            cursor=request.args.get("cursor") or None,
+            **filtros
+        )
+    except ValueError:
+        # Cursor mal escrito en la URL: se vuelve a la primera página
+        transacciones, siguiente = await a_hilo(
+            nucleo.almacen.transacciones_pagina,
+            usuario, limite=nucleo.MOVIMIENTOS_POR_PAGINA, **filtros)
+
+    return await render_template(
+        "movimientos.html",
+        transacciones=transacciones,
+        saldo=datos["saldo"],
+        filtros=filtros,
+        siguiente=siguiente
+    )
+
+
+@app.route('/movimientos/exportar')
+async def exportar_movimientos():
+    if "usuario_actual" not in session:
+        return redirect(url_for('login'))
+
+    usuario = session["usuario_actual"]
+    formato = request.args.get("formato", "csv")
+
+    if formato not in FORMATOS:
+        return Response("Formato no soportado. Usá csv o ndjson.", status=400)
+
+    historial = iterar_historial(nucleo.almacen, usuario, **nucleo.filtros_movimientos(request.args))
+
+    return Response(
+        iterar_en_hilos(exportar(historial, formato)),
+        mimetype=FORMATOS[formato],
+        headers={"Content-Disposition": f"attachment; filename=movimientos.{formato}"}
+    )
+
+
+# ----------------------------------------------------
+# INVERSIONES
+# ----------------------------------------------------
+@app.route('/inversiones', methods=['GET', 'POST'])
+async def inversiones():
+    usuario = session.get("usuario_actual", "").lower()
+
+    datos = await obtener_usuario(usuario) if usuario else None
+
+    if datos is None:
+        return redirect(url_for("login"))
+
+    if request.method == "POST":
+        formulario = await request.form
+        monto = float(formulario.get("monto", 0))
+        tipo = formulario.get("tipo")
+
+        try:
+            await a_hilo(nucleo.una_vez, usuario, clave_del_pedido(formulario),
+                         nucleo.invertir, usuario, tipo, monto)
+        except nucleo.SaldoInsuficiente as e:
+            return await render_template(
+                "inversiones.html",
+                totales=e.totales,
+                saldo=e.usuario["saldo"],
+                error="No tenés saldo suficiente para realizar esta inversión."
+            )
+
+        return redirect(url_for('inversiones'))
+
+    totales = await a_hilo(nucleo.totales_inversiones, usuario)
+    cartera = await a_hilo(nucleo.obtener_cartera, usuario)
+    cierre = await a_hilo(nucleo.cierre_vigente, usuario, cartera)
+
+    return await render_template("inversiones.html",
+                                 totales=totales,
+                                 saldo=datos["saldo"],
+                                 valuacion=valuacion(cartera, nucleo.precios),
+                                 cierre=cierre,
+                                 proyeccion=proyectar_inversiones(totales))
+
+
+# ----------------------------------------------------
+# REPORTES POR PERIODO
+# ----------------------------------------------------
+@app.route('/reportes')
+async def reportes():
+    usuario = session.get("usuario_actual")
+    if not usuario:
+        return jsonify({"error": "Iniciá sesión."}), 401
+
+    try:
+        periodo, ultimos, hasta = nucleo.parametros_reporte(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    filas = await a_hilo(nucleo.obtener_reporte, usuario, periodo, ultimos, hasta)
+    return jsonify({"periodo": periodo, "filas": filas})
+
+
+# ----------------------------------------------------
+# IMPORTACIÓN MASIVA (back office)
+# ----------------------------------------------------
+@app.route('/api/importar', methods=['POST'])
+async def api_importar():
+    """Igual que en app.py: archivo en el campo "archivo" y header X-Token-Importacion."""
+    if not nucleo.token_importacion_valido(request.headers.get("X-Token-Importacion")):
+        return jsonify({"error": "No autorizado."}), 403
+
+    archivos = await request.files
+    formulario = await request.form
+    archivo = archivos.get("archivo")
+    formato = formulario.get("formato", "csv")
+    if archivo is None or formato not in ("csv", "ndjson"):
+        return jsonify({"error": "Enviá un archivo csv o ndjson en el campo 'archivo'."}), 400
+
+    def importar_archivo():
+        texto = io.TextIOWrapper(archivo.stream, encoding="utf-8-sig", newline="")
+        resultado = importar(nucleo.almacen, leer_registros(texto, formato), nucleo.registrar_transacciones)
+        nucleo.sesiones.limpiar()
+        nucleo.auditoria.registrar("api", "importar", importadas=resultado["importadas"],
+                                   errores=len(resultado["errores"]))
+        return resultado
+
+    clave = request.headers.get("Idempotency-Key")
+
+    def importar_una_vez():
+        # El hash del archivo también lee del disco: va en el mismo hilo
+        huella = (formato, huella_de_archivo(archivo.stream)) if clave else None
+        return nucleo.una_vez("api", clave, importar_archivo, huella=huella)
+
+    return jsonify(await a_hilo(importar_una_vez))
+
+
+# ----------------------------------------------------
+# PERFIL
+# ----------------------------------------------------
+@app.route('/perfil')
+async def perfil():
+    usuario = session.get("usuario_actual")
+
+    if not usuario:
+        return redirect(url_for("login"))
+
+    datos = await obtener_usuario(usuario) or {}
+
+    return await render_template("perfil.html", datos=datos, email=usuario)
+
+
+# ----------------------------------------------------
+# OLVIDÉ CONTRASEÑA
+# ----------------------------------------------------
+@app.route('/olvide_contra')
+async def olvide_contra():
+    return await render_template('olvide_contra.html')
+
+
+@app.route('/procesar_olvide_contra', methods=['POST'])
+async def procesar_olvide_contra():
+    formulario = await request.form
+    email = formulario.get('email', '').strip().lower()
+
+    if not email:
+        return await render_template('olvide_contra.html',
+                                     error="Ingresá tu email.")
+
+    # Directo del almacenamiento, como la ruta Flask: un email cualquiera no entra a las sesiones
+    if await a_hilo(nucleo.almacen.obtener, USUARIOS, email) is None:
+        return await render_template('olvide_contra.html',
+                                     error="Ese correo no existe.")
+
+    mensaje = f"Se envió un enlace de recuperación a {email}."
+    return await render_template('olvide_contra.html', mensaje=mensaje)
+
+
+# ----------------------------------------------------
+# CAMBIAR CONTRASEÑA
+# ----------------------------------------------------
+@app.route('/cambiar_contra', methods=['GET', 'POST'])
+async def cambiar_contra():
+    usuario = session.get("usuario_actual")
+
+    if not usuario:
+        return redirect(url_for('login'))
+
+    if request.method == "GET":
+        return await render_template("cambiar_contra.html")
+
+    formulario = await request.form
+    await a_hilo(nucleo.una_vez, usuario, clave_del_pedido(formulario),
+                 nucleo.cambiar_password, usuario, formulario.get("password"))
+    return redirect(url_for("perfil"))
+
+
+# ----------------------------------------------------
+# CERRAR SESIÓN
+# ----------------------------------------------------
+@app.route('/cerrar_sesion')
+async def cerrar_sesion():
+    session.clear()
+    return redirect(url_for("login"))
+
+
+# ----------------------------------------------------
+# EJECUCIÓN (desarrollo; en producción usar hypercorn/uvicorn)
+# ----------------------------------------------------
+if __name__ == "__main__":
+    app.run(debug=True)
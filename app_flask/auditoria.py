@@ -0,0 +1,113 @@
+# ----------------------------------------------------
+# AUDITORÍA (log estructurado en segundo plano)
+# ----------------------------------------------------
+# guardar_log_texto (app.py) abre, escribe una línea y cierra el archivo en
+# cada llamada, dentro del request. Acá los registros van a una cola en
+# memoria y un hilo aparte los escribe de a lotes en formato JSON lines:
+#
+#   {"fecha": "2025-11-13T21:25:04.556429", "usuario": "ana@mail.com", "accion": "pagar", "monto": 40.0}
+#
+# Cuando el archivo pasa `tamaño_maximo` bytes se rota: auditoria.jsonl.1,
+# auditoria.jsonl.2, ... (se conservan `copias` archivos viejos).
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+# Al cerrar el proceso se espera como mucho esto a que se escriba lo encolado
+ESPERA_AL_SALIR = 5
+
+
+def crear_log_registro(usuario, accion, **datos):
+    """Versión estructurada de crear_log_tuple: un dict listo para serializar."""
+    registro = {"fecha": datetime.now().isoformat(), "usuario": usuario, "accion": accion}
+    registro.update(datos)
+    return registro
+
+
+class RegistroAuditoria:
+    """Escritor de auditoría con cola, escrituras por lotes y rotación por tamaño."""
+
+    def __init__(self, archivo, tamaño_maximo=5 * 1024 * 1024, copias=5, lote=500, intervalo=0.5):
+        self.archivo = archivo
+        self.tamaño_maximo = tamaño_maximo
+        self.copias = copias
+        self.lote = lote
+        self.intervalo = intervalo
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._lock_inicio = threading.Lock()
+
+    def registrar(self, usuario, accion, **datos):
+        """Encola un registro; no toca el disco (eso lo hace el hilo escritor)."""
+        self._iniciar()
+        self._cola.put(crear_log_registro(usuario, accion, **datos))
+
+    def vaciar(self, timeout=None):
+        """Espera a que todo lo encolado esté escrito (como mucho `timeout` segundos).
+        Devuelve False si quedaron registros sin escribir."""
+        hilo = self._hilo
+        if hilo is None:
+            return True
+        limite = None if timeout is None else time.monotonic() + timeout
+        # Como Queue.join(), pero sin colgarse si el hilo escritor ya no está
+        with self._cola.all_tasks_done:
+            while self._cola.unfinished_tasks:
+                espera = 0.1 if limite is None else min(0.1, limite - time.monotonic())
+                if espera <= 0 or not hilo.is_alive():
+                    return False
+                self._cola.all_tasks_done.wait(espera)
+        return True
+
+    def _iniciar(self):
+        if self._hilo is not None:
+            return
+        with self._lock_inicio:
+            if self._hilo is None:
+                hilo = threading.Thread(target=self._escribir_siempre, name="auditoria", daemon=True)
+                hilo.start()
+                atexit.register(self.vaciar, ESPERA_AL_SALIR)
+                self._hilo = hilo
+
+    def _escribir_siempre(self):
+        while True:
+            registros = [self._cola.get()]
+            # Se junta lo que llegue durante `intervalo` desde el primero (o hasta llenar el
+            # lote): un goteo constante no deja el lote abierto indefinidamente
+            limite = time.monotonic() + self.intervalo
+            try:
+                while len(registros) < self.lote:
+                    registros.append(self._cola.get(timeout=max(0, limite - time.monotonic())))
+            except queue.Empty:
+                pass
+
+            try:
+                self._escribir(registros)
+            except Exception:
+                # Un disco lleno (o un registro que no se puede escribir) no debe tumbar al
+                # hilo: se pierde este lote, no los siguientes
+                pass
+            finally:
+                for _ in registros:
+                    self._cola.task_done()
+
+    def _escribir(self, registros):
+        texto = ''.join(json.dumps(r, ensure_ascii=False, default=str) + '\n' for r in registros)
+        with open(self.archivo, 'a', encoding='utf-8') as f:
+            f.write(texto)
+            tamaño = f.tell()
+        if tamaño >= self.tamaño_maximo:
+            self._rotar()
+
+    def _rotar(self):
+        for n in range(self.copias - 1, 0, -1):
+            viejo = f"{self.archivo}.{n}"
+            if os.path.exists(viejo):
+                os.replace(viejo, f"{self.archivo}.{n + 1}")
+        if self.copias > 0:
+            os.replace(self.archivo, f"{self.archivo}.1")
+        else:
+            os.remove(self.archivo)
@@ -0,0 +1,77 @@
+# ----------------------------------------------------
+# BENCHMARK: analítica en columnas vs. funciones originales
+# ----------------------------------------------------
+# Uso (desde app_flask/):
+#   python benchmarks/bench_analitica.py
+#   python benchmarks/bench_analitica.py 100000 1000000
+#
+# Para cada tamaño genera transacciones al azar, corre las funciones de
+# app.py y las de analitica.py, verifica que den lo mismo y muestra tiempos.
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import resumen_transacciones_dicts, categorias_unicas, matriz_historial
+from analitica import (
+    ColumnasTransacciones,
+    procesar_montos,
+    categorias_columnar,
+    matriz_columnar,
+    np
+)
+
+PALABRAS = ["Comida", "Sueldo", "Luz", "Gas", "Internet", "Alquiler", "Transporte", "Inversión"]
+
+
+def generar(cantidad, semilla=42):
+    azar = random.Random(semilla)
+    transacciones = []
+    for _ in range(cantidad):
+        monto = round(azar.uniform(-50000, 50000), 2)
+        transacciones.append({
+            "fecha": "2025-01-01T00:00:00",
+            "descripcion": f"{azar.choice(PALABRAS)} {azar.randint(1, 999)}",
+            "monto": monto,
+            "tipo": "ingreso" if monto > 0 else "gasto"
+        })
+    return transacciones
+
+
+def medir(funcion, *args, repeticiones=3):
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(*args)
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return resultado, mejor
+
+
+def correr(cantidad):
+    transacciones = generar(cantidad)
+    columnas, t_columnas = medir(ColumnasTransacciones.desde_transacciones, transacciones)
+
+    casos = [
+        ("resumen", resumen_transacciones_dicts, procesar_montos),
+        ("categorias", categorias_unicas, categorias_columnar),
+        ("matriz", matriz_historial, matriz_columnar),
+    ]
+    print(f"\n{cantidad:,} transacciones (armar columnas: {t_columnas * 1000:.1f} ms)")
+    print(f"{'función':<12}{'original ms':>14}{'columnas ms':>14}{'speedup':>10}")
+    for nombre, original, columnar in casos:
+        esperado, t_original = medir(original, transacciones)
+        obtenido, t_columnar = medir(columnar, columnas)
+        if esperado != obtenido:
+            raise SystemExit(f"ERROR: '{nombre}' no coincide con la función original")
+        print(f"{nombre:<12}{t_original * 1000:>14.1f}{t_columnar * 1000:>14.1f}"
+              f"{t_original / t_columnar:>9.1f}x")
+
+
+if __name__ == "__main__":
+    tamaños = [int(n) for n in sys.argv[1:]] or [100_000, 1_000_000]
+    print("Backend:", "NumPy " + np.__version__ if np is not None else "array (sin NumPy)")
+    for cantidad in tamaños:
+        correr(cantidad)
@@ -0,0 +1,86 @@
+# ----------------------------------------------------
+# BENCHMARK DE LOGIN: hash de contraseñas y caché de credenciales
+# ----------------------------------------------------
+# Mide logins por segundo de app.autenticar (lo que hace la ruta "/") en
+# cuatro situaciones:
+#   - sin caché: cada login calcula el hash completo
+#   - caché fría: primer login de cada usuario (calcula y guarda en caché)
+#   - caché caliente: los mismos usuarios vuelven a entrar
+#   - re-hash: usuarios con la contraseña vieja en texto plano (se hashea y se guarda)
+#
+# Uso (desde app_flask/):
+#   python benchmarks/bench_login.py --usuarios 200 --hilos 4
+#   python benchmarks/bench_login.py --iteraciones 310000
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = "Clave123"
+
+
+def email_de(n):
+    return f"usuario{n}@bench.com"
+
+
+def medir(nombre, autenticar, emails, hilos):
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        errores = [e for e in pool.map(lambda email: autenticar(email, PASSWORD), emails) if e]
+    duracion = time.perf_counter() - inicio
+    if errores:
+        raise SystemExit(f"{nombre}: {errores[0]}")
+    print(f"{nombre:<16}{len(emails):>8}{duracion * 1000 / len(emails):>12.2f}{len(emails) / duracion:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del login con hash de contraseñas.")
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--hilos", type=int, default=1)
+    parser.add_argument("--iteraciones", type=int, help="costo del hash (por defecto FINANZAS_HASH_ITERACIONES)")
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="bench_login_")
+    os.environ["FINANZAS_ALMACENAMIENTO"] = "sqlite"
+    os.environ["FINANZAS_DB"] = os.path.join(directorio, "finanzas.db")
+    os.environ["FINANZAS_AUDITORIA"] = os.path.join(directorio, "auditoria.jsonl")
+    if args.iteraciones:
+        os.environ["FINANZAS_HASH_ITERACIONES"] = str(args.iteraciones)
+
+    import app as app_modulo
+    import seguridad
+    from almacenamiento import USUARIOS
+
+    try:
+        # Un solo hash para todos: armar miles de hashes lentos no es lo que se mide
+        guardado = seguridad.hashear(PASSWORD)
+        con_hash = [email_de(n) for n in range(args.usuarios)]
+        texto_plano = [email_de(n) for n in range(args.usuarios, 2 * args.usuarios)]
+        for email in con_hash:
+            app_modulo.almacen.guardar(USUARIOS, email, {"nombre": email, "password": guardado, "saldo": 0})
+        for email in texto_plano:
+            app_modulo.almacen.guardar(USUARIOS, email, {"nombre": email, "password": PASSWORD, "saldo": 0})
+
+        print(f"pbkdf2_sha256, {seguridad.ITERACIONES:,} iteraciones | {args.hilos} hilo(s)")
+        print(f"{'escenario':<16}{'logins':>8}{'ms/login':>12}{'logins/s':>12}")
+
+        cache = app_modulo.credenciales
+        app_modulo.credenciales = seguridad.CacheCredenciales(maximo=0)
+        medir("sin caché", app_modulo.autenticar, con_hash, args.hilos)
+
+        app_modulo.credenciales = cache
+        medir("caché fría", app_modulo.autenticar, con_hash, args.hilos)
+        medir("caché caliente", app_modulo.autenticar, con_hash, args.hilos)
+        medir("re-hash", app_modulo.autenticar, texto_plano, args.hilos)
+    finally:
+        app_modulo.auditoria.vaciar()
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
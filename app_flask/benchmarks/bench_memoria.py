@@ -0,0 +1,83 @@
+# ----------------------------------------------------
+# BENCHMARK DE MEMORIA: transacciones como dict vs. registros.Transaccion
+# ----------------------------------------------------
+# Uso (desde app_flask/):
+#   python benchmarks/bench_memoria.py               (1.000.000 de transacciones)
+#   python benchmarks/bench_memoria.py 100000
+#
+# Arma el texto JSON de un historial sintético y lo lee de dos formas:
+# como lo leía el backend JSON (un dict por transacción) y con
+# registros.Transaccion (lo que queda hoy en la cache). Muestra bytes por
+# transacción (tracemalloc) y el tiempo de lectura.
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from categorias import categorizar
+from registros import compactar_transacciones
+
+DESCRIPCIONES = ["Comida", "Luz", "Gas", "Internet", "Alquiler", "Transporte", "Ingreso: Sueldo",
+                 "Inversión en Bonos", "Farmacia", "Supermercado"]
+
+
+def generar_json(cantidad, usuarios=1000, semilla=42):
+    """{email: [transacciones]} como texto, igual que transacciones.json."""
+    azar = random.Random(semilla)
+    inicio = datetime(2020, 1, 1)
+    data = {}
+    for n in range(cantidad):
+        descripcion = azar.choice(DESCRIPCIONES)
+        ingreso = descripcion.startswith("Ingreso")
+        monto = round(azar.uniform(100, 100000), 2)
+        data.setdefault(f"usuario{n % usuarios}@bench.com", []).append({
+            "fecha": (inicio + timedelta(microseconds=azar.randrange(5 * 365 * 86400 * 10**6))).isoformat(),
+            "descripcion": descripcion,
+            "monto": monto if ingreso else -monto,
+            "tipo": "ingreso" if ingreso else "gasto",
+            "categoria": categorizar(descripcion)
+        })
+    return json.dumps(data, ensure_ascii=False)
+
+
+def medir_memoria(texto, object_hook):
+    gc.collect()
+    tracemalloc.start()
+    resultado = json.loads(texto, object_hook=object_hook)
+    gc.collect()
+    bytes_usados = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del resultado
+    return bytes_usados
+
+
+def medir_tiempo(texto, object_hook):
+    inicio = time.perf_counter()
+    json.loads(texto, object_hook=object_hook)
+    return time.perf_counter() - inicio
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    texto = generar_json(cantidad)
+    print(f"{cantidad:,} transacciones ({len(texto) / 1e6:.0f} MB de JSON)\n")
+    print(f"{'representación':<16}{'bytes/transacción':>20}{'total MB':>12}{'lectura s':>12}")
+
+    resultados = {}
+    for nombre, object_hook in (("dict", None), ("Transaccion", compactar_transacciones)):
+        bytes_usados = medir_memoria(texto, object_hook)
+        segundos = medir_tiempo(texto, object_hook)
+        resultados[nombre] = bytes_usados
+        print(f"{nombre:<16}{bytes_usados / cantidad:>20.0f}{bytes_usados / 1e6:>12.0f}{segundos:>12.2f}")
+
+    print(f"\nAhorro: {resultados['dict'] / resultados['Transaccion']:.1f}x menos memoria")
+
+
+if __name__ == "__main__":
+    main()
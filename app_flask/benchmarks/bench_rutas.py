@@ -0,0 +1,233 @@
+# ----------------------------------------------------
+# BENCHMARK DE CARGA: rutas de la app
+# ----------------------------------------------------
+# Genera usuarios.json / transacciones.json / inversiones.json sintéticos en un
+# directorio temporal, levanta la app sobre esos datos y le pega a cada ruta,
+# mostrando p50 / p99 y requests por segundo.
+#
+# Uso (desde app_flask/):
+#   python benchmarks/bench_rutas.py --usuarios 1000 --transacciones 200
+#   python benchmarks/bench_rutas.py --usuarios 100000 --transacciones 50 --backend sqlite
+#   python benchmarks/bench_rutas.py --servidor --hilos 8      (servidor WSGI local real)
+#
+# --transacciones es el MÁXIMO por usuario (cada uno tiene entre 0 y ese valor).
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = "Clave123"
+PRODUCTOS = ["Fondos Comunes", "Acciones", "Bonos", "Plazo Fijo"]
+DESCRIPCIONES = ["Comida", "Luz", "Gas", "Internet", "Alquiler", "Transporte", "Sueldo"]
+
+
+# ----------------------------------------------------
+# DATOS SINTÉTICOS
+# ----------------------------------------------------
+def email_de(n):
+    return f"usuario{n}@bench.com"
+
+
+def generar_datos(directorio, usuarios, max_transacciones, semilla=42):
+    """Escribe los tres JSON de a un usuario por vez (no arma todo en memoria)."""
+    azar = random.Random(semilla)
+    inicio = datetime(2020, 1, 1)
+
+    with open(os.path.join(directorio, "usuarios.json"), "w", encoding="utf-8") as fu, \
+         open(os.path.join(directorio, "transacciones.json"), "w", encoding="utf-8") as ft, \
+         open(os.path.join(directorio, "inversiones.json"), "w", encoding="utf-8") as fi:
+        for f in (fu, ft, fi):
+            f.write("{\n")
+
+        total = 0
+        for n in range(usuarios):
+            separador = ",\n" if n else ""
+            email = json.dumps(email_de(n))
+
+            cantidad = azar.randint(0, max_transacciones)
+            fechas = sorted((inicio + timedelta(seconds=azar.randint(0, 5 * 365 * 86400))
+                             for _ in range(cantidad)), reverse=True)
+            transacciones = []
+            for fecha in fechas:
+                ingreso = azar.random() < 0.3
+                monto = round(azar.uniform(100, 100000), 2)
+                transacciones.append({
+                    "fecha": fecha.isoformat(),
+                    "descripcion": ("Ingreso: " if ingreso else "") + azar.choice(DESCRIPCIONES),
+                    "monto": monto if ingreso else -monto,
+                    "tipo": "ingreso" if ingreso else "gasto"
+                })
+            total += cantidad
+
+            fu.write(f'{separador}{email}: {json.dumps({"nombre": f"Usuario {n}", "password": PASSWORD, "saldo": 10**9})}')
+            ft.write(f"{separador}{email}: {json.dumps(transacciones, ensure_ascii=False)}")
+            fi.write(f'{separador}{email}: {json.dumps({p: 0 for p in PRODUCTOS})}')
+
+        for f in (fu, ft, fi):
+            f.write("\n}\n")
+
+    return total
+
+
+# ----------------------------------------------------
+# ESCENARIOS
+# ----------------------------------------------------
+# (nombre, método, ruta, datos del formulario)
+ESCENARIOS = [
+    ("login", "POST", "/", None),
+    ("inicio", "GET", "/inicio", None),
+    ("movimientos", "GET", "/movimientos", None),
+    ("inversiones", "GET", "/inversiones", None),
+    ("pagar", "POST", "/pagar", {"descripcion": "bench", "monto": "1"}),
+    ("ingreso", "POST", "/ingreso", {"fuente": "bench", "monto": "1"}),
+]
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def correr_con_test_client(app, usuarios, requests_por_ruta, azar):
+    cliente = app.test_client()
+    resultados = {}
+    for nombre, metodo, ruta, datos in ESCENARIOS:
+        tiempos = []
+        inicio_total = time.perf_counter()
+        for _ in range(requests_por_ruta):
+            email = email_de(azar.randrange(usuarios))
+            if nombre == "login":
+                datos_request = {"email": email, "password": PASSWORD}
+            else:
+                datos_request = datos
+                with cliente.session_transaction() as sesion:
+                    sesion["usuario_actual"] = email
+
+            inicio = time.perf_counter()
+            respuesta = cliente.open(ruta, method=metodo, data=datos_request)
+            tiempos.append(time.perf_counter() - inicio)
+            if respuesta.status_code >= 400:
+                raise SystemExit(f"{nombre}: respuesta {respuesta.status_code}")
+        resultados[nombre] = (tiempos, time.perf_counter() - inicio_total)
+    return resultados
+
+
+def correr_con_servidor(app, usuarios, requests_por_ruta, hilos, azar):
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    servidor = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{servidor.server_port}"
+
+    # Un "navegador" (cookies propias) por hilo, cada uno logueado con un usuario al azar
+    locales = threading.local()
+
+    def navegador():
+        if not hasattr(locales, "opener"):
+            locales.opener = urllib.request.build_opener(
+                urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+            email = email_de(azar.randrange(usuarios))
+            datos = urllib.parse.urlencode({"email": email, "password": PASSWORD}).encode()
+            locales.opener.open(base + "/", datos).read()
+        return locales.opener
+
+    def pedir(escenario):
+        nombre, metodo, ruta, datos = escenario
+        opener = navegador()
+        if nombre == "login":
+            datos = {"email": email_de(azar.randrange(usuarios)), "password": PASSWORD}
+        cuerpo = urllib.parse.urlencode(datos).encode() if metodo == "POST" else None
+        inicio = time.perf_counter()
+        opener.open(base + ruta, cuerpo).read()
+        return time.perf_counter() - inicio
+
+    resultados = {}
+    try:
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            for escenario in ESCENARIOS:
+                inicio_total = time.perf_counter()
+                tiempos = list(pool.map(pedir, [escenario] * requests_por_ruta))
+                resultados[escenario[0]] = (tiempos, time.perf_counter() - inicio_total)
+    finally:
+        servidor.shutdown()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga de las rutas de la app.")
+    parser.add_argument("--usuarios", type=int, default=1000)
+    parser.add_argument("--transacciones", type=int, default=100, help="máximo por usuario")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--requests", type=int, default=200, help="requests por ruta")
+    parser.add_argument("--servidor", action="store_true", help="usar un servidor WSGI local en vez del test client")
+    parser.add_argument("--hilos", type=int, default=4, help="clientes concurrentes con --servidor")
+    parser.add_argument("--directorio", help="reusar/guardar los datos generados acá")
+    args = parser.parse_args()
+
+    directorio = args.directorio or tempfile.mkdtemp(prefix="bench_finanzas_")
+    os.makedirs(directorio, exist_ok=True)
+
+    if not os.path.exists(os.path.join(directorio, "usuarios.json")):
+        inicio = time.perf_counter()
+        total = generar_datos(directorio, args.usuarios, args.transacciones)
+        print(f"Generados {args.usuarios:,} usuarios y {total:,} transacciones "
+              f"en {time.perf_counter() - inicio:.1f}s ({directorio})")
+
+    # La app lee la configuración al importarse
+    os.environ["FINANZAS_ALMACENAMIENTO"] = "json"
+    os.environ["FINANZAS_DATOS"] = directorio
+    os.environ["FINANZAS_AUDITORIA"] = os.path.join(directorio, "auditoria.jsonl")
+    import app as app_modulo
+    from almacenamiento import AlmacenamientoSQLite
+
+    if args.backend == "sqlite":
+        ruta_db = os.path.join(directorio, "finanzas.db")
+        if os.path.exists(ruta_db):
+            app_modulo.almacen = AlmacenamientoSQLite(ruta_db)
+        else:
+            app_modulo.almacen = _migrar_a_sqlite(app_modulo.almacen, ruta_db)
+
+    azar = random.Random(7)
+    try:
+        if args.servidor:
+            resultados = correr_con_servidor(app_modulo.app, args.usuarios, args.requests, args.hilos, azar)
+        else:
+            resultados = correr_con_test_client(app_modulo.app, args.usuarios, args.requests, azar)
+    finally:
+        app_modulo.auditoria.vaciar()
+        if not args.directorio:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    print(f"\nBackend: {args.backend} | {'servidor WSGI, %d hilos' % args.hilos if args.servidor else 'test client'}")
+    print(f"{'ruta':<14}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for nombre, (tiempos, duracion) in resultados.items():
+        print(f"{nombre:<14}{percentil(tiempos, 50) * 1000:>10.2f}{percentil(tiempos, 99) * 1000:>10.2f}"
+              f"{len(tiempos) / duracion:>10.0f}")
+
+
+def _migrar_a_sqlite(origen, ruta_db):
+    from almacenamiento import AlmacenamientoSQLite, migrar
+
+    inicio = time.perf_counter()
+    destino = AlmacenamientoSQLite(ruta_db)
+    migrar(origen, destino)
+    print(f"Migrado a SQLite en {time.perf_counter() - inicio:.1f}s")
+    return destino
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# ----------------------------------------------------
+# CACHES COMPARTIDAS (LRU con vencimiento y SQLite por hilo)
+# ----------------------------------------------------
+# Las sesiones (sesiones.py), las credenciales verificadas (seguridad.py) y
+# las claves de idempotencia (idempotencia.py) guardan lo mismo: valores por
+# clave, como mucho `maximo`, que vencen a los `ttl` segundos. Sus versiones
+# compartidas entre workers usan un archivo SQLite con una conexión por hilo.
+# Las dos piezas están acá una sola vez.
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUConVencimiento:
+    """Valores por clave, como mucho `maximo`, que vencen a los `ttl` segundos.
+
+    Al pasar de `maximo` sale el menos usado. Si se pasa `descartable(valor)`,
+    los valores para los que devuelve False (por ejemplo, una operación todavía
+    en curso) no vencen ni se descartan.
+    """
+
+    def __init__(self, maximo=10000, ttl=600, descartable=None):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._descartable = descartable or (lambda valor: True)
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            return self._obtener(clave)
+
+    def guardar(self, clave, valor):
+        if self.maximo <= 0:
+            return
+        with self._lock:
+            self._guardar(clave, valor)
+
+    def guardar_si_falta(self, clave, valor):
+        """Devuelve el valor vigente de `clave`; si no hay, guarda y devuelve `valor`."""
+        with self._lock:
+            actual = self._obtener(clave)
+            if actual is not None:
+                return actual
+            self._guardar(clave, valor)
+            return valor
+
+    def olvidar(self, clave, valor=None):
+        """Saca `clave` (sólo si su valor es `valor`, si se pasa)."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and (valor is None or entrada[0] is valor):
+                del self._entradas[clave]
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def _obtener(self, clave):
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            return None
+        if entrada[1] <= time.monotonic() and self._descartable(entrada[0]):
+            del self._entradas[clave]
+            return None
+        self._entradas.move_to_end(clave)
+        return entrada[0]
+
+    def _guardar(self, clave, valor):
+        self._entradas[clave] = (valor, time.monotonic() + self.ttl)
+        self._entradas.move_to_end(clave)
+        sobran = len(self._entradas) - self.maximo
+        if sobran > 0:
+            # Las menos usadas están al principio; las que no se pueden descartar se saltean
+            salen = []
+            for vieja, (guardado, _) in self._entradas.items():
+                if len(salen) == sobran:
+                    break
+                if vieja != clave and self._descartable(guardado):
+                    salen.append(vieja)
+            for vieja in salen:
+                del self._entradas[vieja]
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+class ConexionesPorHilo:
+    """Una conexión SQLite por hilo al archivo `ruta`, en modo WAL (sqlite3 no comparte
+    conexiones entre hilos). Se llama como función: conexiones() -> conexión del hilo."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._local = threading.local()
+
+    def __call__(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.ruta, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
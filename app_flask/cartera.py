@@ -0,0 +1,233 @@
+# ----------------------------------------------------
+# CARTERA DE INVERSIONES (posiciones y valuación)
+# ----------------------------------------------------
+# inversiones.json sólo guarda cuánto se puso en cada producto. La cartera
+# guarda cada inversión como una posición con fecha y la valúa con una tabla
+# local de precios y tasas (precios.json):
+#
+#   - Fondos Comunes, Acciones, Bonos: al invertir se compran unidades al
+#     precio del día (monto / precio); valen unidades × precio actual.
+#   - Plazo Fijo: interés simple a la tasa anual (TNA) vigente al
+#     constituirlo, devengado por día.
+#
+# Para no recorrer las posiciones en cada página, la cartera lleva también
+# acumulados por producto que se actualizan al agregar cada posición:
+#
+#   con precio:  capital = Σ monto,  unidades = Σ unidades
+#   plazo fijo:  capital = Σ monto,  intereses = Σ monto·tasa,  devengado = Σ monto·tasa·día
+#
+# y la valuación sale de ellos, con un par de cuentas por producto:
+#
+#   valor = unidades × precio
+#   valor = capital + (intereses × hoy − devengado) / 365     (días como ordinal)
+#
+# Si cambian los precios o las tasas no se toca ninguna posición: la próxima
+# valuación ya usa la tabla nueva. La última valuación queda guardada en la
+# cartera con la versión de la tabla y la fecha; mientras ninguna cambie se
+# devuelve esa misma.
+import copy
+import json
+import math
+import os
+import threading
+from datetime import date, datetime
+
+from almacenamiento import guardar_json
+from proyecciones import TASAS_ANUALES
+
+PRODUCTOS = ("Fondos Comunes", "Acciones", "Bonos", "Plazo Fijo")
+CON_TASA = {"Plazo Fijo"}
+DIAS_POR_AÑO = 365
+
+
+# -----------------------
+# TABLA DE PRECIOS Y TASAS
+# -----------------------
+def tabla_inicial():
+    """Precio 1 para los productos con precio y las tasas de referencia para los de tasa."""
+    return {
+        "version": 0,
+        "precios": {p: 1.0 for p in PRODUCTOS if p not in CON_TASA},
+        "tasas": {p: TASAS_ANUALES[p] for p in CON_TASA}
+    }
+
+
+class TablaPrecios:
+    """precios.json: {"version", "actualizada", "precios": {producto: precio}, "tasas": {producto: TNA}}.
+
+    Se guarda en memoria y se relee sola si el archivo cambió (por ejemplo, si
+    otro proceso corrió `flask --app app precios`). Sin archivo usa tabla_inicial().
+    """
+
+    def __init__(self, ruta='precios.json'):
+        self.ruta = ruta
+        self._datos = None
+        self._firma = None
+        self._lock = threading.Lock()
+
+    def _firma_actual(self):
+        try:
+            estado = os.stat(self.ruta)
+        except FileNotFoundError:
+            return None
+        return (estado.st_mtime_ns, estado.st_size)
+
+    def datos(self):
+        firma = self._firma_actual()
+        with self._lock:
+            if self._datos is None or firma != self._firma:
+                if firma is None:
+                    self._datos = tabla_inicial()
+                else:
+                    with open(self.ruta, encoding='utf-8') as f:
+                        self._datos = json.load(f)
+                self._firma = firma
+            return self._datos
+
+    @property
+    def version(self):
+        return self.datos()["version"]
+
+    def precio(self, producto):
+        return self.datos()["precios"][producto]
+
+    def tasa(self, producto):
+        return self.datos()["tasas"][producto]
+
+    def actualizar(self, precios=None, tasas=None):
+        """Cambia precios y/o tasas y sube la versión (invalida las valuaciones guardadas)."""
+        for producto in list(precios or {}) + list(tasas or {}):
+            if producto not in PRODUCTOS:
+                raise ValueError(f"Producto desconocido: {producto}")
+        # Al invertir se divide por el precio: 0, negativo, nan o inf romperían las valuaciones
+        for producto, precio in (precios or {}).items():
+            if not _numero_finito(precio) or precio <= 0:
+                raise ValueError(f"Precio inválido para {producto}: {precio}")
+        for producto, tasa in (tasas or {}).items():
+            if not _numero_finito(tasa):
+                raise ValueError(f"Tasa inválida para {producto}: {tasa}")
+
+        datos = copy.deepcopy(self.datos())
+        datos["precios"].update(precios or {})
+        datos["tasas"].update(tasas or {})
+        datos["version"] += 1
+        datos["actualizada"] = datetime.now().isoformat()
+        guardar_json(self.ruta, datos)
+
+        with self._lock:
+            self._datos, self._firma = datos, self._firma_actual()
+        return datos["version"]
+
+
+def _numero_finito(valor):
+    return isinstance(valor, (int, float)) and not isinstance(valor, bool) and math.isfinite(valor)
+
+
+# -----------------------
+# POSICIONES Y ACUMULADOS
+# -----------------------
+def cartera_vacia():
+    return {"posiciones": [], "acumulados": {}, "valuacion": None}
+
+
+def acumular(acumulados, posicion):
+    """Suma una posición a los acumulados de su producto."""
+    producto = posicion["producto"]
+    if producto in CON_TASA:
+        acumulado = acumulados.setdefault(producto, {"capital": 0.0, "intereses": 0.0, "devengado": 0.0})
+        interes = posicion["monto"] * posicion["tasa"]
+        acumulado["intereses"] += interes
+        acumulado["devengado"] += interes * datetime.fromisoformat(posicion["fecha"]).toordinal()
+    else:
+        acumulado = acumulados.setdefault(producto, {"capital": 0.0, "unidades": 0.0})
+        acumulado["unidades"] += posicion["unidades"]
+    acumulado["capital"] += posicion["monto"]
+
+
+def reconstruir_acumulados(posiciones):
+    """Los acumulados recorriendo todas las posiciones (para verificar o migrar)."""
+    acumulados = {}
+    for posicion in posiciones:
+        acumular(acumulados, posicion)
+    return acumulados
+
+
+def agregar_posicion(cartera, producto, monto, tabla, fecha=None):
+    """Agrega una inversión de `monto` en `producto` al precio/tasa de hoy. Devuelve la posición."""
+    if producto not in PRODUCTOS:
+        raise ValueError(f"Producto desconocido: {producto}")
+
+    posicion = {"producto": producto, "fecha": (fecha or datetime.now()).isoformat(), "monto": monto}
+    if producto in CON_TASA:
+        posicion["tasa"] = tabla.tasa(producto)
+    else:
+        posicion["unidades"] = monto / tabla.precio(producto)
+
+    cartera["posiciones"].append(posicion)
+    acumular(cartera["acumulados"], posicion)
+    cartera["valuacion"] = None
+    return posicion
+
+
+def desde_totales(totales, tabla, fecha=None):
+    """Cartera para los totales viejos de inversiones.json (sin fechas): una posición
+    por producto, como si se hubiera invertido todo en `fecha` a los precios de la tabla."""
+    cartera = cartera_vacia()
+    for producto in PRODUCTOS:
+        if totales.get(producto):
+            agregar_posicion(cartera, producto, totales[producto], tabla, fecha)
+    return cartera
+
+
+# -----------------------
+# VALUACIÓN
+# -----------------------
+def valuar(acumulados, tabla, hoy=None):
+    """Capital, valor y rendimiento por producto y total, desde los acumulados."""
+    hoy = hoy or date.today()
+    dia = hoy.toordinal()
+
+    productos = {}
+    for producto in PRODUCTOS:
+        acumulado = acumulados.get(producto)
+        if not acumulado:
+            capital = valor = 0.0
+        elif producto in CON_TASA:
+            capital = acumulado["capital"]
+            valor = capital + (acumulado["intereses"] * dia - acumulado["devengado"]) / DIAS_POR_AÑO
+        else:
+            capital = acumulado["capital"]
+            valor = acumulado["unidades"] * tabla.precio(producto)
+        productos[producto] = _rendimiento(capital, valor)
+
+    capital = sum(p["capital"] for p in productos.values())
+    valor = sum(p["valor"] for p in productos.values())
+    return dict(_rendimiento(capital, valor), productos=productos,
+                fecha=hoy.isoformat(), version=tabla.version)
+
+
+def _rendimiento(capital, valor):
+    return {
+        "capital": round(capital, 2),
+        "valor": round(valor, 2),
+        "rendimiento": round(valor - capital, 2),
+        "porcentaje": round((valor - capital) / capital * 100, 2) if capital else 0.0
+    }
+
+
+def valuacion(cartera, tabla, hoy=None):
+    """La valuación guardada si es de hoy y de esta versión de la tabla; si no, una nueva."""
+    hoy = hoy or date.today()
+    guardada = cartera.get("valuacion")
+    if guardada and guardada["fecha"] == hoy.isoformat() and guardada["version"] == tabla.version:
+        return guardada
+    return valuar(cartera["acumulados"], tabla, hoy)
+
+
+def revaluar(cartera, tabla, hoy=None):
+    """Recalcula la valuación y la deja guardada en la cartera. Devuelve True si cambió."""
+    nueva = valuacion(cartera, tabla, hoy)
+    if nueva is cartera.get("valuacion"):
+        return False
+    cartera["valuacion"] = nueva
+    return True
@@ -0,0 +1,102 @@
+# ----------------------------------------------------
+# CATEGORÍAS (clasificación por reglas)
+# ----------------------------------------------------
+# categorias_unicas (app.py) toma la primera palabra de cada descripción y
+# recorre todo el historial en cada llamada. Acá cada transacción se
+# clasifica UNA vez, al escribirla, con reglas:
+#
+#   - PATRONES: expresiones regulares, combinadas en una sola (una pasada
+#     sobre la descripción sin importar cuántas reglas haya).
+#   - PALABRAS_CLAVE: palabras o frases guardadas en un trie por palabra;
+#     se recorre la descripción una vez buscando la coincidencia más a la
+#     izquierda (y más larga).
+#
+# Si ninguna regla coincide, la categoría es la primera palabra (como en
+# categorias_unicas). La categoría se guarda en la transacción y los totales
+# por categoría en el resumen del usuario (ver resumenes.py).
+import re
+import unicodedata
+
+PATRONES = {
+    "inversiones": r"^inversion en ",
+    "transferencias": r"\btransferencia\b",
+}
+
+PALABRAS_CLAVE = {
+    "alimentos": ["supermercado", "comida", "almacen", "verduleria", "carniceria", "panaderia",
+                  "restaurante", "delivery"],
+    "servicios": ["luz", "gas", "agua", "internet", "telefono", "celular", "cable",
+                  "edenor", "edesur", "metrogas"],
+    "vivienda": ["alquiler", "expensas", "hipoteca"],
+    "transporte": ["transporte", "nafta", "combustible", "colectivo", "subte", "tren",
+                   "taxi", "uber", "peaje", "sube"],
+    "salud": ["farmacia", "medico", "prepaga", "obra social"],
+    "educacion": ["colegio", "universidad", "curso", "libreria"],
+    "ocio": ["cine", "teatro", "netflix", "spotify", "salida"],
+    "sueldo": ["sueldo", "salario", "aguinaldo", "honorarios"],
+}
+
+SIN_CATEGORIA = "otros"
+_PALABRA = re.compile(r"\w+")
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes: 'Inversión' -> 'inversion'."""
+    texto = unicodedata.normalize("NFKD", (texto or "").lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+class Categorizador:
+    """Clasifica descripciones con regex combinadas y un trie de palabras clave."""
+
+    def __init__(self, patrones=PATRONES, palabras_clave=PALABRAS_CLAVE):
+        # Un grupo con nombre por categoría: re dice cuál coincidió
+        self._grupos = {}
+        alternativas = []
+        for n, (categoria, patron) in enumerate(patrones.items()):
+            self._grupos[f"c{n}"] = categoria
+            alternativas.append(f"(?P<c{n}>{patron})")
+        self._patron = re.compile("|".join(alternativas)) if alternativas else None
+
+        self._trie = {}
+        for categoria, frases in palabras_clave.items():
+            for frase in frases:
+                nodo = self._trie
+                for palabra in _PALABRA.findall(normalizar(frase)):
+                    nodo = nodo.setdefault(palabra, {})
+                nodo[None] = categoria
+
+    def categorizar(self, descripcion):
+        texto = normalizar(descripcion)
+
+        if self._patron is not None:
+            coincidencia = self._patron.search(texto)
+            if coincidencia:
+                return self._grupos[coincidencia.lastgroup]
+
+        palabras = _PALABRA.findall(texto)
+        for inicio in range(len(palabras)):
+            nodo = self._trie
+            encontrada = None
+            # Por índice: un slice copiaría el resto de la descripción en cada inicio
+            for j in range(inicio, len(palabras)):
+                nodo = nodo.get(palabras[j])
+                if nodo is None:
+                    break
+                encontrada = nodo.get(None, encontrada)
+            if encontrada:
+                return encontrada
+
+        return palabras[0] if palabras else SIN_CATEGORIA
+
+
+categorizador = Categorizador()
+
+
+def categorizar(descripcion):
+    return categorizador.categorizar(descripcion)
+
+
+def categoria_de(transaccion):
+    """La categoría guardada en la transacción o, en datos viejos, la que le tocaría."""
+    return transaccion.get("categoria") or categorizar(transaccion.get("descripcion"))
@@ -0,0 +1,51 @@
+# ----------------------------------------------------
+# EXPORTACIÓN DEL HISTORIAL (CSV / NDJSON)
+# ----------------------------------------------------
+# El historial se recorre con almacen.iterar_historial(), un generador: los
+# primeros bytes salen enseguida y no se arma la respuesta entera en memoria.
+# SQLite lee de a lotes por el índice, con el mismo cursor que /movimientos;
+# el backend JSON (que ya tiene el historial en memoria) lo ordena una sola vez.
+import csv
+import io
+import json
+
+COLUMNAS = ("fecha", "descripcion", "monto", "tipo")
+FORMATOS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+
+
+def iterar_historial(almacen, email, lote=500, **filtros):
+    """Recorre todas las transacciones del usuario, de la más nueva a la más vieja."""
+    return almacen.iterar_historial(email, lote=lote, **filtros)
+
+
+def exportar_csv(transacciones):
+    """Genera el CSV de a pedazos (encabezado + un bloque por cada 500 filas)."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUMNAS)
+
+    for n, t in enumerate(transacciones, start=1):
+        escritor.writerow([t.get(columna, "") for columna in COLUMNAS])
+        if n % 500 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def exportar_ndjson(transacciones):
+    """Una transacción JSON por línea."""
+    for t in transacciones:
+        yield json.dumps({columna: t.get(columna) for columna in COLUMNAS}, ensure_ascii=False) + "\n"
+
+
+def exportar(transacciones, formato):
+    if formato == "csv":
+        return exportar_csv(transacciones)
+    if formato == "ndjson":
+        return exportar_ndjson(transacciones)
+    raise ValueError(f"Formato de exportación desconocido: {formato}")
@@ -0,0 +1,189 @@
+# ----------------------------------------------------
+# IDEMPOTENCIA (pedidos repetidos de escritura)
+# ----------------------------------------------------
+# Un formulario enviado dos veces, o un POST que el balanceador reintenta,
+# hacía dos veces el pago: dos transacciones y dos descuentos de saldo.
+#
+# Cada formulario de escritura lleva un campo oculto "clave_idempotencia"
+# (una clave nueva por cada vez que se muestra la página); los clientes de la
+# API mandan el header Idempotency-Key. La primera vez que llega una clave la
+# operación se hace y su resultado queda guardado; si la misma clave vuelve
+# a llegar se devuelve ese resultado sin leer ni escribir nada. Si llega
+# mientras la primera todavía corre, espera a que termine.
+#
+# Sólo se guardan resultados correctos: si la operación falla (saldo
+# insuficiente, error), un reintento la vuelve a intentar. Usar la misma
+# clave con otros datos es un error (ClaveReutilizada).
+#
+# De los datos del pedido sólo se guarda un HMAC (huella), nunca los datos:
+# crear cuenta y cambiar contraseña traen la contraseña en texto plano.
+#
+#   - CacheIdempotencia:   en memoria, `maximo` claves por `ttl` segundos
+#                          (un solo proceso, como el de credenciales).
+#   - IdempotenciaSQLite:  una tabla en un archivo local compartida por los
+#                          workers del mismo servidor: un reintento que el
+#                          balanceador manda a otro worker también se detecta.
+#
+# Se elige con FINANZAS_IDEMPOTENCIA (memoria | sqlite).
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+from caches import ConexionesPorHilo, LRUConVencimiento
+
+
+class ClaveReutilizada(ValueError):
+    """La clave ya se usó para un pedido con otros datos."""
+
+    def __init__(self):
+        super().__init__("La clave de idempotencia ya se usó con otros datos.")
+
+
+class _Entrada:
+    __slots__ = ("huella", "listo", "correcto", "resultado")
+
+    def __init__(self, huella):
+        self.huella = huella
+        self.listo = threading.Event()
+        self.correcto = False
+        self.resultado = None
+
+
+class CacheIdempotencia:
+    """Resultados por clave, con vencimiento (`ttl` segundos) y tamaño máximo. Una clave
+    en curso no vence ni se descarta: si saliera, un reintento haría la operación de nuevo."""
+
+    def __init__(self, maximo=10000, ttl=600):
+        self._clave = os.urandom(32)
+        self._entradas = LRUConVencimiento(maximo, ttl, descartable=lambda entrada: entrada.listo.is_set())
+
+    def ejecutar(self, clave, datos, funcion):
+        """Devuelve funcion(), o el resultado guardado si `clave` ya se ejecutó.
+
+        `datos` son los datos del pedido (por ejemplo, la tupla de argumentos); se
+        guarda sólo su huella.
+        """
+        huella = huella_de(self._clave, datos)
+        nueva = _Entrada(huella)
+        entrada = self._entradas.guardar_si_falta(clave, nueva)
+        propia = entrada is nueva
+
+        if not hmac.compare_digest(entrada.huella, huella):
+            raise ClaveReutilizada()
+
+        if not propia:
+            entrada.listo.wait()
+            if entrada.correcto:
+                return entrada.resultado
+            # La primera falló y se descartó: este pedido la intenta de nuevo
+            return self.ejecutar(clave, datos, funcion)
+
+        try:
+            resultado = funcion()
+        except BaseException:
+            self._entradas.olvidar(clave, entrada)
+            entrada.listo.set()
+            raise
+
+        entrada.resultado = resultado
+        entrada.correcto = True
+        # El vencimiento se cuenta desde que terminó (antes de marcarla lista: en curso no vence)
+        self._entradas.guardar(clave, entrada)
+        entrada.listo.set()
+        return resultado
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+class IdempotenciaSQLite:
+    """Las mismas claves en una tabla SQLite, para varios workers en la misma máquina.
+
+    Los resultados se guardan como JSON. El vencimiento es de reloj (time.time())
+    porque se comparte entre procesos. `secreto` es la clave del HMAC de las
+    huellas: tiene que ser la misma en todos los workers.
+    """
+
+    def __init__(self, ruta='idempotencia.db', secreto=b'', ttl=600, intervalo=0.05):
+        self.ruta = ruta
+        self.ttl = ttl
+        self.intervalo = intervalo
+        self._clave = secreto
+        self._conexion = ConexionesPorHilo(ruta)
+        with self._conexion() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS idempotencia (
+                    clave     TEXT PRIMARY KEY,
+                    huella    TEXT NOT NULL,
+                    listo     INTEGER NOT NULL DEFAULT 0,
+                    resultado TEXT,
+                    vence     REAL NOT NULL
+                )
+            """)
+
+    def ejecutar(self, clave, datos, funcion):
+        huella = huella_de(self._clave, datos)
+        clave = json.dumps(clave, ensure_ascii=False)
+
+        while True:
+            ahora = time.time()
+            with self._conexion() as conn:
+                conn.execute("DELETE FROM idempotencia WHERE vence <= ?", (ahora,))
+                propia = conn.execute(
+                    "INSERT OR IGNORE INTO idempotencia (clave, huella, vence) VALUES (?, ?, ?)",
+                    (clave, huella, ahora + self.ttl)).rowcount == 1
+                fila = None if propia else conn.execute(
+                    "SELECT huella, listo, resultado FROM idempotencia WHERE clave = ?", (clave,)).fetchone()
+            if propia:
+                break
+            if fila is None:
+                continue
+            if not hmac.compare_digest(fila[0], huella):
+                raise ClaveReutilizada()
+            if fila[1]:
+                return json.loads(fila[2])
+            # La primera todavía corre (en este worker o en otro): se espera a que termine o falle
+            time.sleep(self.intervalo)
+
+        try:
+            resultado = funcion()
+        except BaseException:
+            with self._conexion() as conn:
+                conn.execute("DELETE FROM idempotencia WHERE clave = ?", (clave,))
+            raise
+
+        with self._conexion() as conn:
+            conn.execute("UPDATE idempotencia SET listo = 1, resultado = ?, vence = ? WHERE clave = ?",
+                         (json.dumps(resultado, ensure_ascii=False), time.time() + self.ttl, clave))
+        return resultado
+
+    def __len__(self):
+        return self._conexion().execute(
+            "SELECT COUNT(*) FROM idempotencia WHERE vence > ?", (time.time(),)).fetchone()[0]
+
+
+def crear_idempotencia(tipo=None, destino=None, secreto=b''):
+    tipo = tipo or os.environ.get('FINANZAS_IDEMPOTENCIA', 'memoria')
+    if tipo == 'sqlite':
+        return IdempotenciaSQLite(destino or os.environ.get('FINANZAS_IDEMPOTENCIA_DB', 'idempotencia.db'),
+                                  secreto)
+    if tipo == 'memoria':
+        return CacheIdempotencia()
+    raise ValueError(f"Tipo de idempotencia desconocido: {tipo}")
+
+
+def huella_de(clave, datos):
+    """HMAC-SHA256 de los datos del pedido: permite compararlos sin guardarlos."""
+    return hmac.new(clave, repr(datos).encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def huella_de_archivo(stream, bloque=1 << 20):
+    """sha256 del contenido de un archivo subido, leído de a bloques; lo deja al principio."""
+    suma = hashlib.sha256()
+    for parte in iter(lambda: stream.read(bloque), b""):
+        suma.update(parte)
+    stream.seek(0)
+    return suma.hexdigest()
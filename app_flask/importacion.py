@@ -0,0 +1,200 @@
+# ----------------------------------------------------
+# IMPORTACIÓN MASIVA DE TRANSACCIONES
+# ----------------------------------------------------
+# Para cargar extractos bancarios con miles de movimientos. Las filas se
+# validan de a REGISTROS_POR_LOTE, con una llamada a validar_lote por lote
+# (los errores se informan por número de línea), y las filas válidas se
+# aplican por usuario en UN solo lote: una escritura de transacciones por
+# usuario, no una por fila. Los saldos y resúmenes de hasta
+# USUARIOS_POR_LOTE usuarios se guardan juntos con guardar_muchos() (con el
+# backend JSON, una reescritura de usuarios.json por lote).
+#
+# La validación de a lotes no acota la memoria: las filas válidas de todo el
+# archivo quedan en memoria hasta el final, porque cada usuario recibe UN
+# lote en orden cronológico y su última fila puede estar al final del
+# archivo. Para extractos más grandes, partirlos en varios archivos.
+#
+# Formato (CSV con encabezado, o NDJSON con las mismas claves):
+#   email,fecha,descripcion,monto,tipo
+#   ana@mail.com,2025-01-31T10:00:00,Sueldo,320000,ingreso
+#
+# "tipo" es opcional: si falta, sale del signo del monto.
+import csv
+import json
+from datetime import datetime
+from itertools import islice
+
+from almacenamiento import RESUMENES, USUARIOS
+from libro import al_dia, asentado
+from validaciones import LARGO_DESCRIPCION, validar_descripcion, validar_lote, validar_monto
+
+TIPOS = ("ingreso", "gasto")
+USUARIOS_POR_LOTE = 500
+REGISTROS_POR_LOTE = 1000
+
+
+def leer_registros(archivo, formato="csv"):
+    """Devuelve (número de línea, registro) para cada fila de un archivo de texto ya abierto."""
+    if formato == "csv":
+        # La línea 1 es el encabezado
+        return enumerate(csv.DictReader(archivo), start=2)
+    if formato == "ndjson":
+        return ((n, _leer_linea_json(linea)) for n, linea in enumerate(archivo, start=1) if linea.strip())
+    raise ValueError(f"Formato de importación desconocido: {formato}")
+
+
+def _leer_linea_json(linea):
+    try:
+        registro = json.loads(linea)
+    except ValueError:
+        return None
+    return registro if isinstance(registro, dict) else None
+
+
+def validar_registros(filas):
+    """Valida un lote de (número de línea, registro). Emails y montos se validan juntos,
+    con una llamada a validar_lote para todo el lote.
+
+    Devuelve ([(línea, email, transacción)], [{"linea": n, "error": "..."}]).
+    """
+    filas = list(filas)
+    candidatos = [_candidato(registro) for _, registro in filas]
+    validas = []
+    errores = []
+    for (linea, registro), candidato, formato in zip(filas, candidatos, validar_lote(candidatos)):
+        try:
+            validas.append((linea, *_validar_registro(registro, candidato, formato)))
+        except ValueError as e:
+            errores.append({"linea": linea, "error": str(e)})
+    return validas, errores
+
+
+def _candidato(registro):
+    # Los campos que revisa validar_lote; una línea ilegible no tiene ninguno
+    if registro is None:
+        return {}
+    email = registro.get("email")
+    if isinstance(email, str):
+        email = email.strip().lower()
+    return {"email": email, "monto": registro.get("monto")}
+
+
+def _texto(registro, campo, error):
+    """El campo sin espacios ("" si falta). En NDJSON puede venir un número u otro tipo:
+    eso es un error de la línea, no de toda la importación."""
+    valor = registro.get(campo)
+    if valor is None:
+        return ""
+    if not isinstance(valor, str):
+        raise ValueError(f"{error}: {valor}")
+    return valor.strip()
+
+
+def _validar_registro(registro, candidato, formato):
+    """Devuelve (email, transacción) o levanta ValueError con el motivo. `formato` son
+    los errores de validar_lote para el registro."""
+    if registro is None:
+        raise ValueError("línea ilegible")
+
+    email = candidato["email"]
+    if not email:
+        raise ValueError("falta el email")
+    if "email" in formato:
+        raise ValueError(f"email inválido: {email}")
+
+    if "monto" in formato:
+        raise ValueError("monto inválido")
+    monto = validar_monto(candidato["monto"])
+    if monto == 0:
+        raise ValueError("el monto no puede ser 0")
+
+    tipo = _texto(registro, "tipo", "tipo inválido").lower() or ("ingreso" if monto > 0 else "gasto")
+    if tipo not in TIPOS:
+        raise ValueError(f"tipo inválido: {tipo}")
+
+    fecha = _texto(registro, "fecha", "fecha inválida")
+    try:
+        fecha = datetime.fromisoformat(fecha).isoformat() if fecha else datetime.now().isoformat()
+    except ValueError:
+        raise ValueError(f"fecha inválida: {fecha}")
+
+    descripcion = _texto(registro, "descripcion", "descripción inválida")
+    if not validar_descripcion(descripcion):
+        raise ValueError(f"la descripción tiene más de {LARGO_DESCRIPCION} caracteres")
+
+    # Misma convención que la app: gastos negativos, ingresos positivos
+    monto = abs(monto) if tipo == "ingreso" else -abs(monto)
+
+    return email, {
+        "fecha": fecha,
+        "descripcion": descripcion,
+        "monto": monto,
+        "tipo": tipo
+    }
+
+
+def importar(almacen, registros, registrar_transacciones, usuarios_por_lote=USUARIOS_POR_LOTE,
+             registros_por_lote=REGISTROS_POR_LOTE):
+    """Valida y aplica los registros. `registrar_transacciones(email, lista, resumenes)`
+    guarda el lote del usuario (más nueva primero) y agrega (email, resumen actualizado)
+    a `resumenes`, para escribirlos todos juntos.
+
+    Devuelve {"importadas": n, "usuarios": n, "errores": [{"linea": n, "error": "..."}]}.
+    """
+    errores = []
+    por_usuario = {}
+
+    # El archivo se lee y se valida de a `registros_por_lote` filas; las válidas se
+    # juntan por usuario hasta el final (ver arriba)
+    registros = iter(registros)
+    while lote := list(islice(registros, registros_por_lote)):
+        validas, invalidas = validar_registros(lote)
+        errores.extend(invalidas)
+        for linea, email, transaccion in validas:
+            por_usuario.setdefault(email, []).append((linea, transaccion))
+
+    importadas = 0
+    usuarios = 0
+    emails = list(por_usuario)
+    for inicio in range(0, len(emails), usuarios_por_lote):
+        lote = emails[inicio:inicio + usuarios_por_lote]
+        actualizados = []
+        resumenes = []
+
+        # Los usuarios del lote quedan bloqueados hasta guardar sus saldos
+        with almacen.bloquear_muchos(lote):
+            for email in lote:
+                usuario = almacen.obtener(USUARIOS, email)
+                if usuario is None:
+                    errores.extend({"linea": linea, "error": f"no existe el usuario {email}"}
+                                   for linea, _ in por_usuario[email])
+                    continue
+
+                # Se aplican en orden cronológico; un gasto que deja el saldo en
+                # negativo se rechaza y no corta el resto del lote
+                usuario = al_dia(almacen, email, usuario)
+                saldo = usuario["saldo"]
+                aceptadas = []
+                for linea, transaccion in sorted(por_usuario[email], key=lambda fila: fila[1]["fecha"]):
+                    if saldo + transaccion["monto"] < 0:
+                        errores.append({"linea": linea, "error": "saldo insuficiente"})
+                        continue
+                    saldo += transaccion["monto"]
+                    aceptadas.append(transaccion)
+
+                if not aceptadas:
+                    continue
+
+                registrar_transacciones(email, aceptadas[::-1], resumenes)
+                usuario["saldo"] = saldo
+                actualizados.append((email, asentado(usuario, len(aceptadas))))
+                importadas += len(aceptadas)
+                usuarios += 1
+
+            # Primero los asientos (ya escritos) y después los saldos con su checkpoint
+            # (ver libro.py): una escritura por colección para todo el lote, no una por usuario
+            almacen.guardar_muchos(RESUMENES, resumenes)
+            almacen.guardar_muchos(USUARIOS, actualizados)
+
+    errores.sort(key=lambda error: error["linea"])
+    return {"importadas": importadas, "usuarios": usuarios, "errores": errores}
@@ -0,0 +1,142 @@
+# ----------------------------------------------------
+# LIBRO DIARIO (partida doble) Y CONCILIACIÓN
+# ----------------------------------------------------
+# Las transacciones ya son un registro inmutable: sólo se agregan, nunca se
+# editan ni se borran. El libro las lee como asientos de partida doble, con
+# dos patas que suman 0:
+#
+#   ingreso:    disponible +m    ingresos -m
+#   gasto:      disponible -m    gastos +m
+#   inversión:  disponible -m    inversiones:<producto> +m
+#
+# El saldo de usuarios.json y los totales de inversiones.json son esos
+# saldos ya calculados (materializados), para leerlos sin recorrer el
+# historial. Antes saldo y transacción se escribían por separado y un corte
+# entre las dos escrituras los dejaba distintos para siempre. Ahora:
+#
+#   1. primero se escribe el asiento (la transacción);
+#   2. después el saldo, anotando cuántos asientos incluye
+#      (usuario["libro"]["asientos"], el checkpoint).
+#
+# Si el proceso se corta entre 1 y 2, el checkpoint queda atrás del
+# historial y al_dia() suma los asientos que faltan antes de la próxima
+# operación. Si en cambio el checkpoint cuenta más asientos de los que hay
+# (se perdió historial que el saldo ya incluía), el saldo se rehace con el
+# historial completo, que es lo que conciliar toma como correcto.
+# `flask --app app conciliar` recorre una vez el historial de
+# todos los usuarios y compara saldos y totales con lo que dice el libro.
+import re
+
+from almacenamiento import INVERSIONES, USUARIOS
+from cartera import PRODUCTOS
+from categorias import categoria_de, normalizar
+
+DISPONIBLE = "disponible"
+INGRESOS = "ingresos"
+GASTOS = "gastos"
+TOLERANCIA = 0.005
+
+_PRODUCTO = re.compile(r"^inversion en (.+)$")
+_PRODUCTOS_NORMALIZADOS = {normalizar(p): p for p in PRODUCTOS}
+
+
+def cuenta_inversion(producto):
+    return f"inversiones:{producto}"
+
+
+def producto_de(transaccion):
+    """'Inversión en Plazo Fijo' -> 'Plazo Fijo' (None si no es una inversión conocida)."""
+    coincidencia = _PRODUCTO.match(normalizar(transaccion.get("descripcion")).strip())
+    return _PRODUCTOS_NORMALIZADOS.get(coincidencia.group(1)) if coincidencia else None
+
+
+def asiento(transaccion):
+    """[(cuenta, importe), (cuenta, importe)] que suman 0."""
+    monto = transaccion["monto"]
+    if transaccion["tipo"] == "ingreso":
+        contrapartida = INGRESOS
+    else:
+        producto = producto_de(transaccion) if categoria_de(transaccion) == "inversiones" else None
+        contrapartida = cuenta_inversion(producto) if producto else GASTOS
+    return [(DISPONIBLE, monto), (contrapartida, -monto)]
+
+
+def saldos(transacciones):
+    """Suma los asientos de `transacciones` por cuenta."""
+    cuentas = {}
+    for transaccion in transacciones:
+        for cuenta, importe in asiento(transaccion):
+            cuentas[cuenta] = cuentas.get(cuenta, 0) + importe
+    return cuentas
+
+
+# -----------------------
+# CHECKPOINT DEL SALDO
+# -----------------------
+def al_dia(almacen, email, usuario):
+    """Completa el saldo con los asientos que no incluye. Llamar dentro de almacen.bloquear,
+    antes de operar; devuelve el mismo `usuario`, con el checkpoint anotado."""
+    cantidad = almacen.cantidad_transacciones(email)
+    libro = usuario.get("libro")
+
+    if libro is None:
+        # Cuenta anterior al libro: el saldo guardado es el punto de partida (ver conciliar)
+        usuario["libro"] = {"asientos": cantidad}
+    elif libro["asientos"] < cantidad:
+        faltantes = almacen.transacciones_desde(email, libro["asientos"])
+        usuario["saldo"] += saldos(faltantes).get(DISPONIBLE, 0)
+        usuario["libro"] = {"asientos": cantidad}
+    elif libro["asientos"] > cantidad:
+        # El saldo incluye asientos que ya no están: no se sabe cuáles, se rehace desde cero
+        usuario["saldo"] = round(saldos(almacen.transacciones(email)).get(DISPONIBLE, 0), 2)
+        usuario["libro"] = {"asientos": cantidad}
+    return usuario
+
+
+def asentado(usuario, cantidad=1):
+    """Anota en el checkpoint `cantidad` asientos ya escritos e incluidos en el saldo."""
+    usuario["libro"]["asientos"] += cantidad
+    return usuario
+
+
+# -----------------------
+# CONCILIACIÓN
+# -----------------------
+def conciliar(almacen, al_encontrar=None, tolerancia=TOLERANCIA):
+    """Compara, usuario por usuario y en una sola pasada, el saldo y los totales de
+    inversiones guardados con los que salen del historial.
+
+    `al_encontrar(diferencia)` recibe cada diferencia apenas aparece:
+    {"email", "cuenta", "libro", "guardado"}. Devuelve {"usuarios", "asientos",
+    "diferencias", "cuentas"}; `cuentas` es el saldo de cada cuenta sumando todos
+    los usuarios (balance de comprobación: entre todas dan 0).
+    """
+    resultado = {"usuarios": 0, "asientos": 0, "diferencias": 0, "cuentas": {}}
+
+    def diferencia(email, cuenta, libro, guardado):
+        if abs(libro - guardado) > tolerancia:
+            resultado["diferencias"] += 1
+            if al_encontrar:
+                al_encontrar({"email": email, "cuenta": cuenta, "libro": round(libro, 2),
+                              "guardado": guardado})
+
+    for email, usuario in almacen.iterar(USUARIOS):
+        historial = almacen.transacciones(email)
+        cuentas = saldos(historial)
+        resultado["usuarios"] += 1
+        resultado["asientos"] += len(historial)
+        for cuenta, importe in cuentas.items():
+            resultado["cuentas"][cuenta] = resultado["cuentas"].get(cuenta, 0) + importe
+
+        diferencia(email, DISPONIBLE, cuentas.get(DISPONIBLE, 0), usuario.get("saldo", 0))
+        totales = almacen.obtener(INVERSIONES, email) or {}
+        for producto in PRODUCTOS:
+            diferencia(email, cuenta_inversion(producto), cuentas.get(cuenta_inversion(producto), 0),
+                       totales.get(producto, 0))
+
+        libro = usuario.get("libro")
+        if libro is not None and libro["asientos"] != len(historial):
+            diferencia(email, "asientos", len(historial), libro["asientos"])
+
+    resultado["cuentas"] = {cuenta: round(importe, 2) for cuenta, importe in sorted(resultado["cuentas"].items())}
+    return resultado
@@ -0,0 +1,140 @@
+# ----------------------------------------------------
+# MÉTRICAS (latencia por ruta y por fase)
+# ----------------------------------------------------
+# Se activan con FINANZAS_METRICAS=1. Se mide:
+#   - la latencia total de cada ruta (finanzas_request_segundos)
+#   - el tiempo de cada fase dentro de la ruta (finanzas_fase_segundos):
+#     lectura y escritura del almacenamiento, y render del template.
+# Todo se expone en /metrics con el formato de texto de Prometheus.
+import threading
+import time
+
+from flask import has_request_context, request
+
+# Límites de los buckets en segundos (como los de los clientes de Prometheus)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histograma:
+    """Cuenta observaciones por bucket acumulado, más suma y cantidad."""
+
+    __slots__ = ("cuentas", "suma", "cantidad")
+
+    def __init__(self):
+        self.cuentas = [0] * len(BUCKETS)
+        self.suma = 0.0
+        self.cantidad = 0
+
+    def observar(self, segundos):
+        for i, limite in enumerate(BUCKETS):
+            if segundos <= limite:
+                self.cuentas[i] += 1
+        self.suma += segundos
+        self.cantidad += 1
+
+
+class Metricas:
+    """Histogramas agrupados por etiquetas, seguros entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._fases = {}
+
+    def observar_request(self, ruta, metodo, segundos):
+        self._observar(self._requests, (ruta, metodo), segundos)
+
+    def observar_fase(self, fase, segundos, ruta=None):
+        self._observar(self._fases, (ruta or ruta_actual(), fase), segundos)
+
+    def _observar(self, tabla, etiquetas, segundos):
+        with self._lock:
+            histograma = tabla.get(etiquetas)
+            if histograma is None:
+                histograma = tabla[etiquetas] = Histograma()
+            histograma.observar(segundos)
+
+    def medir(self, fase):
+        """Context manager: `with metricas.medir("render"): ...`."""
+        return _Medicion(self, fase)
+
+    def exportar(self):
+        """Texto en formato de exposición de Prometheus."""
+        with self._lock:
+            lineas = []
+            lineas += _exportar_histograma(
+                "finanzas_request_segundos", "Latencia de cada ruta.",
+                ("ruta", "metodo"), self._requests)
+            lineas += _exportar_histograma(
+                "finanzas_fase_segundos", "Tiempo por fase (lectura, escritura, render) dentro de cada ruta.",
+                ("ruta", "fase"), self._fases)
+        return "\n".join(lineas) + "\n"
+
+
+class _Medicion:
+    __slots__ = ("metricas", "fase", "inicio")
+
+    def __init__(self, metricas, fase):
+        self.metricas = metricas
+        self.fase = fase
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excepcion):
+        self.metricas.observar_fase(self.fase, time.perf_counter() - self.inicio)
+        return False
+
+
+def ruta_actual():
+    if has_request_context():
+        return request.endpoint or "desconocida"
+    return "fuera_de_request"
+
+
+def _exportar_histograma(nombre, ayuda, claves, tabla):
+    lineas = [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} histogram"]
+    for etiquetas, histograma in sorted(tabla.items()):
+        base = ",".join(f'{clave}="{_escapar(valor)}"' for clave, valor in zip(claves, etiquetas))
+        for limite, cuenta in zip(BUCKETS, histograma.cuentas):
+            lineas.append(f'{nombre}_bucket{{{base},le="{limite}"}} {cuenta}')
+        lineas.append(f'{nombre}_bucket{{{base},le="+Inf"}} {histograma.cantidad}')
+        lineas.append(f"{nombre}_sum{{{base}}} {histograma.suma}")
+        lineas.append(f"{nombre}_count{{{base}}} {histograma.cantidad}")
+    return lineas
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ----------------------------------------------------
+# ALMACENAMIENTO INSTRUMENTADO
+# ----------------------------------------------------
+LECTURAS = {"obtener", "transacciones", "transacciones_pagina", "cargar", "cantidad_transacciones",
+            "transacciones_desde", "acumulados"}
+ESCRITURAS = {"guardar", "guardar_muchos", "agregar_transaccion", "agregar_transacciones", "guardar_todo",
+              "compactar", "sumar_acumulados", "reemplazar_acumulados"}
+
+
+class AlmacenamientoInstrumentado:
+    """Envuelve un backend y mide cada lectura/escritura como fase de la ruta actual."""
+
+    def __init__(self, almacen, metricas):
+        self._almacen = almacen
+        self._metricas = metricas
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._almacen, nombre)
+        if nombre in LECTURAS:
+            fase = "lectura"
+        elif nombre in ESCRITURAS:
+            fase = "escritura"
+        else:
+            return atributo
+
+        def medido(*args, **kwargs):
+            with self._metricas.medir(fase):
+                return atributo(*args, **kwargs)
+        return medido
@@ -0,0 +1,87 @@
+# ----------------------------------------------------
+# PROYECCIONES DE INTERÉS COMPUESTO
+# ----------------------------------------------------
+# interes_compuesto_recursivo (app.py) hace una llamada por año: para
+# horizontes largos llega al límite de recursión de Python. Acá se usa la
+# fórmula cerrada:
+#
+#   VF = C·(1 + r/m)^(m·n) + A·((1 + r/m)^(m·n) − 1) / (r/m)
+#
+# C = capital, r = tasa anual, m = capitalizaciones por año (1 = anual,
+# 12 = mensual), n = años, A = aporte al final de cada período.
+# `proyectar` evalúa muchos escenarios (capital, tasa) para varios años en
+# una sola llamada, vectorizado con NumPy si está instalado.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Tasas anuales de referencia para proyectar cada producto de /inversiones
+TASAS_ANUALES = {
+    "Fondos Comunes": 0.30,
+    "Acciones": 0.40,
+    "Bonos": 0.25,
+    "Plazo Fijo": 0.35
+}
+
+# Capitalización de cada producto (veces por año)
+CAPITALIZACIONES = {
+    "Fondos Comunes": 12,
+    "Acciones": 1,
+    "Bonos": 2,
+    "Plazo Fijo": 12
+}
+
+
+def interes_compuesto(capital, tasa, años, aporte=0, capitalizaciones=1):
+    """Valor final con fórmula cerrada. Con años <= 0 devuelve el capital (como la versión recursiva)."""
+    if años <= 0:
+        return capital
+
+    periodos = capitalizaciones * años
+    tasa_periodo = tasa / capitalizaciones
+    if tasa_periodo == 0:
+        return capital + aporte * periodos
+
+    factor = (1 + tasa_periodo) ** periodos
+    return capital * factor + aporte * (factor - 1) / tasa_periodo
+
+
+def proyectar(capitales, tasas, años, aporte=0, capitalizaciones=1):
+    """Curvas de valor para varios escenarios a la vez.
+
+    `capitales` y `tasas` son listas del mismo largo (un escenario por
+    posición); `capitalizaciones` puede ser un número o una lista por escenario.
+    Devuelve una lista por escenario con el valor al final de cada año 0..años.
+    """
+    if np is None:
+        if not isinstance(capitalizaciones, (list, tuple)):
+            capitalizaciones = [capitalizaciones] * len(capitales)
+        return [
+            [interes_compuesto(c, r, n, aporte, m) for n in range(años + 1)]
+            for c, r, m in zip(capitales, tasas, capitalizaciones)
+        ]
+
+    capitales = np.asarray(capitales, dtype=float)[:, None]
+    tasa_periodo = (np.asarray(tasas, dtype=float) / np.asarray(capitalizaciones, dtype=float))[:, None]
+    periodos = np.asarray(capitalizaciones, dtype=float).reshape(-1, 1) * np.arange(años + 1)
+
+    factor = (1 + tasa_periodo) ** periodos
+    # Con tasa 0 el aporte simplemente se acumula (se evita dividir por 0)
+    sin_tasa = tasa_periodo == 0
+    acumulado_aportes = np.where(
+        sin_tasa, periodos, (factor - 1) / np.where(sin_tasa, 1, tasa_periodo)
+    )
+    return (capitales * factor + aporte * acumulado_aportes).tolist()
+
+
+def proyectar_inversiones(totales, años=10):
+    """Curva de cada producto de /inversiones a partir de lo invertido hoy."""
+    productos = list(TASAS_ANUALES)
+    curvas = proyectar(
+        [totales.get(p, 0) for p in productos],
+        [TASAS_ANUALES[p] for p in productos],
+        años,
+        capitalizaciones=[CAPITALIZACIONES[p] for p in productos]
+    )
+    return {p: [round(v, 2) for v in curva] for p, curva in zip(productos, curvas)}
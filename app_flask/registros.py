@@ -0,0 +1,118 @@
+# ----------------------------------------------------
+# TRANSACCIONES COMPACTAS EN MEMORIA
+# ----------------------------------------------------
+# Leída de transacciones.json, cada transacción es un dict con cinco claves
+# y cinco strings propios (la fecha ISO, y "gasto"/"Comida"/... repetidos
+# en cada fila): unos 450 bytes. El backend JSON mantiene TODO el historial
+# en memoria, así que eso se multiplica por cada fila de cada usuario.
+#
+# Transaccion guarda lo mismo en un objeto con __slots__:
+#   - la fecha como entero (microsegundos desde 1970, en UTC), no como
+#     texto; si traía zona horaria se guarda también su desplazamiento, así
+#     t["fecha"] devuelve exactamente la fecha que se escribió
+#   - descripción, tipo y categoría internados: las repetidas comparten el
+#     mismo string en vez de tener una copia por fila
+#
+# Se comporta como un dict de sólo lectura (t["monto"], t.get("categoria"),
+# dict(t)), así el resto del código no cambia. Ver benchmarks/bench_memoria.py.
+import sys
+from datetime import datetime, timedelta, timezone
+
+EPOCA = datetime(1970, 1, 1)
+MICROSEGUNDO = timedelta(microseconds=1)
+CLAVES = ("fecha", "descripcion", "monto", "tipo", "categoria")
+
+
+def instante_de(fecha):
+    """'2025-01-31T10:00:00' -> microsegundos desde 1970 (las fechas con zona se cuentan en UTC)."""
+    return instante_y_zona(fecha)[0]
+
+
+def instante_y_zona(fecha):
+    """(instante, desplazamiento de la zona en segundos, o None si la fecha no tiene zona)."""
+    momento = datetime.fromisoformat(fecha)
+    desplazamiento = momento.utcoffset()
+    if desplazamiento is None:
+        return (momento - EPOCA) // MICROSEGUNDO, None
+    momento = momento.astimezone(timezone.utc).replace(tzinfo=None)
+    return (momento - EPOCA) // MICROSEGUNDO, desplazamiento // timedelta(seconds=1)
+
+
+def fecha_de(instante, zona=None):
+    momento = EPOCA + timedelta(microseconds=instante)
+    if zona is None:
+        return momento.isoformat()
+    desplazamiento = timedelta(seconds=zona)
+    return (momento + desplazamiento).replace(tzinfo=timezone(desplazamiento)).isoformat()
+
+
+def _internar(texto):
+    return sys.intern(texto) if type(texto) is str else texto
+
+
+class Transaccion:
+    """Una transacción en memoria, con la misma interfaz de lectura que su dict."""
+
+    __slots__ = ("instante", "zona", "descripcion", "monto", "tipo", "categoria")
+
+    def __init__(self, instante, descripcion, monto, tipo, categoria=None, zona=None):
+        self.instante = instante
+        self.zona = zona
+        self.descripcion = _internar(descripcion)
+        self.monto = monto
+        self.tipo = _internar(tipo)
+        self.categoria = _internar(categoria)
+
+    @classmethod
+    def desde_dict(cls, datos):
+        instante, zona = instante_y_zona(datos["fecha"])
+        return cls(instante, datos.get("descripcion"), datos["monto"], datos["tipo"],
+                   datos.get("categoria"), zona)
+
+    @property
+    def fecha(self):
+        return fecha_de(self.instante, self.zona)
+
+    def a_dict(self):
+        datos = {"fecha": self.fecha, "descripcion": self.descripcion, "monto": self.monto, "tipo": self.tipo}
+        if self.categoria is not None:
+            datos["categoria"] = self.categoria
+        return datos
+
+    # --- lectura como dict ---
+    def keys(self):
+        return CLAVES if self.categoria is not None else CLAVES[:-1]
+
+    def __getitem__(self, clave):
+        if clave not in CLAVES or (clave == "categoria" and self.categoria is None):
+            raise KeyError(clave)
+        return getattr(self, clave)
+
+    def get(self, clave, defecto=None):
+        try:
+            return self[clave]
+        except KeyError:
+            return defecto
+
+    def __contains__(self, clave):
+        return clave in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __eq__(self, otra):
+        if isinstance(otra, (Transaccion, dict)):
+            return self.a_dict() == dict(otra)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Transaccion({self.a_dict()!r})"
+
+
+def compactar_transacciones(datos):
+    """object_hook para json: convierte al vuelo cada transacción leída."""
+    if "monto" in datos and "fecha" in datos:
+        return Transaccion.desde_dict(datos)
+    return datos
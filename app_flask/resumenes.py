@@ -0,0 +1,137 @@
+# ----------------------------------------------------
+# RESÚMENES POR USUARIO (totales mantenidos al escribir)
+# ----------------------------------------------------
+# En vez de recorrer todo el historial en cada visita a /inicio, cada usuario
+# tiene un documento "resumenes" con los totales que se actualiza con cada
+# transacción nueva:
+#
+#   {"version": 2, "ingresos": 320000.0, "gastos": 165000.0,
+#    "por_categoria": {"servicios": {"ingresos": 0, "gastos": 45000.0, "cantidad": 3}}}
+#
+# Los acumulados por día, mes y año van aparte (almacen.acumulados), un
+# bucket por periodo:
+#
+#   {"dia": {"2025-11-13": {"ingresos": 320000.0, "gastos": 40000.0, "inversiones": 0}},
+#    "mes": {"2025-11": {...}}, "año": {"2025": {...}}}
+#
+# Cada escritura suma sólo los buckets de su día, mes y año: el documento
+# del resumen queda chico aunque el usuario tenga años de historial, y
+# reporte() lee sólo los periodos que muestra.
+#
+# "inversiones" es la parte de "gastos" que fue a /inversiones. Con los
+# acumulados, reporte() arma series de tiempo (ej: gastos por mes de los
+# últimos 5 años) sin leer ni una transacción.
+from datetime import date, timedelta
+
+from categorias import categoria_de
+
+# Los resúmenes de antes de la versión 2 traían los acumulados adentro: se reconstruyen
+VERSION = 2
+
+# periodo -> largo del prefijo de la fecha ISO que lo identifica
+PERIODOS = {
+    "dia": 10,
+    "mes": 7,
+    "año": 4
+}
+
+
+def resumen_vacio():
+    return {"version": VERSION, "ingresos": 0, "gastos": 0, "por_categoria": {}}
+
+
+def acumulados_vacios():
+    return {periodo: {} for periodo in PERIODOS}
+
+
+def bucket_vacio():
+    return {"ingresos": 0, "gastos": 0, "inversiones": 0}
+
+
+def resumen_al_dia(resumen):
+    """False si no existe o es de una versión anterior (hay que reconstruirlo)."""
+    return resumen is not None and resumen.get("version") == VERSION
+
+
+def aplicar_transaccion(resumen, transaccion, acumulados=None):
+    """Suma una transacción a los totales del resumen y, si se pasan, a los
+    acumulados de su día, mes y año (los modifica y devuelve el resumen)."""
+    monto = abs(transaccion["monto"])
+    if transaccion["tipo"] == "ingreso":
+        clave = "ingresos"
+    elif transaccion["tipo"] == "gasto":
+        clave = "gastos"
+    else:
+        return resumen
+
+    nombre_categoria = categoria_de(transaccion)
+    es_inversion = clave == "gastos" and nombre_categoria == "inversiones"
+
+    if acumulados is not None:
+        for periodo, largo in PERIODOS.items():
+            bucket = acumulados[periodo].setdefault(transaccion["fecha"][:largo], bucket_vacio())
+            bucket[clave] = round(bucket[clave] + monto, 2)
+            if es_inversion:
+                bucket["inversiones"] = round(bucket["inversiones"] + monto, 2)
+
+    categoria = resumen["por_categoria"].setdefault(
+        nombre_categoria, {"ingresos": 0, "gastos": 0, "cantidad": 0})
+
+    resumen[clave] = round(resumen[clave] + monto, 2)
+    categoria[clave] = round(categoria[clave] + monto, 2)
+    categoria["cantidad"] += 1
+    return resumen
+
+
+def reconstruir_resumen(transacciones):
+    """Recalcula resumen y acumulados desde cero recorriendo todo el historial.
+    Devuelve (resumen, acumulados)."""
+    resumen, acumulados = resumen_vacio(), acumulados_vacios()
+    for t in reversed(transacciones):
+        aplicar_transaccion(resumen, t, acumulados)
+    return resumen, acumulados
+
+
+def ranking_categorias(resumen, clave="gastos"):
+    """[(categoria, total, cantidad)] de mayor a menor, sólo las que tienen `clave` > 0."""
+    filas = [(categoria, datos[clave], datos["cantidad"])
+             for categoria, datos in resumen.get("por_categoria", {}).items() if datos[clave] > 0]
+    return sorted(filas, key=lambda fila: (-fila[1], fila[0]))
+
+
+# ----------------------------------------------------
+# REPORTES POR PERIODO
+# ----------------------------------------------------
+def reporte(acumulados, periodo="mes", ultimos=12, hasta=None):
+    """Los últimos `ultimos` periodos hasta `hasta` (hoy por defecto), del más viejo al más nuevo.
+
+    `acumulados` es {clave: bucket} del periodo; alcanza con los de rango_reporte().
+    Los periodos sin movimientos van en 0.
+    Devuelve [{"periodo": "2025-11", "ingresos": ..., "gastos": ..., "inversiones": ...}, ...].
+    """
+    return [{"periodo": clave, **bucket_vacio(), **acumulados.get(clave, {})}
+            for clave in _claves_reporte(periodo, ultimos, hasta)]
+
+
+def rango_reporte(periodo="mes", ultimos=12, hasta=None):
+    """(primera, última) clave de los periodos que muestra reporte(), para leer sólo esos."""
+    claves = _claves_reporte(periodo, ultimos, hasta)
+    return claves[0], claves[-1]
+
+
+def _claves_reporte(periodo, ultimos, hasta):
+    if periodo not in PERIODOS:
+        raise ValueError(f"Periodo desconocido: {periodo}")
+    return claves_periodos(periodo, ultimos, hasta or date.today())
+
+
+def claves_periodos(periodo, cantidad, hasta):
+    """Claves ('2025-11-13', '2025-11' o '2025') de los `cantidad` periodos que terminan en `hasta`."""
+    if periodo == "dia":
+        claves = [(hasta - timedelta(days=n)).isoformat() for n in range(cantidad)]
+    elif periodo == "mes":
+        indice = hasta.year * 12 + hasta.month - 1
+        claves = [f"{(indice - n) // 12:04d}-{(indice - n) % 12 + 1:02d}" for n in range(cantidad)]
+    else:
+        claves = [f"{hasta.year - n:04d}" for n in range(cantidad)]
+    return claves[::-1]
@@ -0,0 +1,105 @@
+# ----------------------------------------------------
+# REVALUACIÓN DE TODAS LAS CARTERAS (pool de procesos)
+# ----------------------------------------------------
+# Uso (desde app_flask/):
+#   flask --app app revaluar                   (un proceso por CPU)
+#   flask --app app revaluar --procesos 8 --lote 5000
+#
+# Después de cambiar precios o tasas (flask --app app precios ...) se
+# calcula la valuación de cierre de cada usuario. El cálculo es CPU puro, así
+# que en vez de hilos se usan procesos: los usuarios se reparten en partes
+# (iterar_parte del almacenamiento) y cada proceso abre su propia conexión,
+# lee sólo su parte y va guardando las valuaciones de a `lote` con
+# guardar_muchos(), sin juntar todo en memoria.
+#
+# Las valuaciones van a su propia colección (VALUACIONES), no dentro de la
+# cartera: así la revaluación nunca pisa una posición que se agregue
+# mientras corre. Cada una anota con cuántas posiciones se calculó.
+#
+# Los usuarios que todavía no tienen cartera (sólo los totales viejos de
+# inversiones.json, hasta que abren /inversiones) se valúan igual, con la
+# misma cartera que armaría obtener_cartera() (desde_totales); la cartera
+# no se guarda, eso lo sigue haciendo la app con el usuario bloqueado.
+#
+# Con el backend json cada lote reescribe valuaciones.json entero: para
+# muchos usuarios conviene sqlite o fragmentado.
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+from almacenamiento import CARTERAS, INVERSIONES, VALUACIONES, crear_almacenamiento
+from cartera import TablaPrecios, desde_totales, valuacion
+
+# Más partes que procesos: si una parte tarda más, los demás procesos siguen con otras
+PARTES_POR_PROCESO = 4
+
+
+def valuacion_de_cierre(cartera, tabla, hoy):
+    return dict(valuacion(cartera, tabla, hoy), posiciones=len(cartera["posiciones"]))
+
+
+def revaluar_parte(tipo, destino, ruta_precios, parte, partes, hoy, lote=1000):
+    """Revalúa una parte de los usuarios (corre en un proceso del pool). Devuelve cuántas carteras."""
+    almacen = crear_almacenamiento(tipo, destino)
+    tabla = TablaPrecios(ruta_precios)
+
+    cantidad = 0
+    pendientes = []
+    for email, cartera in carteras_de_la_parte(almacen, tabla, parte, partes, hoy):
+        pendientes.append((email, valuacion_de_cierre(cartera, tabla, hoy)))
+        cantidad += 1
+        if len(pendientes) >= lote:
+            almacen.guardar_muchos(VALUACIONES, pendientes)
+            pendientes = []
+    if pendientes:
+        almacen.guardar_muchos(VALUACIONES, pendientes)
+    return cantidad
+
+
+def carteras_de_la_parte(almacen, tabla, parte, partes, hoy):
+    """(email, cartera) de la parte: las guardadas y, para quien sólo tiene totales
+    en inversiones.json, la que se arma desde ellos."""
+    con_cartera = set()
+    for email, cartera in almacen.iterar_parte(CARTERAS, parte, partes):
+        con_cartera.add(email)
+        yield email, cartera
+    for email, totales in almacen.iterar_parte(INVERSIONES, parte, partes):
+        if email not in con_cartera and any(totales.values()):
+            yield email, desde_totales(totales, tabla, hoy)
+
+
+def revaluar_todo(tipo, destino, ruta_precios, procesos=None, lote=1000, hoy=None, avance=None):
+    """Revalúa todas las carteras repartiéndolas entre `procesos` procesos.
+
+    `avance(carteras, segundos)` se llama cada vez que termina una parte.
+    Devuelve {"carteras", "segundos", "por_segundo", "procesos"}.
+    """
+    procesos = procesos or os.cpu_count() or 1
+    partes = procesos * PARTES_POR_PROCESO
+    hoy = hoy or date.today()
+    inicio = time.perf_counter()
+    cantidad = 0
+
+    if procesos == 1:
+        # Sin pool: mismo resultado, sin el costo de levantar procesos
+        for parte in range(partes):
+            cantidad += revaluar_parte(tipo, destino, ruta_precios, parte, partes, hoy, lote)
+            if avance:
+                avance(cantidad, time.perf_counter() - inicio)
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            futuros = [pool.submit(revaluar_parte, tipo, destino, ruta_precios, parte, partes, hoy, lote)
+                       for parte in range(partes)]
+            for futuro in as_completed(futuros):
+                cantidad += futuro.result()
+                if avance:
+                    avance(cantidad, time.perf_counter() - inicio)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "carteras": cantidad,
+        "segundos": segundos,
+        "por_segundo": cantidad / segundos if segundos else 0.0,
+        "procesos": procesos
+    }
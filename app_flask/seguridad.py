@@ -0,0 +1,109 @@
+# ----------------------------------------------------
+# CONTRASEÑAS (hash con sal y caché de credenciales)
+# ----------------------------------------------------
+# Las contraseñas se guardan como
+#
+#   pbkdf2_sha256$600000$<sal en base64>$<hash en base64>
+#
+# con una sal distinta por usuario. El costo (iteraciones) se ajusta con
+# FINANZAS_HASH_ITERACIONES; los hashes con menos iteraciones que las
+# actuales, y las contraseñas viejas guardadas en texto plano, se vuelven a
+# hashear solas la próxima vez que el usuario inicia sesión (ver
+# app.autenticar).
+#
+# Un hash lento es lo que frena a quien prueba contraseñas, pero también
+# cuesta en cada login legítimo. CacheCredenciales recuerda por un rato los
+# logins correctos recientes (con un HMAC de clave aleatoria por proceso, no
+# la contraseña), así un usuario que vuelve a entrar no paga el hash de
+# nuevo. Los intentos fallidos nunca se cachean: siempre pagan el costo completo.
+import base64
+import hashlib
+import hmac
+import os
+
+from caches import LRUConVencimiento
+
+ALGORITMO = "pbkdf2_sha256"
+ITERACIONES = int(os.environ.get("FINANZAS_HASH_ITERACIONES", "600000"))
+LARGO_SAL = 16
+
+
+def hashear(password, iteraciones=None):
+    """Hash con sal nueva, en el formato algoritmo$iteraciones$sal$hash."""
+    iteraciones = iteraciones or ITERACIONES
+    sal = os.urandom(LARGO_SAL)
+    derivado = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), sal, iteraciones)
+    return "$".join((ALGORITMO, str(iteraciones), _b64(sal), _b64(derivado)))
+
+
+def es_hash(guardado):
+    return isinstance(guardado, str) and guardado.startswith(ALGORITMO + "$")
+
+
+def verificar(password, guardado):
+    """True si `password` corresponde a lo guardado (hash o texto plano viejo)."""
+    if not es_hash(guardado):
+        return hmac.compare_digest(str(guardado).encode("utf-8"), password.encode("utf-8"))
+
+    try:
+        _, iteraciones, sal, esperado = guardado.split("$")
+        derivado = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"),
+                                       base64.b64decode(sal), int(iteraciones))
+    except ValueError:
+        return False
+    return hmac.compare_digest(derivado, base64.b64decode(esperado))
+
+
+def necesita_rehash(guardado):
+    """True si está en texto plano o se hasheó con menos iteraciones que las actuales."""
+    if not es_hash(guardado):
+        return True
+    try:
+        return int(guardado.split("$")[1]) < ITERACIONES
+    except (IndexError, ValueError):
+        return True
+
+
+def _b64(datos):
+    return base64.b64encode(datos).decode("ascii")
+
+
+# ----------------------------------------------------
+# CACHÉ DE CREDENCIALES VERIFICADAS
+# ----------------------------------------------------
+class CacheCredenciales:
+    """LRU acotada de logins correctos recientes, con vencimiento (`ttl` segundos)."""
+
+    def __init__(self, maximo=10000, ttl=300):
+        self._clave = os.urandom(32)
+        # email -> (hash guardado, huella de la contraseña)
+        self._entradas = LRUConVencimiento(maximo, ttl)
+
+    def verificar(self, email, password, guardado):
+        """Igual que verificar(), pero sin recalcular el hash si el login ya se validó hace poco."""
+        huella = self._huella(password)
+
+        entrada = self._entradas.obtener(email)
+        # La entrada sólo vale para el mismo hash guardado: cambiar la contraseña la invalida
+        if entrada is not None and entrada[0] == guardado and hmac.compare_digest(entrada[1], huella):
+            return True
+
+        # El hash lento se calcula sin ningún lock tomado (pbkdf2 además libera el GIL)
+        if not verificar(password, guardado):
+            return False
+
+        self.recordar(email, password, guardado)
+        return True
+
+    def recordar(self, email, password, guardado):
+        """Anota un login ya validado (por ejemplo, después de re-hashear la contraseña)."""
+        self._entradas.guardar(email, (guardado, self._huella(password)))
+
+    def olvidar(self, email):
+        self._entradas.olvidar(email)
+
+    def _huella(self, password):
+        return hmac.new(self._clave, password.encode("utf-8"), hashlib.sha256).digest()
+
+    def __len__(self):
+        return len(self._entradas)
@@ -0,0 +1,99 @@
+# ----------------------------------------------------
+# SESIONES DEL LADO DEL SERVIDOR (perfil y saldo cacheados)
+# ----------------------------------------------------
+# Cada ruta protegida miraba session["usuario_actual"] y después leía el
+# documento del usuario del almacenamiento sólo para mostrar nombre y saldo
+# (con el backend JSON, parsear usuarios.json entero). Acá se guarda ese
+# perfil por email para que el chequeo de la sesión sea una consulta a un dict.
+#
+#   - SesionesEnMemoria: LRU acotada con vencimiento (un solo proceso).
+#   - SesionesSQLite:    una tabla en un archivo local, compartida por varios
+#                        workers del mismo servidor.
+#
+# Las operaciones que cambian al usuario (pagar, ingreso, invertir) dejan el
+# perfil nuevo con guardar(); cambiar la contraseña lo saca con olvidar().
+# El perfil nunca incluye la contraseña.
+# Se elige con FINANZAS_SESIONES (memoria | sqlite).
+import json
+import os
+import time
+
+from caches import ConexionesPorHilo, LRUConVencimiento
+
+
+def perfil_de(usuario):
+    """El documento del usuario sin la contraseña."""
+    return {clave: valor for clave, valor in usuario.items() if clave != "password"}
+
+
+class SesionesEnMemoria:
+    """LRU acotada de perfiles por email, con vencimiento (`ttl` segundos)."""
+
+    def __init__(self, maximo=10000, ttl=600):
+        self._entradas = LRUConVencimiento(maximo, ttl)
+
+    def obtener(self, email):
+        perfil = self._entradas.obtener(email)
+        return dict(perfil) if perfil is not None else None
+
+    def guardar(self, email, perfil):
+        self._entradas.guardar(email, dict(perfil))
+
+    def olvidar(self, email):
+        self._entradas.olvidar(email)
+
+    def limpiar(self):
+        self._entradas.limpiar()
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+class SesionesSQLite:
+    """Los mismos perfiles en una tabla SQLite, para varios workers en la misma máquina.
+    El vencimiento es de reloj (time.time()) porque se comparte entre procesos."""
+
+    def __init__(self, ruta='sesiones.db', ttl=600):
+        self.ruta = ruta
+        self.ttl = ttl
+        self._conexion = ConexionesPorHilo(ruta)
+        with self._conexion() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sesiones (
+                    email TEXT PRIMARY KEY,
+                    perfil TEXT NOT NULL,
+                    vence REAL NOT NULL
+                )
+            """)
+
+    def obtener(self, email):
+        fila = self._conexion().execute(
+            "SELECT perfil FROM sesiones WHERE email = ? AND vence > ?", (email, time.time())
+        ).fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def guardar(self, email, perfil):
+        with self._conexion() as conn:
+            conn.execute("INSERT OR REPLACE INTO sesiones (email, perfil, vence) VALUES (?, ?, ?)",
+                         (email, json.dumps(perfil, ensure_ascii=False), time.time() + self.ttl))
+
+    def olvidar(self, email):
+        with self._conexion() as conn:
+            conn.execute("DELETE FROM sesiones WHERE email = ?", (email,))
+
+    def limpiar(self):
+        with self._conexion() as conn:
+            conn.execute("DELETE FROM sesiones")
+
+    def __len__(self):
+        return self._conexion().execute(
+            "SELECT COUNT(*) FROM sesiones WHERE vence > ?", (time.time(),)).fetchone()[0]
+
+
+def crear_sesiones(tipo=None, destino=None):
+    tipo = tipo or os.environ.get('FINANZAS_SESIONES', 'memoria')
+    if tipo == 'sqlite':
+        return SesionesSQLite(destino or os.environ.get('FINANZAS_SESIONES_DB', 'sesiones.db'))
+    if tipo == 'memoria':
+        return SesionesEnMemoria()
+    raise ValueError(f"Tipo de sesiones desconocido: {tipo}")
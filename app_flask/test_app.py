@@ -1,11 +1,16 @@
 # test_app.py
 # Pruebas unitarias para app.py usando unittest
 
+import contextlib
 import unittest
 import json
 import os
+import io
+import re
 import tempfile
-from datetime import datetime
+import threading
+import time
+from datetime import date, datetime
 
 # Importar las funciones del app
 from app import (
@@ -20,6 +25,44 @@ from app import (
     ejemplo_todo,
     app
 )
+import app as app_modulo
+from almacenamiento import (
+    AlmacenamientoFragmentado,
+    AlmacenamientoJSON,
+    AlmacenamientoSQLite,
+    migrar,
+    USUARIOS,
+    INVERSIONES,
+    RESUMENES,
+    CARTERAS,
+    VALUACIONES
+)
+from resumenes import (acumulados_vacios, aplicar_transaccion, rango_reporte, ranking_categorias,
+                       reconstruir_resumen, reporte, resumen_al_dia, resumen_vacio)
+from importacion import importar, leer_registros
+import importacion
+import analitica
+import proyecciones
+from auditoria import RegistroAuditoria
+from metricas import Metricas, AlmacenamientoInstrumentado
+import seguridad
+import validaciones
+from cartera import (TablaPrecios, agregar_posicion, cartera_vacia, desde_totales, reconstruir_acumulados,
+                     revaluar, valuacion, valuar)
+from categorias import Categorizador, categorizar
+from idempotencia import CacheIdempotencia, ClaveReutilizada, IdempotenciaSQLite
+from caches import ConexionesPorHilo, LRUConVencimiento
+from libro import al_dia, asiento, conciliar
+from registros import Transaccion, fecha_de, instante_de
+from revaluacion import revaluar_todo
+from seguridad import CacheCredenciales, hashear, necesita_rehash, verificar
+from sesiones import SesionesEnMemoria, SesionesSQLite, perfil_de
+
+try:
+    import asyncio
+    import asgi
+except ImportError:
+    asgi = None
 
 
 class TestValidaciones(unittest.TestCase):
@@ -52,6 +95,39 @@ class TestValidaciones(unittest.TestCase):
         self.assertFalse(validar_password('pass'))  # Muy corta
 
 
+class TestValidacionesPorLotes(unittest.TestCase):
+    """Pruebas para validaciones.py (patrones precompilados y API por lotes)"""
+
+    def test_mismo_resultado_que_de_a_uno(self):
+        emails = ['user@example.com', 'bad-email', 'user@', None, 'test_user@domain.co.uk']
+        passwords = ['Password1', 'password123', 'Pass1', 123, 'MyPass9']
+
+        self.assertEqual(validaciones.validar_emails(emails), [validar_email(e) if e else False for e in emails])
+        self.assertEqual(validaciones.validar_passwords(passwords), [True, False, False, False, True])
+
+    def test_validar_montos(self):
+        self.assertEqual(validaciones.validar_montos(['10.5', 3, 'abc', None, 'inf', '0', True]),
+                         [10.5, 3.0, None, None, None, 0.0, None])
+
+    def test_validar_lote(self):
+        """Un dict de errores por registro, sólo con los campos presentes"""
+        errores = validaciones.validar_lote([
+            {'email': 'ana@mail.com', 'password': 'Clave123'},
+            {'email': 'ana@', 'password': 'clave'},
+            {'email': 'beto@mail.com', 'monto': 'x'},
+            {'monto': '0'}
+        ])
+
+        self.assertEqual(errores[0], {})
+        self.assertEqual(set(errores[1]), {'email', 'password'})
+        self.assertEqual(errores[2], {'monto': validaciones.MENSAJES['monto']})
+        self.assertEqual(errores[3], {})
+
+    def test_app_reexporta(self):
+        """app.validar_email sigue existiendo (la usan las rutas y las pruebas viejas)"""
+        self.assertIs(app_modulo.validar_email, validaciones.validar_email)
+
+
 class TestTransacciones(unittest.TestCase):
     """Pruebas para procesar transacciones"""
     
@@ -116,6 +192,65 @@ class TestLogs(unittest.TestCase):
         self.assertTrue(es_fecha_valida)
 
 
+class TestAuditoria(unittest.TestCase):
+    """Pruebas para el log de auditoría en segundo plano"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.archivo = os.path.join(self.tmp.name, 'auditoria.jsonl')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_registros_json_lines(self):
+        """Cada registro es una línea JSON con fecha, usuario, acción y datos"""
+        registro = RegistroAuditoria(self.archivo, intervalo=0.01)
+        registro.registrar('ana@mail.com', 'pagar', monto=40.0)
+        registro.registrar('ana@mail.com', 'login')
+        registro.vaciar()
+
+        with open(self.archivo, encoding='utf-8') as f:
+            lineas = [json.loads(linea) for linea in f]
+        self.assertEqual([l['accion'] for l in lineas], ['pagar', 'login'])
+        self.assertEqual(lineas[0]['monto'], 40.0)
+        datetime.fromisoformat(lineas[0]['fecha'])
+
+    def test_rotacion_por_tamaño(self):
+        """Al pasar el tamaño máximo el archivo se rota y se conservan `copias` viejos"""
+        registro = RegistroAuditoria(self.archivo, tamaño_maximo=1, copias=2, lote=1, intervalo=0.01)
+        for n in range(4):
+            registro.registrar('ana@mail.com', f'accion {n}')
+            registro.vaciar()
+
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ['auditoria.jsonl.1', 'auditoria.jsonl.2'])
+        with open(self.archivo + '.1', encoding='utf-8') as f:
+            self.assertEqual(json.loads(f.read())['accion'], 'accion 3')
+
+
+    def test_goteo_no_demora_el_lote(self):
+        """Con registros llegando más rápido que `intervalo`, el lote se escribe igual al vencer el plazo"""
+        registro = RegistroAuditoria(self.archivo, lote=1000, intervalo=0.2)
+        for n in range(12):
+            registro.registrar('ana@mail.com', f'accion {n}')
+            time.sleep(0.05)
+
+        self.assertTrue(os.path.exists(self.archivo))
+        registro.vaciar()
+
+    def test_error_al_escribir_no_cuelga_vaciar(self):
+        """Un error cualquiera al escribir pierde ese lote pero el hilo sigue y vaciar() vuelve"""
+        registro = RegistroAuditoria(self.archivo, intervalo=0.01)
+        escribir = registro._escribir
+        registro._escribir = lambda registros: 1 / 0
+        registro.registrar('ana@mail.com', 'pagar')
+        self.assertTrue(registro.vaciar(timeout=5))
+
+        registro._escribir = escribir
+        registro.registrar('ana@mail.com', 'login')
+        self.assertTrue(registro.vaciar(timeout=5))
+        with open(self.archivo, encoding='utf-8') as f:
+            self.assertEqual([json.loads(linea)['accion'] for linea in f], ['login'])
+
 class TestCategorias(unittest.TestCase):
     """Pruebas para extraer categorías únicas con sets"""
     
@@ -181,6 +316,44 @@ class TestRecursividad(unittest.TestCase):
         self.assertEqual(resultado, 100)
 
 
+class TestProyecciones(unittest.TestCase):
+    """Pruebas para el interés compuesto con fórmula cerrada"""
+
+    def test_igual_a_la_version_recursiva(self):
+        """Sin aportes y capitalización anual coincide con interes_compuesto_recursivo"""
+        for años in (-1, 0, 1, 2, 10):
+            self.assertAlmostEqual(proyecciones.interes_compuesto(100, 0.1, años),
+                                   interes_compuesto_recursivo(100, 0.1, años))
+
+    def test_horizonte_largo(self):
+        """No tiene límite de recursión"""
+        self.assertAlmostEqual(proyecciones.interes_compuesto(1, 0.001, 5000), 1.001 ** 5000)
+
+    def test_aportes_y_capitalizacion_mensual(self):
+        """Aportes mensuales de 10 durante 1 año al 12% anual"""
+        resultado = proyecciones.interes_compuesto(0, 0.12, 1, aporte=10, capitalizaciones=12)
+        esperado = sum(10 * 1.01 ** k for k in range(12))
+        self.assertAlmostEqual(resultado, esperado)
+        self.assertEqual(proyecciones.interes_compuesto(100, 0, 2, aporte=5, capitalizaciones=12), 220)
+
+    def test_proyectar_varios_escenarios(self):
+        """La versión vectorizada coincide con la fórmula punto a punto, con y sin NumPy"""
+        capitales, tasas, capitalizaciones = [100, 0, 50], [0.1, 0.05, 0], [1, 12, 2]
+        esperado = [[proyecciones.interes_compuesto(c, r, n, 3, m) for n in range(6)]
+                    for c, r, m in zip(capitales, tasas, capitalizaciones)]
+
+        np_original = proyecciones.np
+        try:
+            for modulo_np in (np_original, None):
+                proyecciones.np = modulo_np
+                curvas = proyecciones.proyectar(capitales, tasas, 5, aporte=3, capitalizaciones=capitalizaciones)
+                for curva, curva_esperada in zip(curvas, esperado):
+                    for valor, valor_esperado in zip(curva, curva_esperada):
+                        self.assertAlmostEqual(valor, valor_esperado)
+        finally:
+            proyecciones.np = np_original
+
+
 class TestMatrices(unittest.TestCase):
     """Pruebas para convertir transacciones en matriz"""
     
@@ -236,6 +409,42 @@ class TestEjemploTodo(unittest.TestCase):
             self.assertIn(clave, resultado)
 
 
+class TestAnalitica(unittest.TestCase):
+    """Pruebas para la versión en columnas de las funciones de utilidades_avanzadas"""
+
+    def setUp(self):
+        montos = [100, -50, 200.5, 1.005, 2.675, 0.125, 4.015, -0.01, 0, 123456.785]
+        self.transacciones = [
+            {'descripcion': f'Comida {i}' if i % 2 else ' Sueldo extra', 'monto': m}
+            for i, m in enumerate(montos)
+        ]
+        self.np_original = analitica.np
+
+    def tearDown(self):
+        analitica.np = self.np_original
+
+    def comparar(self):
+        columnas = analitica.ColumnasTransacciones.desde_transacciones(self.transacciones)
+        self.assertEqual(analitica.procesar_montos(columnas), resumen_transacciones_dicts(self.transacciones))
+        self.assertEqual(analitica.categorias_columnar(columnas), categorias_unicas(self.transacciones))
+        self.assertEqual(analitica.matriz_columnar(columnas), matriz_historial(self.transacciones))
+
+    def test_igual_a_las_funciones_originales(self):
+        """Mismos resultados que filter/map/reduce (incluye redondeos a mitad de camino)"""
+        self.comparar()
+
+    def test_igual_sin_numpy(self):
+        """Sin NumPy se usa array('d') y el resultado es el mismo"""
+        analitica.np = None
+        self.comparar()
+
+    def test_vacio(self):
+        """Lista vacía"""
+        self.transacciones = []
+        self.comparar()
+        self.assertEqual(analitica.ejemplo_todo_columnar([])['total'], 0)
+
+
 class TestFlaskApp(unittest.TestCase):
     """Pruebas para rutas Flask"""
     
@@ -267,6 +476,1628 @@ class TestFlaskApp(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
 
 
+class TestAlmacenamiento(unittest.TestCase):
+    """Pruebas para los backends de almacenamiento (JSON, SQLite y fragmentado)"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backends = [
+            AlmacenamientoJSON(self.tmp.name),
+            AlmacenamientoSQLite(os.path.join(self.tmp.name, 'finanzas.db')),
+            AlmacenamientoFragmentado(os.path.join(self.tmp.name, 'fragmentos'), fragmentos=4)
+        ]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_documentos_por_usuario(self):
+        """Guardar y leer el documento de un usuario (email sin distinguir mayúsculas)"""
+        for almacen in self.backends:
+            almacen.guardar(USUARIOS, 'Ana@Mail.com', {'nombre': 'Ana', 'password': 'x', 'saldo': 10})
+
+            self.assertEqual(almacen.obtener(USUARIOS, 'ana@mail.com')['saldo'], 10)
+            self.assertIsNone(almacen.obtener(USUARIOS, 'otro@mail.com'))
+            self.assertEqual([e for e, _ in almacen.iterar(USUARIOS)], ['ana@mail.com'])
+
+    def test_transacciones_mas_nueva_primero(self):
+        """Las transacciones se devuelven de la más nueva a la más vieja"""
+        for almacen in self.backends:
+            almacen.agregar_transaccion('ana@mail.com', {
+                'fecha': '2025-01-01T10:00:00', 'descripcion': 'vieja', 'monto': 5.0, 'tipo': 'ingreso'})
+            almacen.agregar_transaccion('ana@mail.com', {
+                'fecha': '2025-01-02T10:00:00', 'descripcion': 'nueva', 'monto': -2.0, 'tipo': 'gasto'})
+
+            descripciones = [t['descripcion'] for t in almacen.transacciones('ana@mail.com')]
+            self.assertEqual(descripciones, ['nueva', 'vieja'])
+            self.assertEqual(almacen.transacciones('otro@mail.com'), [])
+
+    def test_iterar_por_partes(self):
+        """Las partes no se pisan y entre todas cubren la colección"""
+        emails = [f'u{n}@mail.com' for n in range(30)]
+        for almacen in self.backends:
+            almacen.guardar_muchos(USUARIOS, [(e, {'saldo': 0}) for e in emails])
+
+            vistos = [e for parte in range(3) for e, _ in almacen.iterar_parte(USUARIOS, parte, 3)]
+            self.assertEqual(sorted(vistos), sorted(emails))
+
+    def test_migrar_json_a_sqlite(self):
+        """La migración copia usuarios, inversiones y transacciones"""
+        origen, destino = self.backends[:2]
+        origen.guardar(USUARIOS, 'ana@mail.com', {'nombre': 'Ana', 'password': 'x', 'saldo': 10})
+        origen.guardar(INVERSIONES, 'ana@mail.com', {'Bonos': 5})
+        origen.agregar_transaccion('ana@mail.com', {
+            'fecha': '2025-01-01T10:00:00', 'descripcion': 'sueldo', 'monto': 10.0, 'tipo': 'ingreso'})
+
+        self.assertEqual(migrar(origen, destino), 1)
+        self.assertEqual(destino.obtener(INVERSIONES, 'ana@mail.com'), {'Bonos': 5})
+        self.assertEqual(destino.transacciones('ana@mail.com'),
+                         origen.transacciones('ana@mail.com'))
+
+
+class TestJournalTransacciones(unittest.TestCase):
+    """Pruebas para el journal append-only del backend JSON"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.almacen = AlmacenamientoJSON(self.tmp.name, limite_journal=3)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def transaccion(self, n):
+        return {'fecha': f'2025-01-0{n}T10:00:00', 'descripcion': f't{n}', 'monto': float(n), 'tipo': 'ingreso'}
+
+    def test_agregar_no_reescribe_el_json(self):
+        """Agregar una transacción sólo escribe una línea en el journal"""
+        self.almacen.agregar_transaccion('ana@mail.com', self.transaccion(1))
+
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, 'transacciones.json')))
+        with open(os.path.join(self.tmp.name, 'transacciones.jsonl'), encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 1)
+        # Se guarda con la categoría ya calculada
+        self.assertEqual(self.almacen.transacciones('ana@mail.com'),
+                         [dict(self.transaccion(1), categoria='t1')])
+
+    def test_compacta_al_llegar_al_limite(self):
+        """Al llegar al límite el journal se vuelca al JSON y se vacía"""
+        for n in (1, 2, 3):
+            self.almacen.agregar_transaccion('ana@mail.com', self.transaccion(n))
+
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, 'transacciones.jsonl')))
+        with open(os.path.join(self.tmp.name, 'transacciones.json'), encoding='utf-8') as f:
+            guardadas = json.load(f)['ana@mail.com']
+        self.assertEqual([t['descripcion'] for t in guardadas], ['t3', 't2', 't1'])
+
+    def test_linea_cortada_se_ignora(self):
+        """Una línea incompleta (caída a mitad de escritura) no rompe la lectura"""
+        self.almacen.agregar_transaccion('ana@mail.com', self.transaccion(1))
+        with open(os.path.join(self.tmp.name, 'transacciones.jsonl'), 'a', encoding='utf-8') as f:
+            f.write('{"email": "ana@mail.com", "transacc')
+        self.almacen.agregar_transaccion('ana@mail.com', self.transaccion(2))
+
+        descripciones = [t['descripcion'] for t in self.almacen.transacciones('ana@mail.com')]
+        self.assertEqual(descripciones, ['t2', 't1'])
+
+
+class TestCacheJSON(unittest.TestCase):
+    """Pruebas para la cache en memoria del backend JSON"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.almacen = AlmacenamientoJSON(self.tmp.name)
+        self.almacen.guardar(USUARIOS, 'ana@mail.com', {'nombre': 'Ana', 'password': 'x', 'saldo': 10})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lecturas_repetidas_no_releen(self):
+        """Si el archivo no cambió, se devuelve la misma colección en memoria"""
+        self.assertIs(self.almacen.cargar(USUARIOS), self.almacen.cargar(USUARIOS))
+
+    def test_modificar_lo_leido_no_ensucia_la_cache(self):
+        """obtener() devuelve una copia"""
+        usuario = self.almacen.obtener(USUARIOS, 'ana@mail.com')
+        usuario['saldo'] = 999
+
+        self.assertEqual(self.almacen.obtener(USUARIOS, 'ana@mail.com')['saldo'], 10)
+
+    def test_escritura_de_otro_proceso_invalida(self):
+        """Un cambio en el archivo hecho por otro proceso se detecta por mtime"""
+        self.almacen.obtener(USUARIOS, 'ana@mail.com')
+        otro = AlmacenamientoJSON(self.tmp.name)
+        otro.guardar(USUARIOS, 'ana@mail.com', {'nombre': 'Ana', 'password': 'x', 'saldo': 25})
+
+        self.assertEqual(self.almacen.obtener(USUARIOS, 'ana@mail.com')['saldo'], 25)
+
+    def test_journal_actualiza_la_cache(self):
+        """Agregar transacciones mantiene la cache sin releer el archivo"""
+        self.almacen.transacciones('ana@mail.com')
+        self.almacen.agregar_transaccion('ana@mail.com', {
+            'fecha': '2025-01-01T10:00:00', 'descripcion': 'sueldo', 'monto': 10.0, 'tipo': 'ingreso'})
+
+        self.assertEqual(len(self.almacen.transacciones('ana@mail.com')), 1)
+        self.assertEqual(len(AlmacenamientoJSON(self.tmp.name).transacciones('ana@mail.com')), 1)
+
+
+class TestAlmacenamientoFragmentado(unittest.TestCase):
+    """Pruebas para el backend JSON repartido en fragmentos por usuario"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.almacen = AlmacenamientoFragmentado(self.tmp.name, fragmentos=8)
+        # Dos usuarios que caen en fragmentos distintos
+        self.ana = 'ana@mail.com'
+        self.otro = next(f'u{n}@mail.com' for n in range(100)
+                         if self.almacen.numero(f'u{n}@mail.com') != self.almacen.numero(self.ana))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_cada_usuario_escribe_en_su_fragmento(self):
+        """Guardar un usuario no toca el archivo del otro fragmento"""
+        self.almacen.guardar(USUARIOS, self.ana, {'nombre': 'Ana', 'password': 'x', 'saldo': 1})
+        self.almacen.guardar(USUARIOS, self.otro, {'nombre': 'Otro', 'password': 'x', 'saldo': 2})
+
+        for email, saldo in ((self.ana, 1), (self.otro, 2)):
+            ruta = os.path.join(self.tmp.name, f'{self.almacen.numero(email):02x}', 'usuarios.json')
+            with open(ruta, encoding='utf-8') as f:
+                self.assertEqual({e: u['saldo'] for e, u in json.load(f).items()}, {email: saldo})
+        self.assertEqual(sorted(e for e, _ in self.almacen.iterar(USUARIOS)), sorted([self.ana, self.otro]))
+
+    def test_cantidad_de_fragmentos_queda_fija(self):
+        """Reabrir con otro número de fragmentos respeta el del directorio"""
+        self.almacen.guardar(USUARIOS, self.ana, {'nombre': 'Ana', 'password': 'x', 'saldo': 1})
+        reabierto = AlmacenamientoFragmentado(self.tmp.name, fragmentos=64)
+
+        self.assertEqual(reabierto.cantidad, 8)
+        self.assertEqual(reabierto.obtener(USUARIOS, self.ana)['saldo'], 1)
+
+    def test_migrar_desde_json(self):
+        """migrar() reparte los archivos globales en fragmentos"""
+        origen = AlmacenamientoJSON(os.path.join(self.tmp.name, 'globales'))
+        for email in (self.ana, self.otro):
+            origen.guardar(USUARIOS, email, {'nombre': email, 'password': 'x', 'saldo': 5})
+            origen.agregar_transaccion(email, {'fecha': '2025-01-01T10:00:00', 'descripcion': 'Luz',
+                                               'monto': -3.0, 'tipo': 'gasto'})
+        destino = AlmacenamientoFragmentado(os.path.join(self.tmp.name, 'nuevo'), fragmentos=8)
+
+        self.assertEqual(migrar(origen, destino), 2)
+        for email in (self.ana, self.otro):
+            self.assertEqual(destino.obtener(USUARIOS, email)['saldo'], 5)
+            self.assertEqual(destino.transacciones(email), origen.transacciones(email))
+        self.assertEqual(len(list(destino.iterar_transacciones())), 2)
+
+
+class TestEscriturasSeguras(unittest.TestCase):
+    """Pruebas para escrituras atómicas y bloqueos por usuario"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_archivo_roto_no_se_lee_como_vacio(self):
+        """Un JSON corrupto levanta error en vez de devolver {} (y luego borrar todo)"""
+        with open(os.path.join(self.tmp.name, 'usuarios.json'), 'w', encoding='utf-8') as f:
+            f.write('{"ana@mail.com": {"saldo"')
+        almacen = AlmacenamientoJSON(self.tmp.name)
+
+        with self.assertRaises(ValueError):
+            almacen.obtener(USUARIOS, 'ana@mail.com')
+
+    def test_escritura_no_deja_temporales(self):
+        """Se escribe en un temporal que se renombra sobre el archivo final"""
+        almacen = AlmacenamientoJSON(self.tmp.name)
+        almacen.guardar(USUARIOS, 'ana@mail.com', {'nombre': 'Ana', 'password': 'x', 'saldo': 1})
+
+        archivos = [a for a in os.listdir(self.tmp.name) if not a.startswith('.bloqueos')]
+        self.assertEqual(archivos, ['usuarios.json'])
+
+    def test_ingresos_concurrentes_no_se_pierden(self):
+        """Muchos hilos sumando saldo al mismo usuario no pierden actualizaciones"""
+        for almacen in (AlmacenamientoJSON(self.tmp.name),
+                        AlmacenamientoSQLite(os.path.join(self.tmp.name, 'finanzas.db'))):
+            almacen.guardar(USUARIOS, 'ana@mail.com', {'nombre': 'Ana', 'password': 'x', 'saldo': 0})
+
+            def sumar():
+                for _ in range(10):
+                    with almacen.bloquear('ana@mail.com'):
+                        usuario = almacen.obtener(USUARIOS, 'ana@mail.com')
+                        usuario['saldo'] += 1
+                        almacen.guardar(USUARIOS, 'ana@mail.com', usuario)
+
+            hilos = [threading.Thread(target=sumar) for _ in range(8)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+
+            self.assertEqual(almacen.obtener(USUARIOS, 'ana@mail.com')['saldo'], 80)
+
+
+class TestRegistros(unittest.TestCase):
+    """Pruebas para la transacción compacta de registros.py"""
+
+    def setUp(self):
+        self.datos = {'fecha': '2025-11-13T21:25:04.556429', 'descripcion': 'Inversión en Bonos',
+                      'monto': -15000.0, 'tipo': 'gasto', 'categoria': 'inversiones'}
+
+    def test_ida_y_vuelta(self):
+        t = Transaccion.desde_dict(self.datos)
+
+        self.assertEqual(t.a_dict(), self.datos)
+        self.assertEqual(dict(t), self.datos)
+        self.assertEqual(fecha_de(instante_de('2025-01-01T10:00:00')), '2025-01-01T10:00:00')
+
+    def test_fecha_con_zona_ida_y_vuelta(self):
+        """Una fecha con zona horaria vuelve tal cual; el orden sigue siendo por el instante en UTC"""
+        t = Transaccion.desde_dict(dict(self.datos, fecha='2025-01-31T23:30:00-03:00'))
+
+        self.assertEqual(t['fecha'], '2025-01-31T23:30:00-03:00')
+        self.assertEqual(t.instante, instante_de('2025-02-01T02:30:00'))
+        self.assertEqual(Transaccion.desde_dict(dict(self.datos, fecha='2025-01-31T10:00:00+05:30')).fecha,
+                         '2025-01-31T10:00:00+05:30')
+
+    def test_se_lee_como_dict(self):
+        t = Transaccion.desde_dict({k: v for k, v in self.datos.items() if k != 'categoria'})
+
+        self.assertEqual(t['monto'], -15000.0)
+        self.assertEqual(t.get('categoria', 'nada'), 'nada')
+        self.assertEqual(t.fecha[:10], '2025-11-13')
+        self.assertNotIn('categoria', t)
+        with self.assertRaises(KeyError):
+            t['otra']
+
+    def test_strings_repetidos_compartidos(self):
+        """Dos transacciones con la misma descripción leída por separado comparten el string"""
+        a = Transaccion.desde_dict(json.loads(json.dumps(self.datos)))
+        b = Transaccion.desde_dict(json.loads(json.dumps(self.datos)))
+
+        self.assertIs(a.descripcion, b.descripcion)
+        self.assertIs(a.tipo, b.tipo)
+
+    def test_backend_json_guarda_compactas(self):
+        """La cache del backend JSON tiene Transaccion; hacia afuera siguen siendo dicts"""
+        with tempfile.TemporaryDirectory() as tmp:
+            almacen = AlmacenamientoJSON(tmp, limite_journal=2)
+            almacen.agregar_transaccion('ana@mail.com', self.datos)
+            almacen.agregar_transaccion('ana@mail.com', dict(self.datos, fecha='2025-11-14T10:00:00'))
+
+            with open(os.path.join(tmp, 'transacciones.json'), encoding='utf-8') as f:
+                self.assertEqual(json.load(f)['ana@mail.com'][1], self.datos)
+            otro = AlmacenamientoJSON(tmp)
+            self.assertIsInstance(otro.cargar('transacciones')['ana@mail.com'][0], Transaccion)
+            self.assertEqual(otro.transacciones('ana@mail.com')[1], self.datos)
+            self.assertIs(type(otro.transacciones_pagina('ana@mail.com')[0][0]), dict)
+
+
+class TestResumenes(unittest.TestCase):
+    """Pruebas para los totales por usuario mantenidos al escribir"""
+
+    def setUp(self):
+        self.transacciones = [
+            {'fecha': '2025-02-03T10:00:00', 'descripcion': 'luz', 'monto': -30.0, 'tipo': 'gasto'},
+            {'fecha': '2025-01-15T10:00:00', 'descripcion': 'gym', 'monto': -20.0, 'tipo': 'gasto'},
+            {'fecha': '2025-01-01T10:00:00', 'descripcion': 'sueldo', 'monto': 100.0, 'tipo': 'ingreso'}
+        ]
+
+    def test_reconstruir_resumen(self):
+        """El resumen coincide con recorrer todo el historial"""
+        resumen, acumulados = reconstruir_resumen(self.transacciones)
+
+        self.assertEqual(resumen['ingresos'], 100.0)
+        self.assertEqual(resumen['gastos'], 50.0)
+        self.assertEqual(acumulados['mes']['2025-01'], {'ingresos': 100.0, 'gastos': 20.0, 'inversiones': 0})
+        self.assertEqual(acumulados['mes']['2025-02'], {'ingresos': 0, 'gastos': 30.0, 'inversiones': 0})
+        # Los acumulados no van dentro del documento del resumen
+        self.assertNotIn('mes', resumen)
+
+    def test_incremental_igual_a_reconstruir(self):
+        """Aplicar transacciones una a una da lo mismo que reconstruir"""
+        resumen, acumulados = resumen_vacio(), acumulados_vacios()
+        for t in reversed(self.transacciones):
+            aplicar_transaccion(resumen, t, acumulados)
+
+        self.assertEqual((resumen, acumulados), reconstruir_resumen(self.transacciones))
+
+    def test_totales_por_categoria(self):
+        resumen, _ = reconstruir_resumen(self.transacciones)
+
+        self.assertEqual(resumen['por_categoria']['servicios'], {'ingresos': 0, 'gastos': 30.0, 'cantidad': 1})
+        self.assertEqual(resumen['por_categoria']['sueldo']['ingresos'], 100.0)
+        self.assertEqual(ranking_categorias(resumen), [('servicios', 30.0, 1), ('gym', 20.0, 1)])
+
+    def test_acumulados_por_dia_y_año(self):
+        """Las inversiones se cuentan como gasto y además aparte"""
+        self.transacciones.insert(0, {'fecha': '2025-02-03T12:00:00', 'descripcion': 'Inversión en Bonos',
+                                      'monto': -40.0, 'tipo': 'gasto'})
+        _, acumulados = reconstruir_resumen(self.transacciones)
+
+        self.assertEqual(acumulados['dia']['2025-02-03'], {'ingresos': 0, 'gastos': 70.0, 'inversiones': 40.0})
+        self.assertEqual(acumulados['año']['2025'], {'ingresos': 100.0, 'gastos': 90.0, 'inversiones': 40.0})
+
+    def test_reporte_completa_periodos_vacios(self):
+        """El reporte sale de los acumulados, del más viejo al más nuevo, con ceros donde no hubo nada"""
+        _, acumulados = reconstruir_resumen(self.transacciones)
+
+        filas = reporte(acumulados['mes'], 'mes', 4, hasta=date(2025, 2, 10))
+        self.assertEqual([f['periodo'] for f in filas], ['2024-11', '2024-12', '2025-01', '2025-02'])
+        self.assertEqual([f['gastos'] for f in filas], [0, 0, 20.0, 30.0])
+        self.assertEqual(reporte(acumulados['año'], 'año', 2, hasta=date(2025, 6, 1))[1]['ingresos'], 100.0)
+        self.assertEqual(reporte(acumulados['dia'], 'dia', 3, hasta=date(2025, 1, 2))[0]['periodo'], '2024-12-31')
+        self.assertEqual(rango_reporte('mes', 4, hasta=date(2025, 2, 10)), ('2024-11', '2025-02'))
+        with self.assertRaises(ValueError):
+            reporte({}, 'semana')
+
+    def test_resumen_viejo_no_esta_al_dia(self):
+        """Un resumen guardado antes de las categorías, o con los acumulados adentro, se reconstruye"""
+        self.assertFalse(resumen_al_dia({'ingresos': 0, 'gastos': 0, 'por_mes': {}}))
+        self.assertFalse(resumen_al_dia({'ingresos': 0, 'gastos': 0, 'por_dia': {}, 'por_mes': {},
+                                         'por_año': {}, 'por_categoria': {}}))
+        self.assertFalse(resumen_al_dia(None))
+        self.assertTrue(resumen_al_dia(resumen_vacio()))
+
+
+class TestAcumulados(unittest.TestCase):
+    """Pruebas para los acumulados por periodo guardados aparte del resumen"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backends = [
+            AlmacenamientoJSON(self.tmp.name),
+            AlmacenamientoSQLite(os.path.join(self.tmp.name, 'finanzas.db')),
+            AlmacenamientoFragmentado(os.path.join(self.tmp.name, 'fragmentos'), fragmentos=4)
+        ]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def bucket(self, ingresos=0, gastos=0, inversiones=0):
+        return {'ingresos': ingresos, 'gastos': gastos, 'inversiones': inversiones}
+
+    def test_sumar_leer_y_reemplazar(self):
+        """Cada suma toca sólo sus buckets; reemplazar deja sólo los nuevos"""
+        for almacen in self.backends:
+            almacen.sumar_acumulados('Ana@mail.com', {'mes': {'2025-01': self.bucket(ingresos=10.0)}})
+            almacen.sumar_acumulados('ana@mail.com', {'mes': {'2025-01': self.bucket(gastos=2.5),
+                                                              '2025-03': self.bucket(gastos=1.0)}})
+
+            self.assertEqual(almacen.acumulados('ana@mail.com', 'mes', '2025-01', '2025-02'),
+                             {'2025-01': self.bucket(10.0, 2.5)})
+            self.assertEqual(almacen.acumulados('ana@mail.com', 'dia', '2025-01-01', '2025-12-31'), {})
+
+            almacen.reemplazar_acumulados('ana@mail.com', {'año': {'2025': self.bucket(ingresos=1.0)}})
+            self.assertEqual(almacen.acumulados('ana@mail.com', 'mes', '2025-01', '2025-12'), {})
+            self.assertEqual(dict(almacen.iterar_acumulados()),
+                             {'ana@mail.com': {'año': {'2025': self.bucket(ingresos=1.0)}}})
+
+    def test_json_agrega_una_linea_por_escritura(self):
+        """En el backend JSON sumar no reescribe ningún archivo: agrega una línea al journal"""
+        almacen = AlmacenamientoJSON(self.tmp.name)
+        for n in range(3):
+            almacen.sumar_acumulados('ana@mail.com', {'dia': {f'2025-01-0{n + 1}': self.bucket(gastos=1.0)}})
+
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, 'acumulados.json')))
+        with open(os.path.join(self.tmp.name, 'acumulados.jsonl'), encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 3)
+        # Otro proceso (otra instancia) ve lo mismo releyendo el journal
+        self.assertEqual(len(AlmacenamientoJSON(self.tmp.name).acumulados(
+            'ana@mail.com', 'dia', '2025-01-01', '2025-01-31')), 3)
+
+        almacen.compactar()
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, 'acumulados.jsonl')))
+        self.assertEqual(almacen.acumulados('ana@mail.com', 'dia', '2025-01-02', '2025-01-02'),
+                         {'2025-01-02': self.bucket(gastos=1.0)})
+
+    def test_migrar_copia_los_acumulados(self):
+        origen, destino = self.backends[:2]
+        origen.sumar_acumulados('ana@mail.com', {'mes': {'2025-01': self.bucket(ingresos=10.0)}})
+
+        migrar(origen, destino)
+        self.assertEqual(destino.acumulados('ana@mail.com', 'mes', '2025-01', '2025-01'),
+                         {'2025-01': self.bucket(ingresos=10.0)})
+
+
+class TestCartera(unittest.TestCase):
+    """Pruebas para las posiciones y la valuación de la cartera"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tabla = TablaPrecios(os.path.join(self.tmp.name, 'precios.json'))
+        self.cartera = cartera_vacia()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_valor_sigue_al_precio(self):
+        """Se compran unidades al precio del día y valen al precio actual"""
+        agregar_posicion(self.cartera, 'Acciones', 100.0, self.tabla)
+        self.tabla.actualizar(precios={'Acciones': 2.0})
+        agregar_posicion(self.cartera, 'Acciones', 100.0, self.tabla)
+        self.tabla.actualizar(precios={'Acciones': 3.0})
+
+        acciones = valuar(self.cartera['acumulados'], self.tabla)['productos']['Acciones']
+        self.assertEqual(acciones, {'capital': 200.0, 'valor': 450.0, 'rendimiento': 250.0, 'porcentaje': 125.0})
+
+    def test_plazo_fijo_devenga_por_dia_a_su_tasa(self):
+        """Cada plazo fijo conserva la tasa con la que se constituyó"""
+        self.tabla.actualizar(tasas={'Plazo Fijo': 0.365})
+        agregar_posicion(self.cartera, 'Plazo Fijo', 1000.0, self.tabla, datetime(2025, 1, 1, 10))
+        self.tabla.actualizar(tasas={'Plazo Fijo': 0.73})
+        agregar_posicion(self.cartera, 'Plazo Fijo', 1000.0, self.tabla, datetime(2025, 1, 6, 10))
+
+        total = valuar(self.cartera['acumulados'], self.tabla, date(2025, 1, 11))
+        # 1000 a 0.1%/día por 10 días + 1000 a 0.2%/día por 5 días
+        self.assertEqual(total['productos']['Plazo Fijo']['valor'], 2020.0)
+        self.assertEqual(total['valor'], 2020.0)
+
+    def test_acumulados_equivalen_a_recorrer_posiciones(self):
+        for n, producto in enumerate(['Bonos', 'Plazo Fijo', 'Bonos', 'Fondos Comunes', 'Plazo Fijo']):
+            self.tabla.actualizar(precios={'Bonos': 1 + n / 10}, tasas={'Plazo Fijo': 0.3 + n / 100})
+            agregar_posicion(self.cartera, producto, 10.0 * (n + 1), self.tabla, datetime(2025, 1, n + 1))
+
+        recalculados = reconstruir_acumulados(self.cartera['posiciones'])
+        hoy = date(2025, 3, 1)
+        self.assertEqual(valuar(recalculados, self.tabla, hoy), valuar(self.cartera['acumulados'], self.tabla, hoy))
+
+    def test_valuacion_guardada_hasta_que_cambia_la_tabla(self):
+        agregar_posicion(self.cartera, 'Bonos', 50.0, self.tabla)
+        self.assertTrue(revaluar(self.cartera, self.tabla))
+        guardada = self.cartera['valuacion']
+
+        self.assertIs(valuacion(self.cartera, self.tabla), guardada)
+        self.assertFalse(revaluar(self.cartera, self.tabla))
+
+        self.tabla.actualizar(precios={'Bonos': 1.1})
+        self.assertEqual(valuacion(self.cartera, self.tabla)['valor'], 55.0)
+
+    def test_desde_totales_viejos(self):
+        cartera = desde_totales({'Fondos Comunes': 0, 'Acciones': 30, 'Bonos': 0, 'Plazo Fijo': 20}, self.tabla)
+
+        self.assertEqual([p['producto'] for p in cartera['posiciones']], ['Acciones', 'Plazo Fijo'])
+        self.assertEqual(valuar(cartera['acumulados'], self.tabla)['capital'], 50.0)
+
+    def test_tabla_cambiada_por_otro_proceso(self):
+        TablaPrecios(self.tabla.ruta).actualizar(precios={'Acciones': 4.0})
+
+        self.assertEqual(self.tabla.precio('Acciones'), 4.0)
+        self.assertEqual(self.tabla.version, 1)
+        with self.assertRaises(ValueError):
+            self.tabla.actualizar(precios={'Cripto': 1.0})
+
+    def test_precios_y_tasas_invalidos(self):
+        """Precios que no sean positivos y finitos, o tasas no finitas, no se guardan"""
+        for precios, tasas in (({'Acciones': 0}, None), ({'Acciones': -1.0}, None), ({'Bonos': float('nan')}, None),
+                               ({'Bonos': float('inf')}, None), (None, {'Plazo Fijo': float('nan')}),
+                               ({'Bonos': True}, None)):
+            with self.assertRaises(ValueError):
+                self.tabla.actualizar(precios, tasas)
+
+        self.assertEqual(self.tabla.version, 0)
+        runner = app_modulo.app.test_cli_runner()
+        resultado = runner.invoke(args=['precios', 'Acciones=nan'])
+        self.assertNotEqual(resultado.exit_code, 0)
+        self.assertIn('Precio inválido', resultado.output)
+
+
+class TestRevaluacion(unittest.TestCase):
+    """Pruebas para la revaluación de todas las carteras en paralelo"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ruta_precios = os.path.join(self.tmp.name, 'precios.json')
+        self.tabla = TablaPrecios(self.ruta_precios)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def cargar_carteras(self, almacen, cantidad):
+        for n in range(cantidad):
+            cartera = cartera_vacia()
+            agregar_posicion(cartera, 'Acciones', 10.0 * (n + 1), self.tabla)
+            almacen.guardar(CARTERAS, f'u{n}@mail.com', cartera)
+
+    def test_guarda_valuaciones_de_cierre(self):
+        destino = os.path.join(self.tmp.name, 'finanzas.db')
+        almacen = AlmacenamientoSQLite(destino)
+        self.cargar_carteras(almacen, 12)
+        self.tabla.actualizar(precios={'Acciones': 1.5})
+        avances = []
+
+        resultado = revaluar_todo('sqlite', destino, self.ruta_precios, procesos=1, lote=5,
+                                  avance=lambda cantidad, segundos: avances.append(cantidad))
+
+        self.assertEqual(resultado['carteras'], 12)
+        self.assertEqual(avances[-1], 12)
+        cierre = almacen.obtener(VALUACIONES, 'u3@mail.com')
+        self.assertEqual((cierre['valor'], cierre['version'], cierre['posiciones']), (60.0, 1, 1))
+        # Las carteras no se reescriben
+        self.assertIsNone(almacen.obtener(CARTERAS, 'u3@mail.com')['valuacion'])
+
+    def test_pool_de_procesos(self):
+        destino = os.path.join(self.tmp.name, 'datos')
+        almacen = AlmacenamientoFragmentado(destino, fragmentos=8)
+        self.cargar_carteras(almacen, 20)
+
+        resultado = revaluar_todo('fragmentado', destino, self.ruta_precios, procesos=2)
+
+        self.assertEqual(resultado['carteras'], 20)
+        self.assertEqual(len(list(almacen.iterar(VALUACIONES))), 20)
+        self.assertEqual(almacen.obtener(VALUACIONES, 'u19@mail.com')['valor'], 200.0)
+
+
+    def test_totales_viejos_sin_cartera(self):
+        """Quien sólo tiene totales en inversiones.json también se revalúa (sin guardarle cartera)"""
+        almacen = AlmacenamientoJSON(self.tmp.name)
+        self.cargar_carteras(almacen, 1)
+        almacen.guardar(INVERSIONES, 'u0@mail.com', {'Acciones': 999})
+        almacen.guardar(INVERSIONES, 'viejo@mail.com', {'Fondos Comunes': 0, 'Acciones': 40, 'Bonos': 0,
+                                                        'Plazo Fijo': 0})
+        almacen.guardar(INVERSIONES, 'vacio@mail.com', {'Fondos Comunes': 0, 'Acciones': 0, 'Bonos': 0,
+                                                        'Plazo Fijo': 0})
+        self.tabla.actualizar(precios={'Acciones': 2.0})
+
+        resultado = revaluar_todo('json', self.tmp.name, self.ruta_precios, procesos=1)
+
+        self.assertEqual(resultado['carteras'], 2)
+        self.assertEqual(almacen.obtener(VALUACIONES, 'viejo@mail.com')['capital'], 40.0)
+        # La de u0 sale de su cartera, no de los totales
+        self.assertEqual(almacen.obtener(VALUACIONES, 'u0@mail.com')['capital'], 10.0)
+        self.assertIsNone(almacen.obtener(CARTERAS, 'viejo@mail.com'))
+
+class TestLibro(unittest.TestCase):
+    """Pruebas para los asientos de partida doble, el checkpoint del saldo y la conciliación"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backends = [
+            AlmacenamientoJSON(self.tmp.name),
+            AlmacenamientoSQLite(os.path.join(self.tmp.name, 'finanzas.db'))
+        ]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def movimiento(self, descripcion, monto, fecha='2025-01-01T10:00:00'):
+        return {'fecha': fecha, 'descripcion': descripcion, 'monto': monto,
+                'tipo': 'ingreso' if monto > 0 else 'gasto'}
+
+    def test_asientos_balanceados(self):
+        self.assertEqual(asiento(self.movimiento('Ingreso: Sueldo', 100.0)),
+                         [('disponible', 100.0), ('ingresos', -100.0)])
+        self.assertEqual(asiento(self.movimiento('Luz', -30.0)), [('disponible', -30.0), ('gastos', 30.0)])
+        self.assertEqual(asiento(self.movimiento('inversion en plazo fijo', -50.0)),
+                         [('disponible', -50.0), ('inversiones:Plazo Fijo', 50.0)])
+
+    def test_corte_entre_escrituras_se_completa(self):
+        """Un asiento escrito sin su saldo se suma en la próxima operación (en orden de alta, no de fecha)"""
+        for almacen in self.backends:
+            almacen.agregar_transaccion('ana@mail.com', self.movimiento('Ingreso: Sueldo', 100.0))
+            usuario = {'nombre': 'Ana', 'password': 'x', 'saldo': 100.0, 'libro': {'asientos': 1}}
+            # Se cortó después de escribir estos dos y antes de guardar el saldo
+            almacen.agregar_transacciones('ana@mail.com', [self.movimiento('Luz', -30.0, '2024-12-01T10:00:00'),
+                                                           self.movimiento('Gas', -20.0, '2025-02-01T10:00:00')])
+
+            al_dia(almacen, 'ana@mail.com', usuario)
+            self.assertEqual((usuario['saldo'], usuario['libro']), (50.0, {'asientos': 3}))
+
+    def test_checkpoint_adelantado_rehace_el_saldo(self):
+        """Si el saldo cuenta asientos que se perdieron, se rehace con el historial que hay"""
+        for almacen in self.backends:
+            almacen.agregar_transacciones('ana@mail.com', [self.movimiento('Luz', -30.0),
+                                                           self.movimiento('Ingreso: Sueldo', 100.0)])
+            # El saldo ya incluía un tercer asiento (-20) que no llegó al disco
+            usuario = {'nombre': 'Ana', 'password': 'x', 'saldo': 50.0, 'libro': {'asientos': 3}}
+
+            al_dia(almacen, 'ana@mail.com', usuario)
+            self.assertEqual((usuario['saldo'], usuario['libro']), (70.0, {'asientos': 2}))
+
+    def test_cuenta_vieja_toma_el_saldo_guardado(self):
+        almacen = self.backends[0]
+        almacen.agregar_transaccion('ana@mail.com', self.movimiento('Luz', -30.0))
+        usuario = al_dia(almacen, 'ana@mail.com', {'nombre': 'Ana', 'password': 'x', 'saldo': 70.0})
+
+        self.assertEqual((usuario['saldo'], usuario['libro']), (70.0, {'asientos': 1}))
+
+    def test_conciliar(self):
+        for almacen in self.backends:
+            almacen.agregar_transacciones('ana@mail.com', [self.movimiento('Inversión en Bonos', -40.0),
+                                                           self.movimiento('Ingreso: Sueldo', 100.0)])
+            almacen.guardar(USUARIOS, 'ana@mail.com', {'nombre': 'Ana', 'saldo': 60.0, 'libro': {'asientos': 2}})
+            almacen.guardar(INVERSIONES, 'ana@mail.com', {'Bonos': 40.0})
+            almacen.guardar(USUARIOS, 'beto@mail.com', {'nombre': 'Beto', 'saldo': 15.0})
+            diferencias = []
+
+            resultado = conciliar(almacen, diferencias.append)
+
+            self.assertEqual(diferencias, [{'email': 'beto@mail.com', 'cuenta': 'disponible',
+                                            'libro': 0, 'guardado': 15.0}])
+            self.assertEqual((resultado['usuarios'], resultado['asientos']), (2, 2))
+            self.assertEqual(resultado['cuentas'], {'disponible': 60.0, 'ingresos': -100.0,
+                                                    'inversiones:Bonos': 40.0})
+
+
+class TestCategorizador(unittest.TestCase):
+    """Pruebas para la clasificación por reglas de categorias.py"""
+
+    def test_palabras_clave_y_frases(self):
+        self.assertEqual(categorizar('Pago de Luz'), 'servicios')
+        self.assertEqual(categorizar('Compra en Supermercado'), 'alimentos')
+        self.assertEqual(categorizar('Cuota obra social'), 'salud')
+        self.assertEqual(categorizar('Ingreso: Sueldo'), 'sueldo')
+
+    def test_patrones_y_tildes(self):
+        """Las regex ganan a las palabras clave y no importan las tildes"""
+        self.assertEqual(categorizar('Inversión en Bonos'), 'inversiones')
+        self.assertEqual(categorizar('Transferencia por la luz'), 'transferencias')
+
+    def test_sin_regla_usa_la_primera_palabra(self):
+        """Igual que categorias_unicas cuando ninguna regla coincide"""
+        self.assertEqual(categorizar('Gym mensual'), 'gym')
+        self.assertEqual(categorizar(''), 'otros')
+        self.assertEqual(categorizar(None), 'otros')
+
+    def test_descripcion_larga(self):
+        """Una descripción muy larga se recorre una vez por palabra, sin copiar el resto"""
+        self.assertEqual(categorizar('obra ' * 20000 + 'luz'), 'servicios')
+
+    def test_reglas_propias(self):
+        """La coincidencia más a la izquierda y más larga gana"""
+        categorizador = Categorizador(patrones={}, palabras_clave={'auto': ['seguro'], 'hogar': ['seguro hogar']})
+
+        self.assertEqual(categorizador.categorizar('Seguro hogar anual'), 'hogar')
+        self.assertEqual(categorizador.categorizar('Seguro del auto'), 'auto')
+
+    def test_base_sqlite_vieja_se_actualiza(self):
+        """Una base sin columna categoria la gana, completada e indexada, al abrirse"""
+        import sqlite3
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = os.path.join(tmp, 'vieja.db')
+            conn = sqlite3.connect(ruta)
+            conn.execute("CREATE TABLE transacciones (id INTEGER PRIMARY KEY, email TEXT NOT NULL, "
+                         "fecha TEXT NOT NULL, descripcion TEXT, monto REAL NOT NULL, tipo TEXT NOT NULL)")
+            conn.execute("INSERT INTO transacciones (email, fecha, descripcion, monto, tipo) "
+                         "VALUES ('ana@mail.com', '2025-01-01T10:00:00', 'Luz', -30, 'gasto')")
+            conn.commit()
+            conn.close()
+
+            almacen = AlmacenamientoSQLite(ruta)
+            pagina, _ = almacen.transacciones_pagina('ana@mail.com', categoria='servicios')
+            self.assertEqual([t['descripcion'] for t in pagina], ['Luz'])
+
+
+class TestPaginacion(unittest.TestCase):
+    """Pruebas para la paginación por cursor y los filtros de movimientos"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backends = [
+            AlmacenamientoJSON(self.tmp.name),
+            AlmacenamientoSQLite(os.path.join(self.tmp.name, 'finanzas.db')),
+            AlmacenamientoFragmentado(os.path.join(self.tmp.name, 'fragmentos'), fragmentos=4)
+        ]
+        # 7 transacciones, tres de ellas con la misma fecha exacta
+        self.transacciones = [
+            {'fecha': f'2025-01-0{dia}T10:00:00', 'descripcion': f'mov {n}',
+             'monto': float(n) if n % 2 else -float(n), 'tipo': 'ingreso' if n % 2 else 'gasto'}
+            for n, dia in zip(range(7), (7, 6, 5, 5, 5, 2, 1))
+        ]
+        for almacen in self.backends:
+            almacen.agregar_transacciones('ana@mail.com', self.transacciones)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def recorrer(self, almacen, limite, **filtros):
+        vistas, cursor = [], None
+        while True:
+            pagina, cursor = almacen.transacciones_pagina('ana@mail.com', limite=limite, cursor=cursor, **filtros)
+            self.assertLessEqual(len(pagina), limite)
+            vistas += [t['descripcion'] for t in pagina]
+            if cursor is None:
+                return vistas
+
+    def test_recorrer_todas_las_paginas(self):
+        """Recorrer con cursor devuelve todo, en orden y sin repetir empates"""
+        esperadas = [t['descripcion'] for t in self.transacciones]
+        for almacen in self.backends:
+            for limite in (1, 2, 3, 50):
+                self.assertEqual(self.recorrer(almacen, limite), esperadas)
+
+    def test_filtros(self):
+        """Filtros por tipo, rango de fechas y texto"""
+        for almacen in self.backends:
+            self.assertEqual(self.recorrer(almacen, 2, tipo='ingreso'), ['mov 1', 'mov 3', 'mov 5'])
+            self.assertEqual(self.recorrer(almacen, 2, desde='2025-01-02', hasta='2025-01-05'),
+                             ['mov 2', 'mov 3', 'mov 4', 'mov 5'])
+            self.assertEqual(self.recorrer(almacen, 2, texto='MOV 6'), ['mov 6'])
+
+
+    def test_iterar_historial_igual_a_paginar(self):
+        """El recorrido para exportar da lo mismo que pasar todas las páginas"""
+        for almacen in self.backends:
+            for filtros in ({}, {'tipo': 'gasto'}, {'desde': '2025-01-02', 'hasta': '2025-01-05'}):
+                self.assertEqual([t['descripcion'] for t in almacen.iterar_historial('ana@mail.com', lote=2, **filtros)],
+                                 self.recorrer(almacen, 2, **filtros))
+
+    def test_json_ordena_el_historial_una_vez_por_escritura(self):
+        """Las páginas reusan el historial ordenado hasta que el usuario escribe de nuevo"""
+        almacen = self.backends[0]
+        ordenadas = almacen._historial_ordenado('ana@mail.com')
+        almacen.transacciones_pagina('ana@mail.com', limite=2)
+        self.assertIs(almacen._historial_ordenado('ana@mail.com'), ordenadas)
+
+        almacen.agregar_transaccion('ana@mail.com', {'fecha': '2025-01-05T10:00:00', 'descripcion': 'nueva',
+                                                     'monto': -1.0, 'tipo': 'gasto'})
+        self.assertEqual(self.recorrer(almacen, 2)[:4], ['mov 0', 'mov 1', 'nueva', 'mov 2'])
+
+    def test_iterar_historial_json_ordena_una_vez(self):
+        """El backend JSON no pagina para exportar: una sola pasada por el historial"""
+        almacen = self.backends[0]
+        almacen.transacciones_pagina = None
+        self.assertEqual(len(list(almacen.iterar_historial('ana@mail.com', lote=1))), 7)
+
+class TestImportacion(unittest.TestCase):
+    """Pruebas para la importación masiva de transacciones"""
+
+    CSV = (
+        "email,fecha,descripcion,monto,tipo\n"
+        "ana@mail.com,2025-01-01T10:00:00,Sueldo,100,ingreso\n"
+        "ana@mail.com,2025-01-02T10:00:00,Luz,30,gasto\n"
+        "ana@mail.com,2025-01-03T10:00:00,Auto,500,gasto\n"
+        "nadie@mail.com,2025-01-01T10:00:00,Sueldo,10,\n"
+        "ana@mail.com,ayer,Algo,10,ingreso\n"
+        "ana@mail.com,,Algo,abc,ingreso\n"
+    )
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.almacen = AlmacenamientoSQLite(os.path.join(self.tmp.name, 'finanzas.db'))
+        self.almacen.guardar(USUARIOS, 'ana@mail.com', {'nombre': 'Ana', 'password': 'x', 'saldo': 0})
+        self.lotes = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def registrar(self, email, lista, resumenes):
+        self.lotes.append((email, lista))
+        self.almacen.agregar_transacciones(email, lista)
+        resumenes.append((email, {'cantidad': len(lista)}))
+
+    def test_importar_csv(self):
+        """Aplica las filas válidas en un solo lote y reporta el resto por línea"""
+        resultado = importar(self.almacen, leer_registros(io.StringIO(self.CSV), 'csv'), self.registrar)
+
+        self.assertEqual(resultado['importadas'], 2)
+        self.assertEqual(resultado['usuarios'], 1)
+        self.assertEqual([e['linea'] for e in resultado['errores']], [4, 5, 6, 7])
+        self.assertEqual(resultado['errores'][0]['error'], 'saldo insuficiente')
+
+        # Un lote por usuario, con la más nueva primero
+        self.assertEqual(len(self.lotes), 1)
+        self.assertEqual([t['descripcion'] for t in self.lotes[0][1]], ['Luz', 'Sueldo'])
+        self.assertEqual(self.almacen.obtener(USUARIOS, 'ana@mail.com')['saldo'], 70.0)
+
+    def test_importar_ndjson(self):
+        """NDJSON con tipo deducido del signo del monto"""
+        ndjson = '{"email": "ana@mail.com", "monto": 50, "descripcion": "Venta"}\nno es json\n'
+        resultado = importar(self.almacen, leer_registros(io.StringIO(ndjson), 'ndjson'), self.registrar)
+
+        self.assertEqual(resultado['importadas'], 1)
+        self.assertEqual(resultado['errores'], [{'linea': 2, 'error': 'línea ilegible'}])
+        self.assertEqual(self.almacen.transacciones('ana@mail.com')[0]['tipo'], 'ingreso')
+
+    def test_importar_valida_email_y_monto(self):
+        """Emails mal formados y montos no finitos se rechazan por línea"""
+        ndjson = ('{"email": "ana@", "monto": 50}\n'
+                  '{"email": "ana@mail.com", "monto": "nan"}\n'
+                  '{"email": "ana@mail.com", "monto": 5}\n')
+        resultado = importar(self.almacen, leer_registros(io.StringIO(ndjson), 'ndjson'), self.registrar)
+
+        self.assertEqual(resultado['importadas'], 1)
+        self.assertEqual(resultado['errores'], [{'linea': 1, 'error': 'email inválido: ana@'},
+                                                {'linea': 2, 'error': 'monto inválido'}])
+
+    def test_campos_de_otro_tipo_son_errores_de_linea(self):
+        """En NDJSON un número o un booleano donde va texto o monto no corta la importación"""
+        ndjson = ('{"email": 123, "monto": 5}\n'
+                  '{"email": "ana@mail.com", "monto": 5, "tipo": 1}\n'
+                  '{"email": "ana@mail.com", "monto": 5, "fecha": 20250101}\n'
+                  '{"email": "ana@mail.com", "monto": 5, "descripcion": 7}\n'
+                  '{"email": "ana@mail.com", "monto": true}\n'
+                  '{"email": "ana@mail.com", "monto": 5}\n')
+        resultado = importar(self.almacen, leer_registros(io.StringIO(ndjson), 'ndjson'), self.registrar)
+
+        self.assertEqual(resultado['importadas'], 1)
+        self.assertEqual(resultado['errores'], [{'linea': 1, 'error': 'email inválido: 123'},
+                                                {'linea': 2, 'error': 'tipo inválido: 1'},
+                                                {'linea': 3, 'error': 'fecha inválida: 20250101'},
+                                                {'linea': 4, 'error': 'descripción inválida: 7'},
+                                                {'linea': 5, 'error': 'monto inválido'}])
+
+    def test_descripcion_demasiado_larga(self):
+        registro = {'email': 'ana@mail.com', 'monto': 5, 'descripcion': 'x' * 201}
+        resultado = importar(self.almacen, [(1, registro)], self.registrar)
+
+        self.assertEqual(resultado['errores'], [{'linea': 1, 'error': 'la descripción tiene más de 200 caracteres'}])
+
+    def test_valida_de_a_lotes(self):
+        """Las filas se validan con una llamada a validar_lote cada `registros_por_lote`"""
+        ndjson = '{"email": "ana@mail.com", "monto": 5}\n' * 5 + '{"email": "ana@", "monto": 5}\n'
+        llamadas = []
+        original = importacion.validar_lote
+        importacion.validar_lote = lambda registros: llamadas.append(len(registros)) or original(registros)
+        try:
+            resultado = importar(self.almacen, leer_registros(io.StringIO(ndjson), 'ndjson'), self.registrar,
+                                 registros_por_lote=4)
+        finally:
+            importacion.validar_lote = original
+
+        self.assertEqual(llamadas, [4, 2])
+        self.assertEqual(resultado['importadas'], 5)
+        self.assertEqual(resultado['errores'], [{'linea': 6, 'error': 'email inválido: ana@'}])
+
+
+    def test_una_escritura_de_saldos_por_lote_de_usuarios(self):
+        """Con el backend JSON, usuarios.json y resumenes.json se reescriben una vez por lote, no por usuario"""
+        almacen = AlmacenamientoJSON(self.tmp.name)
+        emails = [f'u{n}@mail.com' for n in range(5)]
+        almacen.guardar_muchos(USUARIOS, [(e, {'nombre': 'U', 'password': 'x', 'saldo': 0}) for e in emails])
+        escrituras = []
+        guardar_todo = almacen.guardar_todo
+        almacen.guardar_todo = lambda coleccion, data: escrituras.append(coleccion) or guardar_todo(coleccion, data)
+
+        ndjson = ''.join(f'{{"email": "{e}", "monto": 10}}\n' for e in emails * 2)
+        self.registrar = lambda email, lista, resumenes: (almacen.agregar_transacciones(email, lista),
+                                                           resumenes.append((email, {'cantidad': len(lista)})))
+        resultado = importar(almacen, leer_registros(io.StringIO(ndjson), 'ndjson'), self.registrar,
+                             usuarios_por_lote=2)
+
+        self.assertEqual(resultado['importadas'], 10)
+        self.assertEqual(escrituras.count(USUARIOS), 3)
+        self.assertEqual(escrituras.count(RESUMENES), 3)
+        self.assertEqual([almacen.obtener(USUARIOS, e)['saldo'] for e in emails], [20.0] * 5)
+        self.assertEqual(almacen.obtener(RESUMENES, 'u4@mail.com'), {'cantidad': 2})
+
+class TestMetricas(unittest.TestCase):
+    """Pruebas para la instrumentación por ruta y por fase"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.originales = (app_modulo.almacen, app_modulo.metricas, app_modulo.sesiones)
+        app_modulo.metricas = Metricas()
+        app_modulo.sesiones = SesionesEnMemoria()
+        app_modulo.almacen = AlmacenamientoInstrumentado(
+            AlmacenamientoSQLite(os.path.join(self.tmp.name, 'finanzas.db')), app_modulo.metricas)
+        app_modulo.almacen.guardar(USUARIOS, 'ana@mail.com',
+                                   {'nombre': 'Ana', 'password': 'Clave123', 'saldo': 100.0})
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with self.client.session_transaction() as sesion:
+            sesion['usuario_actual'] = 'ana@mail.com'
+
+    def tearDown(self):
+        app_modulo.almacen, app_modulo.metricas, app_modulo.sesiones = self.originales
+        self.tmp.cleanup()
+
+    def test_metrics_en_formato_prometheus(self):
+        """/metrics muestra latencia por ruta y tiempos de lectura y render"""
+        self.client.get('/inicio')
+        texto = self.client.get('/metrics').get_data(as_text=True)
+
+        self.assertIn('# TYPE finanzas_request_segundos histogram', texto)
+        self.assertIn('finanzas_request_segundos_count{ruta="inicio",metodo="GET"} 1', texto)
+        self.assertIn('finanzas_fase_segundos_count{ruta="inicio",fase="render"} 1', texto)
+        self.assertIn('finanzas_fase_segundos_bucket{ruta="inicio",fase="lectura",le="+Inf"}', texto)
+
+    def test_metrics_desactivadas(self):
+        """Sin FINANZAS_METRICAS la ruta no existe"""
+        app_modulo.metricas = None
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+
+class TestSeguridad(unittest.TestCase):
+    """Pruebas para el hash de contraseñas y la caché de credenciales"""
+
+    def test_hash_con_sal(self):
+        """Dos hashes de la misma contraseña son distintos y ambos verifican"""
+        a = hashear('Clave123', iteraciones=1000)
+        b = hashear('Clave123', iteraciones=1000)
+
+        self.assertNotEqual(a, b)
+        self.assertTrue(a.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(verificar('Clave123', a))
+        self.assertTrue(verificar('Clave123', b))
+        self.assertFalse(verificar('clave123', a))
+
+    def test_texto_plano_viejo(self):
+        """Las contraseñas guardadas en texto plano siguen funcionando y piden re-hash"""
+        self.assertTrue(verificar('Clave123', 'Clave123'))
+        self.assertFalse(verificar('otra', 'Clave123'))
+        self.assertTrue(necesita_rehash('Clave123'))
+
+    def test_rehash_por_costo(self):
+        """Un hash con menos iteraciones que las configuradas pide re-hash"""
+        self.assertTrue(necesita_rehash(hashear('Clave123', iteraciones=1000)))
+        self.assertFalse(necesita_rehash(hashear('Clave123', iteraciones=seguridad.ITERACIONES)))
+
+    def test_hash_corrupto(self):
+        self.assertFalse(verificar('Clave123', 'pbkdf2_sha256$mal$formado'))
+
+    def test_cache_evita_recalcular(self):
+        """Un login correcto repetido no vuelve a calcular el hash; uno incorrecto sí"""
+        cache = CacheCredenciales()
+        guardado = hashear('Clave123', iteraciones=1000)
+        self.assertTrue(cache.verificar('ana@mail.com', 'Clave123', guardado))
+
+        llamadas = []
+        original = seguridad.verificar
+        seguridad.verificar = lambda *args: llamadas.append(args) or original(*args)
+        self.addCleanup(setattr, seguridad, 'verificar', original)
+
+        self.assertTrue(cache.verificar('ana@mail.com', 'Clave123', guardado))
+        self.assertEqual(llamadas, [])
+        self.assertFalse(cache.verificar('ana@mail.com', 'Clave124', guardado))
+        self.assertEqual(len(llamadas), 1)
+
+    def test_cache_invalida_por_hash_nuevo(self):
+        """Si cambia el hash guardado la entrada vieja no sirve"""
+        cache = CacheCredenciales()
+        cache.verificar('ana@mail.com', 'Clave123', hashear('Clave123', iteraciones=1000))
+
+        self.assertFalse(cache.verificar('ana@mail.com', 'Clave123', hashear('Nueva456', iteraciones=1000)))
+
+    def test_cache_acotada_y_con_vencimiento(self):
+        cache = CacheCredenciales(maximo=2, ttl=0)
+        for n in range(5):
+            cache.verificar(f'u{n}@mail.com', 'x', 'x')
+        self.assertEqual(len(cache), 2)
+
+        llamadas = []
+        original = seguridad.verificar
+        seguridad.verificar = lambda *args: llamadas.append(args) or original(*args)
+        self.addCleanup(setattr, seguridad, 'verificar', original)
+        cache.verificar('u4@mail.com', 'x', 'x')
+        self.assertEqual(len(llamadas), 1)
+
+
+class TestCaches(unittest.TestCase):
+    """Pruebas para la LRU con vencimiento compartida de caches.py"""
+
+    def test_lru_y_vencimiento(self):
+        lru = LRUConVencimiento(maximo=2, ttl=600)
+        lru.guardar('a', 1)
+        lru.guardar('b', 2)
+        lru.obtener('a')
+        lru.guardar('c', 3)
+
+        self.assertEqual((lru.obtener('a'), lru.obtener('b'), lru.obtener('c')), (1, None, 3))
+        lru.ttl = 0
+        lru.guardar('a', 4)
+        self.assertIsNone(lru.obtener('a'))
+
+    def test_no_descartables_se_conservan(self):
+        lru = LRUConVencimiento(maximo=1, ttl=0, descartable=lambda valor: valor != 'en curso')
+        lru.guardar('k', 'en curso')
+        lru.guardar('a', 'listo')
+
+        self.assertEqual(lru.obtener('k'), 'en curso')
+        self.assertEqual(lru.guardar_si_falta('k', 'otro'), 'en curso')
+        lru.olvidar('k', 'otro')
+        self.assertEqual(lru.obtener('k'), 'en curso')
+
+    def test_conexion_por_hilo(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            conexiones = ConexionesPorHilo(os.path.join(tmp, 'x.db'))
+            otra = []
+            hilo = threading.Thread(target=lambda: otra.append(conexiones()))
+            hilo.start()
+            hilo.join()
+
+            self.assertIs(conexiones(), conexiones())
+            self.assertIsNot(conexiones(), otra[0])
+
+
+class TestSesiones(unittest.TestCase):
+    """Pruebas para el cache de perfiles de los usuarios logueados"""
+
+    def test_perfil_sin_contrasena(self):
+        self.assertEqual(perfil_de({'nombre': 'Ana', 'password': 'x', 'saldo': 1}), {'nombre': 'Ana', 'saldo': 1})
+
+    def test_lru_descarta_la_menos_usada(self):
+        sesiones = SesionesEnMemoria(maximo=2)
+        sesiones.guardar('a', {'saldo': 1})
+        sesiones.guardar('b', {'saldo': 2})
+        sesiones.obtener('a')
+        sesiones.guardar('c', {'saldo': 3})
+
+        self.assertIsNone(sesiones.obtener('b'))
+        self.assertEqual(sesiones.obtener('a'), {'saldo': 1})
+        self.assertEqual(len(sesiones), 2)
+
+    def test_vencidas_no_se_devuelven(self):
+        sesiones = SesionesEnMemoria(ttl=0)
+        sesiones.guardar('a', {'saldo': 1})
+
+        self.assertIsNone(sesiones.obtener('a'))
+
+    def test_modificar_lo_leido_no_ensucia_el_cache(self):
+        sesiones = SesionesEnMemoria()
+        sesiones.guardar('a', {'saldo': 1})
+        sesiones.obtener('a')['saldo'] = 999
+
+        self.assertEqual(sesiones.obtener('a'), {'saldo': 1})
+
+    def test_sqlite_compartido_entre_workers(self):
+        """Dos instancias sobre el mismo archivo ven las mismas altas y bajas"""
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = os.path.join(tmp, 'sesiones.db')
+            uno, otro = SesionesSQLite(ruta), SesionesSQLite(ruta)
+            uno.guardar('ana@mail.com', {'nombre': 'Ana', 'saldo': 10})
+
+            self.assertEqual(otro.obtener('ana@mail.com'), {'nombre': 'Ana', 'saldo': 10})
+            otro.olvidar('ana@mail.com')
+            self.assertIsNone(uno.obtener('ana@mail.com'))
+
+
+class TestIdempotencia(unittest.TestCase):
+    """Pruebas para el cache de pedidos repetidos"""
+
+    def setUp(self):
+        self.cache = CacheIdempotencia()
+        self.llamadas = 0
+
+    def operacion(self):
+        self.llamadas += 1
+        return self.llamadas
+
+    def test_misma_clave_devuelve_el_primer_resultado(self):
+        self.assertEqual(self.cache.ejecutar('k', ('pagar', 10), self.operacion), 1)
+        self.assertEqual(self.cache.ejecutar('k', ('pagar', 10), self.operacion), 1)
+        self.assertEqual(self.cache.ejecutar('otra', ('pagar', 10), self.operacion), 2)
+
+    def test_misma_clave_con_otros_datos(self):
+        self.cache.ejecutar('k', ('pagar', 10), self.operacion)
+
+        with self.assertRaises(ClaveReutilizada):
+            self.cache.ejecutar('k', ('pagar', 99), self.operacion)
+
+    def test_los_errores_no_se_guardan(self):
+        def falla():
+            raise RuntimeError('saldo insuficiente')
+
+        with self.assertRaises(RuntimeError):
+            self.cache.ejecutar('k', (), falla)
+        self.assertEqual(self.cache.ejecutar('k', (), self.operacion), 1)
+
+    def test_repetido_en_paralelo_espera_al_primero(self):
+        empezo, seguir = threading.Event(), threading.Event()
+
+        def lenta():
+            empezo.set()
+            seguir.wait(5)
+            return self.operacion()
+
+        resultados = []
+        primero = threading.Thread(target=lambda: resultados.append(self.cache.ejecutar('k', (), lenta)))
+        primero.start()
+        empezo.wait(5)
+        segundo = threading.Thread(target=lambda: resultados.append(self.cache.ejecutar('k', (), lenta)))
+        segundo.start()
+        seguir.set()
+        primero.join()
+        segundo.join()
+
+        self.assertEqual((resultados, self.llamadas), ([1, 1], 1))
+
+    def test_vencimiento_y_tamano_maximo(self):
+        cache = CacheIdempotencia(maximo=2, ttl=0)
+        cache.ejecutar('a', (), self.operacion)
+        self.assertEqual(cache.ejecutar('a', (), self.operacion), 2)
+
+        cache = CacheIdempotencia(maximo=2)
+        for clave in ('a', 'b', 'c'):
+            cache.ejecutar(clave, (), self.operacion)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.ejecutar('a', (), self.operacion), 6)
+
+    def test_clave_en_curso_no_se_descarta(self):
+        """Con el cache lleno, una clave todavía en curso no sale: su reintento espera, no repite"""
+        cache = CacheIdempotencia(maximo=1)
+        empezo, seguir = threading.Event(), threading.Event()
+
+        def lenta():
+            empezo.set()
+            seguir.wait(5)
+            return self.operacion()
+
+        resultados = []
+        primero = threading.Thread(target=lambda: resultados.append(cache.ejecutar('k', (), lenta)))
+        primero.start()
+        empezo.wait(5)
+        for clave in ('a', 'b'):
+            cache.ejecutar(clave, (), lambda: 0)
+        segundo = threading.Thread(target=lambda: resultados.append(cache.ejecutar('k', (), lenta)))
+        segundo.start()
+        seguir.set()
+        primero.join()
+        segundo.join()
+
+        self.assertEqual((resultados, self.llamadas), ([1, 1], 1))
+
+    def test_no_guarda_los_datos_del_pedido(self):
+        """Del pedido queda sólo una huella: nunca la contraseña en texto plano"""
+        self.cache.ejecutar('k', ('crear_usuario', 'Ana', 'ana@mail.com', 'Secreta123'), self.operacion)
+
+        entrada = self.cache._entradas.obtener('k')
+        self.assertNotIn('Secreta123', repr(entrada.huella))
+        with self.assertRaises(ClaveReutilizada):
+            self.cache.ejecutar('k', ('crear_usuario', 'Ana', 'ana@mail.com', 'Otra1234'), self.operacion)
+
+
+class TestIdempotenciaSQLite(unittest.TestCase):
+    """Las claves compartidas entre workers en un archivo SQLite"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        ruta = os.path.join(self.tmp.name, 'idempotencia.db')
+        # Dos instancias sobre el mismo archivo: dos workers
+        self.worker_a = IdempotenciaSQLite(ruta, b'secreto')
+        self.worker_b = IdempotenciaSQLite(ruta, b'secreto')
+        self.llamadas = 0
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def operacion(self):
+        self.llamadas += 1
+        return {'importadas': self.llamadas}
+
+    def test_reintento_en_otro_worker(self):
+        datos = ('cargar_ingreso', 'ana@mail.com', 'sueldo', 50.0)
+        self.assertEqual(self.worker_a.ejecutar(('ana@mail.com', 'k'), datos, self.operacion), {'importadas': 1})
+        self.assertEqual(self.worker_b.ejecutar(('ana@mail.com', 'k'), datos, self.operacion), {'importadas': 1})
+        self.assertEqual(self.llamadas, 1)
+
+        with self.assertRaises(ClaveReutilizada):
+            self.worker_b.ejecutar(('ana@mail.com', 'k'), datos[:-1] + (99.0,), self.operacion)
+
+    def test_los_errores_no_se_guardan_y_no_queda_la_contrasena(self):
+        def falla():
+            raise RuntimeError('saldo insuficiente')
+
+        with self.assertRaises(RuntimeError):
+            self.worker_a.ejecutar('k', ('cambiar_password', 'ana@mail.com', 'OtraClave9'), falla)
+        self.assertEqual(len(self.worker_b), 0)
+
+        self.worker_b.ejecutar('k', ('cambiar_password', 'ana@mail.com', 'OtraClave9'), self.operacion)
+        with open(self.worker_a.ruta, 'rb') as f:
+            self.assertNotIn(b'OtraClave9', f.read())
+
+    def test_vencidas(self):
+        cache = IdempotenciaSQLite(self.worker_a.ruta, b'secreto', ttl=0)
+        cache.ejecutar('a', (), self.operacion)
+        self.assertEqual(cache.ejecutar('a', (), self.operacion), {'importadas': 2})
+
+class TestRutasConAlmacenamiento(unittest.TestCase):
+    """Pruebas de rutas que escriben datos, sobre un backend temporal"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.almacen_original = app_modulo.almacen
+        self.auditoria_original = app_modulo.auditoria
+        self.sesiones_original = app_modulo.sesiones
+        app_modulo.almacen = AlmacenamientoSQLite(os.path.join(self.tmp.name, 'finanzas.db'))
+        app_modulo.sesiones = SesionesEnMemoria()
+        app_modulo.auditoria = RegistroAuditoria(os.path.join(self.tmp.name, 'auditoria.jsonl'), intervalo=0.01)
+        app_modulo.almacen.guardar(USUARIOS, 'ana@mail.com',
+                                   {'nombre': 'Ana', 'password': 'Clave123', 'saldo': 100.0})
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with self.client.session_transaction() as sesion:
+            sesion['usuario_actual'] = 'ana@mail.com'
+
+    def tearDown(self):
+        app_modulo.auditoria.vaciar()
+        app_modulo.almacen = self.almacen_original
+        app_modulo.auditoria = self.auditoria_original
+        app_modulo.sesiones = self.sesiones_original
+        self.tmp.cleanup()
+
+    def test_pagar_descuenta_saldo_y_registra(self):
+        """Pagar descuenta el saldo y agrega la transacción"""
+        response = self.client.post('/pagar', data={'descripcion': 'luz', 'monto': '40'})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(app_modulo.almacen.obtener(USUARIOS, 'ana@mail.com')['saldo'], 60.0)
+        self.assertEqual(app_modulo.almacen.transacciones('ana@mail.com')[0]['monto'], -40.0)
+
+    def test_perfil_cacheado_y_actualizado_al_escribir(self):
+        """Las rutas usan el perfil en cache; pagar e ingresar lo dejan al día"""
+        self.client.get('/inicio')
+        lecturas = []
+        obtener = app_modulo.almacen.obtener
+        app_modulo.almacen.obtener = lambda coleccion, email: lecturas.append(coleccion) or obtener(coleccion, email)
+        try:
+            self.client.get('/pagar')
+            self.client.get('/perfil')
+            self.assertNotIn(USUARIOS, lecturas)
+
+            self.client.post('/pagar', data={'descripcion': 'luz', 'monto': '40'})
+            self.client.post('/ingreso', data={'fuente': 'sueldo', 'monto': '15'})
+        finally:
+            del app_modulo.almacen.obtener
+        self.assertEqual(app_modulo.sesiones.obtener('ana@mail.com')['saldo'], 75.0)
+        self.assertIn(b'75.0', self.client.get('/inicio').data)
+
+    def test_cambiar_contra_olvida_el_perfil(self):
+        self.client.get('/inicio')
+        self.client.post('/cambiar_contra', data={'password': 'Nueva456'})
+
+        self.assertIsNone(app_modulo.sesiones.obtener('ana@mail.com'))
+
+    def test_operaciones_concilian(self):
+        """Pagar, ingresar e invertir dejan saldo, totales y checkpoint de acuerdo con el historial"""
+        self.client.post('/pagar', data={'descripcion': 'luz', 'monto': '40'})
+        self.client.post('/ingreso', data={'fuente': 'sueldo', 'monto': '15'})
+        self.client.post('/inversiones', data={'tipo': 'Bonos', 'monto': '25'})
+
+        # Ana tenía 100 de saldo sin historial (cuenta vieja): es la única diferencia
+        diferencias = []
+        conciliar(app_modulo.almacen, diferencias.append)
+        self.assertEqual([(d['cuenta'], d['guardado'] - d['libro']) for d in diferencias], [('disponible', 100.0)])
+        self.assertEqual(app_modulo.almacen.obtener(USUARIOS, 'ana@mail.com')['libro'], {'asientos': 3})
+
+    def test_pagar_queda_auditado(self):
+        """El pago deja un registro en el log de auditoría"""
+        self.client.post('/pagar', data={'descripcion': 'luz', 'monto': '40'})
+        app_modulo.auditoria.vaciar()
+
+        with open(app_modulo.auditoria.archivo, encoding='utf-8') as f:
+            registro = json.loads(f.readline())
+        self.assertEqual((registro['usuario'], registro['accion'], registro['monto']),
+                         ('ana@mail.com', 'pagar', 40.0))
+
+    def test_pagar_descripcion_demasiado_larga(self):
+        """Una descripción más larga que LARGO_DESCRIPCION no se registra"""
+        response = self.client.post('/pagar', data={'descripcion': 'x' * (validaciones.LARGO_DESCRIPCION + 1),
+                                                    'monto': '40'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('La descripción puede tener hasta', response.get_data(as_text=True))
+        self.assertEqual(app_modulo.almacen.transacciones('ana@mail.com'), [])
+
+    def test_pagar_sin_saldo(self):
+        """Un pago mayor al saldo no modifica nada"""
+        response = self.client.post('/pagar', data={'descripcion': 'auto', 'monto': '500'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(app_modulo.almacen.obtener(USUARIOS, 'ana@mail.com')['saldo'], 100.0)
+        self.assertEqual(app_modulo.almacen.transacciones('ana@mail.com'), [])
+
+    def test_resumen_se_actualiza_al_escribir(self):
+        """Ingresar y pagar actualizan los totales que muestra el inicio"""
+        self.client.post('/ingreso', data={'fuente': 'sueldo', 'monto': '50'})
+        self.client.post('/pagar', data={'descripcion': 'luz', 'monto': '30'})
+
+        resumen = app_modulo.almacen.obtener(RESUMENES, 'ana@mail.com')
+        self.assertEqual((resumen['ingresos'], resumen['gastos']), (50.0, 30.0))
+        self.assertEqual(resumen, reconstruir_resumen(app_modulo.almacen.transacciones('ana@mail.com'))[0])
+
+    def test_resumen_viejo_se_reconstruye_con_sus_acumulados(self):
+        """Un resumen con los acumulados adentro (versión vieja) se rearma al primer reporte"""
+        app_modulo.almacen.agregar_transaccion('ana@mail.com', {
+            'fecha': '2025-01-15T10:00:00', 'descripcion': 'gym', 'monto': -20.0, 'tipo': 'gasto'})
+        app_modulo.almacen.guardar(RESUMENES, 'ana@mail.com', {
+            'ingresos': 0, 'gastos': 99.0, 'por_dia': {}, 'por_mes': {'2025-01': {'gastos': 99.0}},
+            'por_año': {}, 'por_categoria': {}})
+
+        datos = self.client.get('/reportes?periodo=mes&ultimos=1&hasta=2025-01-31').get_json()
+
+        self.assertEqual(datos['filas'][0]['gastos'], 20.0)
+        self.assertNotIn('por_mes', app_modulo.almacen.obtener(RESUMENES, 'ana@mail.com'))
+
+    def test_movimientos_filtrados(self):
+        """/movimientos filtra del lado del servidor"""
+        self.client.post('/ingreso', data={'fuente': 'sueldo', 'monto': '50'})
+        self.client.post('/pagar', data={'descripcion': 'luz', 'monto': '30'})
+
+        response = self.client.get('/movimientos?tipo=gasto')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'luz', response.data)
+        self.assertNotIn(b'Ingreso: sueldo', response.data)
+
+    def test_exportar_csv_y_ndjson(self):
+        """La exportación devuelve todo el historial en el formato pedido"""
+        for n in range(3):
+            self.client.post('/ingreso', data={'fuente': f'venta {n}', 'monto': '10'})
+
+        csv_texto = self.client.get('/movimientos/exportar?formato=csv').get_data(as_text=True)
+        filas = csv_texto.strip().splitlines()
+        self.assertEqual(filas[0], 'fecha,descripcion,monto,tipo')
+        self.assertEqual(len(filas), 4)
+
+        ndjson = self.client.get('/movimientos/exportar?formato=ndjson').get_data(as_text=True)
+        lineas = [json.loads(linea) for linea in ndjson.splitlines()]
+        self.assertEqual([l['descripcion'] for l in lineas],
+                         ['Ingreso: venta 2', 'Ingreso: venta 1', 'Ingreso: venta 0'])
+
+        self.assertEqual(self.client.get('/movimientos/exportar?formato=xls').status_code, 400)
+
+    def test_api_importar_token_incorrecto(self):
+        """Un token distinto (o con caracteres raros) se rechaza con 403"""
+        os.environ['FINANZAS_TOKEN_IMPORTACION'] = 'secreto'
+        self.addCleanup(os.environ.pop, 'FINANZAS_TOKEN_IMPORTACION')
+        for token in ('otro', 'secretö', ''):
+            response = self.client.post('/api/importar', headers={'X-Token-Importacion': token}, data={
+                'archivo': (io.BytesIO(b'email,monto\nana@mail.com,10\n'), 'extracto.csv')})
+            self.assertEqual(response.status_code, 403)
+
+    def test_api_importar_requiere_token(self):
+        """Sin el token de importación configurado la API responde 403"""
+        os.environ.pop('FINANZAS_TOKEN_IMPORTACION', None)
+        response = self.client.post('/api/importar', data={
+            'archivo': (io.BytesIO(b'email,monto\nana@mail.com,10\n'), 'extracto.csv')})
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_api_importar(self):
+        """Con token, importa y actualiza saldo y resumen"""
+        os.environ['FINANZAS_TOKEN_IMPORTACION'] = 'secreto'
+        self.addCleanup(os.environ.pop, 'FINANZAS_TOKEN_IMPORTACION')
+        response = self.client.post(
+            '/api/importar',
+            data={'archivo': (io.BytesIO(b'email,monto,descripcion\nana@mail.com,25,Venta\n'), 'extracto.csv')},
+            headers={'X-Token-Importacion': 'secreto'})
+
+        self.assertEqual(response.get_json()['importadas'], 1)
+        self.assertEqual(app_modulo.almacen.obtener(USUARIOS, 'ana@mail.com')['saldo'], 125.0)
+        self.assertEqual(app_modulo.almacen.obtener(RESUMENES, 'ana@mail.com')['ingresos'], 25.0)
+
+    def test_doble_envio_de_pagar(self):
+        """El mismo formulario enviado dos veces paga una sola vez"""
+        pagina = self.client.get('/pagar').get_data(as_text=True)
+        clave = re.search(r'name="clave_idempotencia" value="(\w+)"', pagina).group(1)
+
+        for _ in range(2):
+            response = self.client.post('/pagar', data={'descripcion': 'luz', 'monto': '40',
+                                                         'clave_idempotencia': clave})
+            self.assertEqual(response.status_code, 302)
+        self.assertEqual(app_modulo.almacen.obtener(USUARIOS, 'ana@mail.com')['saldo'], 60.0)
+        self.assertEqual(len(app_modulo.almacen.transacciones('ana@mail.com')), 1)
+
+    def test_api_importar_con_idempotency_key(self):
+        """Un reintento con la misma Idempotency-Key devuelve el resultado sin volver a importar"""
+        os.environ['FINANZAS_TOKEN_IMPORTACION'] = 'secreto'
+        self.addCleanup(os.environ.pop, 'FINANZAS_TOKEN_IMPORTACION')
+        headers = {'X-Token-Importacion': 'secreto', 'Idempotency-Key': 'lote-1'}
+
+        def enviar(contenido):
+            return self.client.post('/api/importar', headers=headers,
+                                    data={'archivo': (io.BytesIO(contenido), 'extracto.csv')})
+
+        respuestas = [enviar(b'email,monto,descripcion\nana@mail.com,25,Venta\n') for _ in range(2)]
+        self.assertEqual([r.get_json()['importadas'] for r in respuestas], [1, 1])
+        self.assertEqual(app_modulo.almacen.obtener(USUARIOS, 'ana@mail.com')['saldo'], 125.0)
+        self.assertEqual(enviar(b'email,monto\nana@mail.com,99\n').status_code, 422)
+
+    def test_inversiones_muestra_proyeccion(self):
+        """/inversiones incluye las curvas de proyección de los cuatro productos"""
+        self.client.post('/inversiones', data={'tipo': 'Bonos', 'monto': '40'})
+        response = self.client.get('/inversiones')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'proyeccionChart', response.data)
+        self.assertIn(b'Plazo Fijo', response.data)
+
+    def test_invertir_agrega_posicion_a_la_cartera(self):
+        """Los totales viejos pasan a la cartera y la inversión nueva se agrega como posición"""
+        app_modulo.almacen.guardar(INVERSIONES, 'ana@mail.com',
+                                   {'Fondos Comunes': 0, 'Acciones': 0, 'Bonos': 10, 'Plazo Fijo': 0})
+        self.client.post('/inversiones', data={'tipo': 'Acciones', 'monto': '40'})
+
+        cartera = app_modulo.almacen.obtener(CARTERAS, 'ana@mail.com')
+        self.assertEqual([(p['producto'], p['monto']) for p in cartera['posiciones']],
+                         [('Bonos', 10), ('Acciones', 40.0)])
+        self.assertEqual(cartera['valuacion']['capital'], 50.0)
+        self.assertIn(b'Valor de la cartera: $50.0', self.client.get('/inversiones').data)
+
+    def test_inversiones_muestra_el_cierre(self):
+        """Después de revaluar, /inversiones muestra el cierre mientras no haya posiciones nuevas"""
+        self.client.post('/inversiones', data={'tipo': 'Bonos', 'monto': '40'})
+        revaluar_todo('sqlite', app_modulo.almacen.ruta, app_modulo.precios.ruta, procesos=1)
+
+        self.assertIn(b'Cierre del', self.client.get('/inversiones').data)
+        self.client.post('/inversiones', data={'tipo': 'Bonos', 'monto': '10'})
+        self.assertNotIn(b'Cierre del', self.client.get('/inversiones').data)
+
+    def test_login_rehashea_texto_plano(self):
+        """El primer login con la contraseña vieja en texto plano la guarda hasheada"""
+        response = self.client.post('/', data={'email': 'ana@mail.com', 'password': 'Clave123'})
+
+        self.assertEqual(response.status_code, 302)
+        guardado = app_modulo.almacen.obtener(USUARIOS, 'ana@mail.com')['password']
+        self.assertTrue(guardado.startswith('pbkdf2_sha256$'))
+        self.assertFalse(necesita_rehash(guardado))
+        self.assertEqual(self.client.post('/', data={'email': 'ana@mail.com', 'password': 'Clave123'}).status_code, 302)
+        self.assertEqual(self.client.post('/', data={'email': 'ana@mail.com', 'password': 'Mal123'}).status_code, 200)
+
+    def test_crear_cuenta_y_cambiar_contra_guardan_hash(self):
+        """Nunca se guarda la contraseña en texto plano"""
+        self.client.post('/crear_cuenta', data={'nombre': 'Beto', 'email': 'beto@mail.com', 'password': 'Clave123'})
+        self.client.post('/cambiar_contra', data={'password': 'Nueva456'})
+
+        self.assertTrue(verificar('Clave123', app_modulo.almacen.obtener(USUARIOS, 'beto@mail.com')['password']))
+        guardado = app_modulo.almacen.obtener(USUARIOS, 'ana@mail.com')['password']
+        self.assertNotEqual(guardado, 'Nueva456')
+        self.assertTrue(verificar('Nueva456', guardado))
+
+    def test_crear_usuario_hashea_fuera_del_bloqueo(self):
+        """El hash (lento) no se calcula con el bloqueo del email tomado"""
+        bloqueado = []
+        bloquear = app_modulo.almacen.bloquear
+        hashear_original = app_modulo.hashear
+
+        @contextlib.contextmanager
+        def bloquear_anotando(email):
+            with bloquear(email):
+                bloqueado.append(True)
+                try:
+                    yield
+                finally:
+                    bloqueado.pop()
+
+        def hashear_anotando(password):
+            self.assertEqual(bloqueado, [])
+            return hashear_original(password)
+
+        app_modulo.almacen.bloquear = bloquear_anotando
+        app_modulo.hashear = hashear_anotando
+        try:
+            self.assertIsNone(app_modulo.crear_usuario('Beto', 'beto@mail.com', 'Clave123'))
+            self.assertEqual(app_modulo.crear_usuario('Beto', 'beto@mail.com', 'Clave123'), 'Ese correo ya existe.')
+        finally:
+            app_modulo.hashear = hashear_original
+            del app_modulo.almacen.bloquear
+
+        self.assertTrue(verificar('Clave123', app_modulo.almacen.obtener(USUARIOS, 'beto@mail.com')['password']))
+
+    def test_categorias_en_inicio_y_movimientos(self):
+        """El inicio muestra los gastos por categoría y movimientos filtra por categoría"""
+        self.client.post('/pagar', data={'descripcion': 'Pago de luz', 'monto': '30'})
+        self.client.post('/pagar', data={'descripcion': 'Nafta', 'monto': '20'})
+
+        inicio = self.client.get('/inicio').get_data(as_text=True)
+        self.assertIn('Gastos por Categoría', inicio)
+        self.assertLess(inicio.index('Servicios'), inicio.index('Transporte'))
+
+        movimientos = self.client.get('/movimientos?categoria=transporte').get_data(as_text=True)
+        self.assertIn('Nafta', movimientos)
+        self.assertNotIn('Pago de luz', movimientos)
+
+    def test_reportes(self):
+        """/reportes arma la serie mensual desde el resumen, sin leer las transacciones"""
+        self.client.post('/pagar', data={'descripcion': 'luz', 'monto': '30'})
+        self.client.post('/inversiones', data={'tipo': 'Bonos', 'monto': '40'})
+
+        # Si la ruta intentara leer el historial, fallaría
+        app_modulo.almacen.transacciones = app_modulo.almacen.transacciones_pagina = None
+        try:
+            datos = self.client.get('/reportes?periodo=mes&ultimos=60').get_json()
+        finally:
+            del app_modulo.almacen.transacciones, app_modulo.almacen.transacciones_pagina
+
+        self.assertEqual(len(datos['filas']), 60)
+        self.assertEqual(datos['filas'][-1]['periodo'], date.today().isoformat()[:7])
+        self.assertEqual((datos['filas'][-1]['gastos'], datos['filas'][-1]['inversiones']), (70.0, 40.0))
+
+        self.assertEqual(self.client.get('/reportes?periodo=semana').status_code, 400)
+        self.assertEqual(self.client.get('/reportes?ultimos=0').status_code, 400)
+        self.assertEqual(self.client.get('/reportes?hasta=ayer').status_code, 400)
+
+    def test_inicio(self):
+        """El inicio muestra el saldo del usuario"""
+        response = self.client.get('/inicio')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'100.0', response.data)
+
+
+@unittest.skipIf(asgi is None, "Quart no está instalado")
+class TestASGI(unittest.TestCase):
+    """Las rutas async de asgi.py, sobre el mismo backend temporal que las de Flask"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.almacen_original = app_modulo.almacen
+        self.auditoria_original = app_modulo.auditoria
+        self.sesiones_original = app_modulo.sesiones
+        app_modulo.almacen = AlmacenamientoSQLite(os.path.join(self.tmp.name, 'finanzas.db'))
+        app_modulo.sesiones = SesionesEnMemoria()
+        app_modulo.auditoria = RegistroAuditoria(os.path.join(self.tmp.name, 'auditoria.jsonl'), intervalo=0.01)
+        app_modulo.almacen.guardar(USUARIOS, 'ana@mail.com',
+                                   {'nombre': 'Ana', 'password': 'Clave123', 'saldo': 100.0})
+
+    def tearDown(self):
+        app_modulo.auditoria.vaciar()
+        app_modulo.almacen = self.almacen_original
+        app_modulo.auditoria = self.auditoria_original
+        app_modulo.sesiones = self.sesiones_original
+        self.tmp.cleanup()
+
+    def pedir(self, *pedidos):
+        """Loguea a Ana y hace los pedidos (método, ruta, formulario) en orden; devuelve (status, cuerpo)."""
+        async def correr():
+            cliente = asgi.app.test_client()
+            await cliente.post('/', form={'email': 'ana@mail.com', 'password': 'Clave123'})
+            respuestas = []
+            for metodo, ruta, formulario in pedidos:
+                respuesta = await cliente.open(ruta, method=metodo, form=formulario)
+                respuestas.append((respuesta.status_code, await respuesta.get_data(as_text=True)))
+            return respuestas
+        return asyncio.run(correr())
+
+    def test_ingreso_repetido_con_la_misma_clave(self):
+        self.pedir(('POST', '/ingreso', {'fuente': 'sueldo', 'monto': '50', 'clave_idempotencia': 'x1'}),
+                   ('POST', '/ingreso', {'fuente': 'sueldo', 'monto': '50', 'clave_idempotencia': 'x1'}))
+
+        self.assertEqual(app_modulo.almacen.obtener(USUARIOS, 'ana@mail.com')['saldo'], 150.0)
+
+    def test_inicio(self):
+        """El inicio muestra el saldo del usuario logueado"""
+        [(status, cuerpo)] = self.pedir(('GET', '/inicio', None))
+
+        self.assertEqual(status, 200)
+        self.assertIn('100.0', cuerpo)
+
+    def test_pagar_e_ingreso(self):
+        """Las escrituras pasan por las mismas operaciones que la app Flask"""
+        respuestas = self.pedir(('POST', '/ingreso', {'fuente': 'sueldo', 'monto': '50'}),
+                                ('POST', '/pagar', {'descripcion': 'luz', 'monto': '30'}),
+                                ('POST', '/pagar', {'descripcion': 'auto', 'monto': '500'}))
+
+        self.assertEqual([status for status, _ in respuestas], [302, 302, 200])
+        self.assertIn('No tenés saldo suficiente', respuestas[2][1])
+        self.assertEqual(app_modulo.almacen.obtener(USUARIOS, 'ana@mail.com')['saldo'], 120.0)
+        resumen = app_modulo.almacen.obtener(RESUMENES, 'ana@mail.com')
+        self.assertEqual((resumen['ingresos'], resumen['gastos']), (50.0, 30.0))
+
+    def test_movimientos_y_exportacion(self):
+        """Movimientos filtra y la exportación sale en streaming con todo el historial"""
+        respuestas = self.pedir(('POST', '/ingreso', {'fuente': 'sueldo', 'monto': '50'}),
+                                ('POST', '/pagar', {'descripcion': 'luz', 'monto': '30'}),
+                                ('GET', '/movimientos?tipo=gasto', None),
+                                ('GET', '/movimientos/exportar?formato=csv', None))
+
+        status, cuerpo = respuestas[2]
+        self.assertEqual(status, 200)
+        self.assertIn('luz', cuerpo)
+        self.assertNotIn('Ingreso: sueldo', cuerpo)
+        self.assertEqual(len(respuestas[3][1].strip().splitlines()), 3)
+
+    def test_olvide_contra_no_llena_las_sesiones(self):
+        """Consultar un email en olvidé mi contraseña no lo deja en la cache de sesiones"""
+        async def correr():
+            cliente = asgi.app.test_client()
+            existe = await cliente.post('/procesar_olvide_contra', form={'email': 'ana@mail.com'})
+            no_existe = await cliente.post('/procesar_olvide_contra', form={'email': 'nadie@mail.com'})
+            return await existe.get_data(as_text=True), await no_existe.get_data(as_text=True)
+        existe, no_existe = asyncio.run(correr())
+
+        self.assertIn('Se envió un enlace', existe)
+        self.assertIn('Ese correo no existe', no_existe)
+        self.assertEqual(len(app_modulo.sesiones), 0)
+
+    def test_sin_sesion_redirige(self):
+        """Sin login las rutas protegidas mandan al login"""
+        async def correr():
+            respuesta = await asgi.app.test_client().get('/inicio')
+            return respuesta.status_code, respuesta.headers['Location']
+        self.assertEqual(asyncio.run(correr()), (302, '/'))
+
+
 # ============================================================
 # Comando para ejecutar las pruebas
 # ============================================================
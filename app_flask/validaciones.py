@@ -0,0 +1,91 @@
+# ----------------------------------------------------
+# VALIDACIONES (regex precompiladas y validación por lotes)
+# ----------------------------------------------------
+# Las versiones de utilidades_avanzadas.py le pasaban el patrón como texto a
+# re.match en cada llamada. Acá los patrones se compilan una sola vez al
+# importar el módulo, y hay versiones por lotes para validar miles de
+# valores en una llamada (altas masivas, importaciones): devuelven un
+# resultado por elemento, en el mismo orden.
+import math
+import re
+
+PATRON_EMAIL = re.compile(r"^[\w\.-]+@[\w\.-]+\.\w{2,}$")
+PATRON_PASSWORD = re.compile(r"^(?=.*[A-Z])(?=.*\d).{6,}$")
+# Las descripciones se clasifican palabra por palabra (categorias.py) y se guardan en cada fila
+LARGO_DESCRIPCION = 200
+
+MENSAJES = {
+    "email": "El email no tiene un formato válido.",
+    "password": "La contraseña debe tener al menos UNA mayúscula y UN carácter especial (!@#$%&*?).",
+    "monto": "El monto no es un número válido.",
+    "descripcion": f"La descripción puede tener hasta {LARGO_DESCRIPCION} caracteres."
+}
+
+
+# -----------------------
+# DE A UNO
+# -----------------------
+def validar_email(email):
+    """Valida email con regex - FUNCIÓN DE utilidades_avanzadas.py"""
+    return isinstance(email, str) and PATRON_EMAIL.match(email) is not None
+
+
+def validar_password(password):
+    """Valida que la contraseña tenga al menos una mayúscula y un número - FUNCIÓN DE utilidades_avanzadas.py"""
+    return isinstance(password, str) and PATRON_PASSWORD.match(password) is not None
+
+
+def validar_monto(valor):
+    """Devuelve el monto como float, o None si no es un número finito."""
+    if isinstance(valor, bool):
+        # float(True) es 1.0: un true en un JSON no es un monto
+        return None
+    try:
+        monto = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return monto if math.isfinite(monto) else None
+
+
+def validar_descripcion(descripcion):
+    """Texto de hasta LARGO_DESCRIPCION caracteres."""
+    return isinstance(descripcion, str) and len(descripcion) <= LARGO_DESCRIPCION
+
+
+# -----------------------
+# POR LOTES
+# -----------------------
+def validar_emails(emails):
+    """[True/False por cada email]."""
+    coincide = PATRON_EMAIL.match
+    return [isinstance(e, str) and coincide(e) is not None for e in emails]
+
+
+def validar_passwords(passwords):
+    """[True/False por cada contraseña]."""
+    coincide = PATRON_PASSWORD.match
+    return [isinstance(p, str) and coincide(p) is not None for p in passwords]
+
+
+def validar_montos(valores):
+    """[float o None por cada valor]."""
+    return [validar_monto(v) for v in valores]
+
+
+def validar_lote(registros):
+    """Valida los campos email, password y monto presentes en cada registro (dict).
+
+    Devuelve un dict por registro con {campo: mensaje de error}; vacío si está todo bien.
+    Cada campo se valida con una sola pasada por lotes sobre todos los registros.
+    """
+    registros = list(registros)
+    errores = [{} for _ in registros]
+
+    for campo, validar_todos in (("email", validar_emails), ("password", validar_passwords),
+                                 ("monto", validar_montos)):
+        posiciones = [i for i, r in enumerate(registros) if campo in r]
+        resultados = validar_todos([registros[i][campo] for i in posiciones])
+        for i, resultado in zip(posiciones, resultados):
+            if resultado is False or resultado is None:
+                errores[i][campo] = MENSAJES[campo]
+    return errores